@@ -7,6 +7,7 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.forms import modelformset_factory
 
+from program.models import AutoScheduleJob
 from program.models import Event
 from program.models import Speaker
 from tickets.models import ShopTicket
@@ -66,19 +67,26 @@ class AutoScheduleValidateForm(forms.Form):
     )
 
 
-class AutoScheduleApplyForm(forms.Form):
+class AutoScheduleJobForm(AutoScheduleValidateForm):
     schedule = forms.ChoiceField(
-        choices=(
-            (
-                "similar",
-                "Apply Similar Schedule (Create and apply a new schedule similar to the current schedule)",
-            ),
-            (
-                "new",
-                "Apply New Schedule (Create and apply a new schedule without considering the current schedule)",
-            ),
+        choices=AutoScheduleJob.SCHEDULE_CHOICES,
+        help_text="Which schedule to calculate?",
+    )
+
+    time_limit = forms.IntegerField(
+        min_value=1,
+        required=False,
+        help_text="Stop the solver after this many seconds and use the best schedule found so far. Leave blank for no limit.",
+    )
+
+    decompose = forms.BooleanField(
+        initial=True,
+        required=False,
+        help_text=(
+            "Split the problem into independent sub-problems (roughly one per EventType) and solve them in "
+            "parallel, which is faster. The result is equivalent to solving it in one go when there is no "
+            "original schedule, otherwise it may differ."
         ),
-        help_text="Which schedule to apply?",
     )
 
 
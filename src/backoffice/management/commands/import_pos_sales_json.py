@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import json
 import logging
 
 from django.core.management.base import BaseCommand
 
 from economy.utils import import_pos_sales_json
+from economy.utils import iter_json_objects
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
@@ -23,8 +23,8 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options) -> None:
         with open(options["jsonpath"]) as f:
-            data = json.load(f)
-            products, transactions, sales, costs = import_pos_sales_json(data)
+            # read one transaction at a time so big exports do not have to fit in memory
+            products, transactions, sales, costs = import_pos_sales_json(iter_json_objects(f))
             self.stdout.write(f"{products} new products created")
             self.stdout.write(f"{transactions} new transactions created")
             self.stdout.write(f"{sales} new sales created")
@@ -0,0 +1,168 @@
+import csv
+import json
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+
+from economy.factories import PosFactory
+from shop.factories import OrderProductRelationFactory
+from shop.models import Invoice
+from tickets.factories import TicketTypeFactory
+from tickets.models import TICKET_MODELS
+from tickets.models import ShopTicket
+from utils.tests import BornhackTestBase
+
+
+class TestScanTicketsSyncView(BornhackTestBase):
+    """Test ScanTicketsSyncView."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Test setup."""
+        super().setUpTestData()
+        cls.admin = cls.users["admin"]
+        cls.pos = PosFactory(team=cls.teams["info"])
+        cls.other_pos = PosFactory(team=cls.teams["info"])
+        opr = OrderProductRelationFactory()
+        cls.ticket = ShopTicket.objects.create(
+            ticket_type=TicketTypeFactory(camp=cls.camp),
+            product=opr.product,
+            opr=opr,
+        )
+        cls.url = reverse(
+            "backoffice:scan_tickets_sync",
+            kwargs={"camp_slug": cls.camp.slug, "pos_slug": cls.pos.slug},
+        )
+
+    def sync(self, scans, cursor=None, url=None):
+        return self.client.post(
+            url or self.url,
+            json.dumps({"scans": scans, "cursor": cursor}),
+            content_type="application/json",
+        ).json()
+
+    def test_check_in_and_conflict(self) -> None:
+        """Test check-in, replaying the same scan, and a conflicting scan from another Pos."""
+        self.client.force_login(self.admin)
+        scan = {
+            "id": "1",
+            "token": self.ticket.token,
+            "action": "check_in",
+            "scanned_at": timezone.now().isoformat(),
+        }
+        response = self.sync(
+            [scan, {"id": "2", "token": "unknown", "action": "check_in", "scanned_at": scan["scanned_at"]}]
+        )
+        assert [result["status"] for result in response["results"]] == ["ok", "not_found"]
+        self.ticket.refresh_from_db()
+        assert self.ticket.used_pos == self.pos
+
+        # sending the same scan again is fine
+        response = self.sync([scan], cursor=response["cursor"])
+        assert response["results"][0]["status"] == "ok"
+
+        # but scanning it at another Pos is a conflict
+        other_url = reverse(
+            "backoffice:scan_tickets_sync",
+            kwargs={"camp_slug": self.camp.slug, "pos_slug": self.other_pos.slug},
+        )
+        response = self.sync([{**scan, "scanned_at": timezone.now().isoformat()}], url=other_url)
+        assert response["results"][0]["status"] == "conflict"
+        assert response["results"][0]["used_pos"] == self.pos.name
+
+    def test_badge_and_conflict(self) -> None:
+        """Test handing out a badge, replaying the same scan, and a conflicting scan from another Pos."""
+        self.client.force_login(self.admin)
+        scan = {
+            "id": "1",
+            "token": self.ticket.badge_token,
+            "action": "badge",
+            "scanned_at": timezone.now().isoformat(),
+        }
+        response = self.sync([scan])
+        assert response["results"][0]["status"] == "ok"
+        self.ticket.refresh_from_db()
+        assert self.ticket.badge_handed_out
+        assert self.ticket.badge_handed_out_pos == self.pos
+
+        # sending the same scan again is fine
+        response = self.sync([scan], cursor=response["cursor"])
+        assert response["results"][0]["status"] == "ok"
+
+        # but handing out the badge at another Pos is a conflict
+        other_url = reverse(
+            "backoffice:scan_tickets_sync",
+            kwargs={"camp_slug": self.camp.slug, "pos_slug": self.other_pos.slug},
+        )
+        response = self.sync([{**scan, "scanned_at": timezone.now().isoformat()}], url=other_url)
+        assert response["results"][0]["status"] == "conflict"
+
+    def test_invalid_scanned_at(self) -> None:
+        """A scan with an invalid date is reported as invalid, and the other scans are applied."""
+        self.client.force_login(self.admin)
+        scans = [
+            {"id": "1", "token": self.ticket.token, "action": "check_in", "scanned_at": "2026-13-01T00:00:00"},
+            {"id": "2", "token": self.ticket.token, "action": "check_in", "scanned_at": timezone.now().isoformat()},
+            {"id": "3", "token": self.ticket.badge_token, "action": "badge", "scanned_at": timezone.now().isoformat()},
+        ]
+        response = self.sync(scans)
+        assert [result["status"] for result in response["results"]] == ["invalid", "ok", "ok"]
+        self.ticket.refresh_from_db()
+        assert self.ticket.used_pos == self.pos
+        assert self.ticket.badge_handed_out
+
+    def test_ticket_delta(self) -> None:
+        """Test that tickets are returned on the first sync, and only changed tickets later."""
+        # the cursor overlaps the previous sync, so make the tickets older than that
+        for model in TICKET_MODELS:
+            model.objects.update(updated=timezone.now() - timedelta(hours=1))
+        self.client.force_login(self.admin)
+        response = self.sync([])
+        assert [self.ticket.token, self.ticket.badge_token, False, False] in response["tickets"]
+
+        response = self.sync([], cursor=response["cursor"])
+        assert response["tickets"] == []
+
+        response = self.sync(
+            [
+                {
+                    "id": "1",
+                    "token": self.ticket.badge_token,
+                    "action": "badge",
+                    "scanned_at": timezone.now().isoformat(),
+                }
+            ],
+            cursor=response["cursor"],
+        )
+        assert response["results"][0]["status"] == "ok"
+        assert response["tickets"] == [[self.ticket.token, self.ticket.badge_token, False, True]]
+
+    def test_removed_tickets(self) -> None:
+        """Test that tickets deleted after the cursor, like by a refund, are returned as removed."""
+        self.client.force_login(self.admin)
+        response = self.sync([])
+        assert response["removed"] == []
+
+        ShopTicket.objects.filter(pk=self.ticket.pk).delete()
+        response = self.sync([], cursor=response["cursor"])
+        assert response["removed"] == [self.ticket.token]
+        assert all(ticket[0] != self.ticket.token for ticket in response["tickets"])
+
+
+class TestInvoiceListCSVView(BornhackTestBase):
+    """Test InvoiceListCSVView."""
+
+    def test_csv_export(self) -> None:
+        """Test that the invoices are streamed with the order totals."""
+        opr = OrderProductRelationFactory(quantity=2)
+        invoice = Invoice.objects.create(order=opr.order)
+        self.client.force_login(self.users["admin"])
+        response = self.client.get(
+            reverse("backoffice:invoice_list_csv", kwargs={"camp_slug": self.camp.slug}),
+        )
+        assert response.status_code == 200
+        assert response.streaming
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        assert rows[0] == ["invoice", "invoice_date", "amount_dkk", "order", "paid"]
+        assert [str(invoice.id), str(invoice.created.date()), str(opr.product.price * 2)] in [row[:3] for row in rows]
@@ -13,11 +13,14 @@ from .views import AccountingExportUpdateView
 from .views import AddRecordingView
 from .views import ApproveFeedbackView
 from .views import ApproveNamesView
-from .views import AutoScheduleApplyView
 from .views import AutoScheduleCrashCourseView
 from .views import AutoScheduleDebugEventConflictsView
 from .views import AutoScheduleDebugEventSlotUnavailabilityView
 from .views import AutoScheduleDiffView
+from .views import AutoScheduleJobApplyView
+from .views import AutoScheduleJobCreateView
+from .views import AutoScheduleJobDetailView
+from .views import AutoScheduleJobListView
 from .views import AutoScheduleManageView
 from .views import AutoScheduleValidateView
 from .views import BackofficeIndexView
@@ -70,6 +73,7 @@ from .views import EventTypeDetailView
 from .views import EventTypeListView
 from .views import EventUpdateView
 from .views import ExpenseDetailView
+from .views import ExpenseListCSVView
 from .views import ExpenseListView
 from .views import ExpenseUpdateView
 from .views import FacilityCreateView
@@ -141,6 +145,7 @@ from .views import PosReportListView
 from .views import PosReportPosCountEndView
 from .views import PosReportPosCountStartView
 from .views import PosReportUpdateView
+from .views import PosSaleCSVView
 from .views import PosSaleListView
 from .views import PosSalesImportView
 from .views import PosTransactionListView
@@ -158,6 +163,7 @@ from .views import RevenueUpdateView
 from .views import ScanInventoryIndexView
 from .views import ScanInventoryView
 from .views import ScanTicketsPosSelectView
+from .views import ScanTicketsSyncView
 from .views import ScanTicketsView
 from .views import ShopTicketOverview
 from .views import ShopTicketStatsDetailView
@@ -444,6 +450,11 @@ urlpatterns = [
                                 ScanTicketsView.as_view(),
                                 name="scan_tickets",
                             ),
+                            path(
+                                "<slug:pos_slug>/sync/",
+                                ScanTicketsSyncView.as_view(),
+                                name="scan_tickets_sync",
+                            ),
                         ],
                     ),
                 ),
@@ -911,9 +922,38 @@ urlpatterns = [
                     name="autoschedule_diff",
                 ),
                 path(
-                    "apply/",
-                    AutoScheduleApplyView.as_view(),
-                    name="autoschedule_apply",
+                    "jobs/",
+                    include(
+                        [
+                            path(
+                                "",
+                                AutoScheduleJobListView.as_view(),
+                                name="autoschedule_job_list",
+                            ),
+                            path(
+                                "create/",
+                                AutoScheduleJobCreateView.as_view(),
+                                name="autoschedule_job_create",
+                            ),
+                            path(
+                                "<int:pk>/",
+                                include(
+                                    [
+                                        path(
+                                            "",
+                                            AutoScheduleJobDetailView.as_view(),
+                                            name="autoschedule_job_detail",
+                                        ),
+                                        path(
+                                            "apply/",
+                                            AutoScheduleJobApplyView.as_view(),
+                                            name="autoschedule_job_apply",
+                                        ),
+                                    ],
+                                ),
+                            ),
+                        ],
+                    ),
                 ),
                 path(
                     "debug-event-slot-unavailability/",
@@ -977,6 +1017,7 @@ urlpatterns = [
                     include(
                         [
                             path("", ExpenseListView.as_view(), name="expense_list"),
+                            path("csv/", ExpenseListCSVView.as_view(), name="expense_list_csv"),
                             path(
                                 "<uuid:pk>/",
                                 include(
@@ -1348,6 +1389,11 @@ urlpatterns = [
                     PosSaleListView.as_view(),
                     name="possale_list",
                 ),
+                path(
+                    "sales/csv/",
+                    PosSaleCSVView.as_view(),
+                    name="possale_list_csv",
+                ),
                 path(
                     "sales/import/",
                     PosSalesImportView.as_view(),
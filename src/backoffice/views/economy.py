@@ -7,12 +7,12 @@ from io import StringIO
 
 import magic
 from django.contrib import messages
-from django.db.models import Count
-from django.db.models import Q
-from django.db.models import Sum
+from django.core.files import File
+from django.http import FileResponse
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils import timezone
 from django.views.generic import CreateView
 from django.views.generic import DeleteView
 from django.views.generic import DetailView
@@ -54,6 +54,7 @@ from economy.utils import MobilePayCSVImporter
 from economy.utils import ZettleExcelImporter
 from economy.utils import import_clearhaus_csv
 from economy.utils import import_epay_csv
+from utils.mixins import CsvExportMixin
 from utils.mixins import VerbUpdateView
 
 logger = logging.getLogger(f"bornhack.{__name__}")
@@ -69,28 +70,7 @@ class ChainListView(CampViewMixin, EconomyTeamPermissionMixin, ListView):
 
     def get_queryset(self, *args, **kwargs):
         """Annotate the total count and amount for expenses and revenues for all credebtors in each chain."""
-        return Chain.objects.annotate(
-            camp_expenses_amount=Sum(
-                "credebtors__expenses__amount",
-                filter=Q(credebtors__expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_expenses_count=Count(
-                "credebtors__expenses",
-                filter=Q(credebtors__expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_amount=Sum(
-                "credebtors__revenues__amount",
-                filter=Q(credebtors__revenues__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_count=Count(
-                "credebtors__revenues",
-                filter=Q(credebtors__revenues__camp=self.camp),
-                distinct=True,
-            ),
-        )
+        return Chain.objects.with_camp_totals(self.camp)
 
 
 class ChainDetailView(CampViewMixin, EconomyTeamPermissionMixin, DetailView):
@@ -100,29 +80,7 @@ class ChainDetailView(CampViewMixin, EconomyTeamPermissionMixin, DetailView):
 
     def get_queryset(self, *args, **kwargs):
         """Annotate the Chain object with the camp filtered expense and revenue info."""
-        qs = super().get_queryset(*args, **kwargs)
-        return qs.annotate(
-            camp_expenses_amount=Sum(
-                "credebtors__expenses__amount",
-                filter=Q(credebtors__expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_expenses_count=Count(
-                "credebtors__expenses",
-                filter=Q(credebtors__expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_amount=Sum(
-                "credebtors__revenues__amount",
-                filter=Q(credebtors__revenues__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_count=Count(
-                "credebtors__revenues",
-                filter=Q(credebtors__revenues__camp=self.camp),
-                distinct=True,
-            ),
-        )
+        return super().get_queryset(*args, **kwargs).with_camp_totals(self.camp)
 
     def get_context_data(self, *args, **kwargs):
         """Add credebtors, expenses and revenues to the context in camp-filtered versions."""
@@ -131,49 +89,28 @@ class ChainDetailView(CampViewMixin, EconomyTeamPermissionMixin, DetailView):
         # include credebtors as a seperate queryset with annotations for total number and
         # amount of expenses and revenues
         context["credebtors"] = Credebtor.objects.filter(
-            chain=self.get_object(),
-        ).annotate(
-            camp_expenses_amount=Sum(
-                "expenses__amount",
-                filter=Q(expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_expenses_count=Count(
-                "expenses",
-                filter=Q(expenses__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_amount=Sum(
-                "revenues__amount",
-                filter=Q(revenues__camp=self.camp),
-                distinct=True,
-            ),
-            camp_revenues_count=Count(
-                "revenues",
-                filter=Q(revenues__camp=self.camp),
-                distinct=True,
-            ),
-        )
+            chain=self.object,
+        ).with_camp_totals(self.camp)
 
         # Include expenses and revenues for the Chain in context as seperate querysets,
         # since accessing them through the relatedmanager returns for all camps
         context["expenses"] = Expense.objects.filter(
             camp=self.camp,
-            creditor__chain=self.get_object(),
+            creditor__chain=self.object,
         ).prefetch_related("user", "creditor")
         context["revenues"] = Revenue.objects.filter(
             camp=self.camp,
-            debtor__chain=self.get_object(),
+            debtor__chain=self.object,
         ).prefetch_related("user", "debtor")
 
         # Include past years expenses and revenues for the Chain in context as separate querysets
         context["past_expenses"] = Expense.objects.filter(
             camp__camp__lt=self.camp.camp,
-            creditor__chain=self.get_object(),
+            creditor__chain=self.object,
         ).prefetch_related("user", "creditor")
         context["past_revenues"] = Revenue.objects.filter(
             camp__camp__lt=self.camp.camp,
-            debtor__chain=self.get_object(),
+            debtor__chain=self.object,
         ).prefetch_related("user", "debtor")
 
         return context
@@ -187,10 +124,10 @@ class CredebtorDetailView(CampViewMixin, EconomyTeamPermissionMixin, DetailView)
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
         context["expenses"] = (
-            self.get_object().expenses.filter(camp=self.camp).prefetch_related("user", "creditor")
+            self.object.expenses.filter(camp=self.camp).prefetch_related("user", "creditor")
         )
         context["revenues"] = (
-            self.get_object().revenues.filter(camp=self.camp).prefetch_related("user", "debtor")
+            self.object.revenues.filter(camp=self.camp).prefetch_related("user", "debtor")
         )
         return context
 
@@ -261,6 +198,46 @@ class ExpenseUpdateView(CampViewMixin, EconomyTeamPermissionMixin, UpdateView):
         )
 
 
+class ExpenseListCSVView(CampViewMixin, EconomyTeamPermissionMixin, CsvExportMixin, ListView):
+    """CSV export of all expenses for the camp."""
+
+    model = Expense
+    csv_header = (
+        "uuid",
+        "created",
+        "creating_user",
+        "creditor",
+        "amount",
+        "description",
+        "invoice_date",
+        "approved",
+        "payment_status",
+        "paid_by_bornhack",
+        "reimbursement",
+    )
+
+    def get_csv_filename(self) -> str:
+        return f"bornhack-{self.camp.slug}-expenses-{timezone.now()}.csv"
+
+    def get_csv_queryset(self):
+        return self.get_queryset().select_related("user", "creditor").order_by("invoice_date", "created")
+
+    def get_csv_row(self, expense) -> list:
+        return [
+            expense.uuid,
+            expense.created,
+            expense.user,
+            expense.creditor,
+            expense.amount,
+            expense.description,
+            expense.invoice_date,
+            expense.approved,
+            expense.payment_status,
+            expense.paid_by_bornhack,
+            expense.reimbursement_id,
+        ]
+
+
 ######################################
 # REIMBURSEMENTS
 
@@ -445,16 +422,16 @@ class BankCSVUploadView(CampViewMixin, EconomyTeamPermissionMixin, FormView):
             account = BankAccount.objects.get(pk=file_id)
             csvdata = file_handle.read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=";", quotechar='"')
-            imported = account.import_csv(reader)
-            if imported:
+            result = account.import_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Successfully imported {imported} new transactions for bank account {account.name} ({account.pk})",
+                    f"Successfully imported {result.created} new transactions for bank account {account.name} ({account.pk}): {result}",
                 )
             else:
                 messages.info(
                     self.request,
-                    f"No new transactions were created for bank account {account.name} ({account.pk}). Transaction text descriptions may have been updated.",
+                    f"No new transactions were created for bank account {account.name} ({account.pk}): {result}",
                 )
         return redirect(
             reverse(
@@ -537,76 +514,76 @@ class CoinifyCSVImportView(CampViewMixin, EconomyTeamPermissionMixin, FormView):
         if "payment_intents" in form.files:
             csvdata = form.files["payment_intents"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_payment_intent_csv(reader)
-            if created:
+            result = CoinifyCSVImporter.import_coinify_payment_intent_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Payment Intent CSV processed OK. Successfully imported {created} new Coinify payment intents.",
+                    f"Payment Intent CSV processed OK. Successfully imported {result.created} new Coinify payment intents ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Payment Intent CSV processed OK. No new Coinify payment intents were created.",
+                    f"Payment Intent CSV processed OK. No new Coinify payment intents were created ({result}).",
                 )
 
         if "settlements" in form.files:
             csvdata = form.files["settlements"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_settlements_csv(reader)
-            if created:
+            result = CoinifyCSVImporter.import_coinify_settlements_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Settlements CSV processed OK. Successfully imported {created} new Coinify settlements.",
+                    f"Settlements CSV processed OK. Successfully imported {result.created} new Coinify settlements ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Settlements CSV processed OK. No new Coinify settlements were created.",
+                    f"Settlements CSV processed OK. No new Coinify settlements were created ({result}).",
                 )
 
         if "invoices" in form.files:
             csvdata = form.files["invoices"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
-            if created:
+            result = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Invoices CSV processed OK. Successfully imported {created} new Coinify invoices.",
+                    f"Invoices CSV processed OK. Successfully imported {result.created} new Coinify invoices ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Invoices CSV processed OK. No new Coinify invoices were created.",
+                    f"Invoices CSV processed OK. No new Coinify invoices were created ({result}).",
                 )
 
         if "payouts" in form.files:
             csvdata = form.files["payouts"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_payout_csv(reader)
-            if created:
+            result = CoinifyCSVImporter.import_coinify_payout_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Payouts CSV processed OK. Successfully imported {created} new Coinify payouts.",
+                    f"Payouts CSV processed OK. Successfully imported {result.created} new Coinify payouts ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Payouts CSV processed OK. No new Coinify payouts were created.",
+                    f"Payouts CSV processed OK. No new Coinify payouts were created ({result}).",
                 )
 
         if "balances" in form.files:
             csvdata = form.files["balances"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_balance_csv(reader)
-            if created:
+            result = CoinifyCSVImporter.import_coinify_balance_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Balances CSV processed OK. Successfully imported {created} new Coinify balances.",
+                    f"Balances CSV processed OK. Successfully imported {result.created} new Coinify balances ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Balances CSV processed OK. No new Coinify balances were created.",
+                    f"Balances CSV processed OK. No new Coinify balances were created ({result}).",
                 )
 
         return redirect(
@@ -634,16 +611,16 @@ class EpayCSVImportView(CampViewMixin, EconomyTeamPermissionMixin, FormView):
         if "transactions" in form.files:
             csvdata = form.files["transactions"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=";", quotechar='"')
-            created = import_epay_csv(reader)
-            if created:
+            result = import_epay_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"ePay Transactions CSV processed OK. Successfully imported {created} new ePay Transactions.",
+                    f"ePay Transactions CSV processed OK. Successfully imported {result.created} new ePay Transactions ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "ePay Transactions CSV processed OK. No new ePay Transactions were created.",
+                    f"ePay Transactions CSV processed OK. No new ePay Transactions were created ({result}).",
                 )
 
         return redirect(
@@ -682,16 +659,16 @@ class ClearhausSettlementImportView(
         if "settlements" in form.files:
             csvdata = form.files["settlements"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=",", quotechar='"')
-            created = import_clearhaus_csv(reader)
-            if created:
+            result = import_clearhaus_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Clearhaus Settlements CSV processed OK. Successfully imported {created} new Clearhaus Settlements.",
+                    f"Clearhaus Settlements CSV processed OK. Successfully imported {result.created} new Clearhaus Settlements ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Clearhaus Settlements CSV processed OK. No new Clearhaus Settlements created, but some might have been updated.",
+                    f"Clearhaus Settlements CSV processed OK. No new Clearhaus Settlements created ({result}).",
                 )
 
         return redirect(
@@ -739,30 +716,30 @@ class ZettleDataImportView(CampViewMixin, EconomyTeamPermissionMixin, FormView):
     def form_valid(self, form):
         if "balances" in form.files:
             df = ZettleExcelImporter.load_zettle_balances_excel(form.files["balances"])
-            created = ZettleExcelImporter.import_zettle_balances_df(df)
-            if created:
+            result = ZettleExcelImporter.import_zettle_balances_df(df)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Zettle balances data processed OK. Successfully imported {created} new Zettle balances.",
+                    f"Zettle balances data processed OK. Successfully imported {result.created} new Zettle balances ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Zettle balances data processed OK. No new Zettle balances created.",
+                    f"Zettle balances data processed OK. No new Zettle balances created ({result}).",
                 )
 
         if "receipts" in form.files:
             df = ZettleExcelImporter.load_zettle_receipts_excel(form.files["receipts"])
-            created = ZettleExcelImporter.import_zettle_receipts_df(df)
-            if created:
+            result = ZettleExcelImporter.import_zettle_receipts_df(df)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"Zettle receipts data processed OK. Successfully imported {created} new Zettle receipts.",
+                    f"Zettle receipts data processed OK. Successfully imported {result.created} new Zettle receipts ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "Zettle receipts data processed OK. No new Zettle receipts created.",
+                    f"Zettle receipts data processed OK. No new Zettle receipts created ({result}).",
                 )
 
         return redirect(
@@ -790,31 +767,31 @@ class MobilePayCSVImportView(CampViewMixin, EconomyTeamPermissionMixin, FormView
         if "transfers" in form.files:
             csvdata = form.files["transfers"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
-            if created:
+            result = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"MobilePay Transfers/transactions CSV processed OK. Successfully imported {created} new MobilePay Transactions.",
+                    f"MobilePay Transfers/transactions CSV processed OK. Successfully imported {result.created} new MobilePay Transactions ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "MobilePay Transfers/transactions CSV processed OK. No new MobilePay Transactions created.",
+                    f"MobilePay Transfers/transactions CSV processed OK. No new MobilePay Transactions created ({result}).",
                 )
 
         if "sales" in form.files:
             csvdata = form.files["sales"].read().decode("utf-8-sig")
             reader = csv.reader(StringIO(csvdata), delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
-            if created:
+            result = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
+            if result.created:
                 messages.success(
                     self.request,
-                    f"MobilePay Sales CSV processed OK. Successfully imported {created} new MobilePay Transactions.",
+                    f"MobilePay Sales CSV processed OK. Successfully imported {result.created} new MobilePay Transactions ({result}).",
                 )
             else:
                 messages.info(
                     self.request,
-                    "MobilePay Sales CSV processed OK. No new MobilePay Transactions created.",
+                    f"MobilePay Sales CSV processed OK. No new MobilePay Transactions created ({result}).",
                 )
 
         return redirect(
@@ -847,10 +824,11 @@ class AccountingExportCreateView(CampViewMixin, EconomyTeamPermissionMixin, Crea
         exporter.doit()
 
         # add the archive to the model and save
-        export.archive.save(
-            f"bornhack_accounting_export_from_{export.date_from}_to_{export.date_to}_{export.uuid}.zip",
-            exporter.archivedata,
-        )
+        with exporter.archivedata as archive:
+            export.archive.save(
+                f"bornhack_accounting_export_from_{export.date_from}_to_{export.date_to}_{export.uuid}.zip",
+                File(archive),
+            )
 
         # some feedback and redirect
         messages.success(
@@ -928,14 +906,13 @@ class AccountingExportDownloadArchiveView(
 
     def get(self, request, *args, **kwargs):
         ae = self.get_object()
-        archive = ae.archive.read()
-        mimetype = magic.from_buffer(archive, mime=True)
-        response = HttpResponse(content_type=mimetype)
-        response["Content-Disposition"] = (
-            f"attachment; filename=bornhack_accounting_export_from_{ae.date_from}_to_{ae.date_to}_{ae.uuid}.zip"
+        # stream the archive instead of reading it into memory
+        return FileResponse(
+            ae.archive.open("rb"),
+            as_attachment=True,
+            filename=f"bornhack_accounting_export_from_{ae.date_from}_to_{ae.date_to}_{ae.uuid}.zip",
+            content_type="application/zip",
         )
-        response.write(archive)
-        return response
 
 
 class AccountingExportDownloadFileView(
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-import csv
+import json
 import logging
+from datetime import datetime
+from datetime import timedelta
 
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -11,14 +13,18 @@ from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseForbidden
 from django.http import HttpResponseRedirect
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.generic import DetailView
 from django.views.generic import FormView
 from django.views.generic import ListView
 from django.views.generic import TemplateView
 from django.views.generic import UpdateView
+from django.views.generic import View
 
 from backoffice.forms import InvoiceDownloadForm
 from backoffice.forms import ShopTicketRefundFormSet
@@ -33,34 +39,19 @@ from shop.models import Invoice
 from shop.models import Order
 from shop.models import OrderProductRelation
 from shop.models import Refund
-from tickets.models import PrizeTicket
+from tickets.models import TICKET_MODELS
+from tickets.models import DeletedTicket
 from tickets.models import ShopTicket
-from tickets.models import SponsorTicket
 from tickets.models import TicketType
 from tickets.models import TicketTypeUnion
+from tickets.models import get_ticket_by_pk
+from tickets.models import get_ticket_by_token
+from utils.mixins import CsvExportMixin
 from utils.mixins import GetObjectMixin
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
-def _ticket_getter_by_token(token) -> TicketTypeUnion | None:
-    for ticket_class in [ShopTicket, SponsorTicket, PrizeTicket]:
-        try:
-            return ticket_class.objects.get(Q(token=token) | Q(badge_token=token))
-        except ticket_class.DoesNotExist:
-            continue
-    return None
-
-
-def _ticket_getter_by_pk(pk):
-    for ticket_class in [ShopTicket, SponsorTicket, PrizeTicket]:
-        try:
-            return ticket_class.objects.get(pk=pk)
-        except ticket_class.DoesNotExist:
-            pass
-    return None
-
-
 class ScanTicketsPosSelectView(
     LoginRequiredMixin,
     InfoTeamPermissionMixin,
@@ -117,7 +108,7 @@ class ScanTicketsView(
             if ticket_token[0] == "#":
                 ticket_token = ticket_token[1:]
 
-            ticket: TicketTypeUnion | None = _ticket_getter_by_token(ticket_token)
+            ticket: TicketTypeUnion | None = get_ticket_by_token(ticket_token)
 
             if ticket:
                 context["ticket"] = ticket
@@ -157,16 +148,15 @@ class ScanTicketsView(
 
     def check_in_ticket(self, request):
         check_in_ticket_id = request.POST.get("check_in_ticket_id")
-        ticket_to_check_in = _ticket_getter_by_pk(check_in_ticket_id)
+        ticket_to_check_in = get_ticket_by_pk(check_in_ticket_id)
         ticket_to_check_in.mark_as_used(pos=self.pos, user=request.user)
         messages.info(request, "Ticket checked-in!")
         return ticket_to_check_in
 
     def hand_out_badge(self, request):
         badge_ticket_id = request.POST.get("badge_ticket_id")
-        ticket_to_handout_badge_for = _ticket_getter_by_pk(badge_ticket_id)
-        ticket_to_handout_badge_for.badge_handed_out = True
-        ticket_to_handout_badge_for.save()
+        ticket_to_handout_badge_for = get_ticket_by_pk(badge_ticket_id)
+        ticket_to_handout_badge_for.mark_badge_as_handed_out(pos=self.pos)
         messages.info(request, "Badge marked as handed out!")
         return ticket_to_handout_badge_for
 
@@ -176,6 +166,181 @@ class ScanTicketsView(
         messages.success(request, f"Order #{order.id} has been marked as paid!")
 
 
+class ScanTicketsSyncView(
+    LoginRequiredMixin,
+    InfoTeamPermissionMixin,
+    CampViewMixin,
+    View,
+):
+    """JSON endpoint for scanner devices which keep working when the network is down.
+
+    The device POSTs the scans it made since the last sync, and the cursor it got
+    from the last sync:
+
+        {
+            "cursor": "2026-08-01T12:00:00+00:00",
+            "scans": [
+                {"id": "a1", "token": "...", "action": "check_in", "scanned_at": "2026-08-01T12:01:02+00:00"},
+                {"id": "a2", "token": "...", "action": "badge", "scanned_at": "2026-08-01T12:01:09+00:00"}
+            ]
+        }
+
+    All scans are applied in one transaction. The response has a result per scan,
+    with "conflict" for tickets already used or badges already handed out elsewhere,
+    and the tickets changed since the cursor as [token, badge_token, used, badge_handed_out]
+    lists for validating scans offline. Without a cursor all tickets for the camp are returned.
+    The tokens of tickets deleted since the cursor (like by a refund) are returned as removed.
+
+    Sending the same scans again (like after a lost response) gives the same results.
+    The returned cursor is cursor_overlap before the request, so tickets changed by
+    transactions which commit after this one started are included in the next sync.
+    """
+
+    # the largest number of scans accepted in one sync
+    max_scans = 1000
+
+    # how far back the returned cursor is, longer than any transaction changing tickets
+    cursor_overlap = timedelta(minutes=5)
+
+    def dispatch(self, *args, **kwargs):
+        """Method for preventing changes to read-only camps."""
+        if self.camp.read_only:
+            return HttpResponseForbidden("Camp is read-only")
+        return super().dispatch(*args, **kwargs)
+
+    def setup(self, *args, **kwargs) -> None:
+        super().setup(*args, **kwargs)
+        self.pos = get_object_or_404(Pos, team__camp=self.camp, slug=kwargs["pos_slug"])
+
+    def post(self, request, *args, **kwargs):
+        now = timezone.now()
+        try:
+            data = json.loads(request.body)
+            scans = data.get("scans", [])
+            cursor = parse_datetime(data["cursor"]) if data.get("cursor") else None
+            if not isinstance(scans, list) or len(scans) > self.max_scans:
+                raise ValueError(f"scans must be a list of at most {self.max_scans} scans")
+        except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+            return JsonResponse({"error": f"Invalid request: {e}"}, status=400)
+
+        with transaction.atomic():
+            results = self.apply_scans(scans, now)
+
+        return JsonResponse(
+            {
+                "results": results,
+                "cursor": (now - self.cursor_overlap).isoformat(),
+                "tickets": self.get_ticket_delta(cursor),
+                "removed": self.get_removed_tokens(cursor),
+            },
+        )
+
+    def apply_scans(self, scans, now):
+        """Apply the scans in the order they were made and return a result for each."""
+        tokens = {str(scan.get("token")) for scan in scans if isinstance(scan, dict)}
+        tickets = {}
+        for model in TICKET_MODELS:
+            for ticket in (
+                model._base_manager.select_for_update(of=("self",))
+                .select_related("used_pos")
+                .filter(Q(token__in=tokens) | Q(badge_token__in=tokens), ticket_type__camp=self.camp)
+            ):
+                tickets[ticket.token] = ticket
+                tickets[ticket.badge_token] = ticket
+
+        results = []
+        valid_scans = []
+        for scan in scans:
+            result = {"id": scan.get("id") if isinstance(scan, dict) else None}
+            results.append(result)
+            try:
+                scanned_at = parse_datetime(str(scan.get("scanned_at", ""))) if isinstance(scan, dict) else None
+            except ValueError:
+                # well formed but not a valid datetime, like month 13
+                scanned_at = None
+            if scanned_at is None or scan.get("action") not in ["check_in", "badge"]:
+                result["status"] = "invalid"
+                continue
+            if timezone.is_naive(scanned_at):
+                scanned_at = timezone.make_aware(scanned_at)
+            ticket = tickets.get(str(scan.get("token")))
+            if ticket is None:
+                result["status"] = "not_found"
+                continue
+            result["ticket"] = str(ticket.pk)
+            # scans from the future are clamped to now, they would confuse the conflict detection
+            valid_scans.append((min(scanned_at, now), scan, ticket, result))
+
+        changed = {}
+        # apply the scans in the order they were made
+        for scanned_at, scan, ticket, result in sorted(valid_scans, key=lambda item: item[0]):
+            if scan["action"] == "check_in":
+                # the same scan sent again after a lost response is not a conflict
+                if ticket.used_at and (ticket.used_pos != self.pos or ticket.used_at != scanned_at):
+                    result["status"] = "conflict"
+                    result["used_at"] = ticket.used_at.isoformat()
+                    result["used_pos"] = ticket.used_pos.name if ticket.used_pos else None
+                    continue
+                ticket.used_at = scanned_at
+                ticket.used_pos = self.pos
+                ticket.used_pos_user = self.request.user
+            else:
+                # the same scan sent again after a lost response is not a conflict
+                if ticket.badge_handed_out and (
+                    ticket.badge_handed_out_pos_id != self.pos.pk or ticket.badge_handed_out_at != scanned_at
+                ):
+                    result["status"] = "conflict"
+                    continue
+                ticket.badge_handed_out = True
+                ticket.badge_handed_out_at = scanned_at
+                ticket.badge_handed_out_pos = self.pos
+            ticket.updated = now
+            changed[ticket.pk] = ticket
+            result["status"] = "ok"
+
+        for model in TICKET_MODELS:
+            model._base_manager.bulk_update(
+                [ticket for ticket in changed.values() if isinstance(ticket, model)],
+                [
+                    "used_at",
+                    "used_pos",
+                    "used_pos_user",
+                    "badge_handed_out",
+                    "badge_handed_out_at",
+                    "badge_handed_out_pos",
+                    "updated",
+                ],
+            )
+        return results
+
+    def get_ticket_delta(self, cursor: datetime | None) -> list:
+        """Return the tickets for the camp changed since the cursor, or all of them."""
+        tickets = []
+        for model in TICKET_MODELS:
+            qs = model._base_manager.filter(ticket_type__camp=self.camp)
+            if cursor:
+                qs = qs.filter(updated__gte=cursor)
+            tickets += [
+                [token, badge_token, used_at is not None, badge_handed_out]
+                for token, badge_token, used_at, badge_handed_out in qs.values_list(
+                    "token",
+                    "badge_token",
+                    "used_at",
+                    "badge_handed_out",
+                )
+            ]
+        return tickets
+
+    def get_removed_tokens(self, cursor: datetime | None) -> list:
+        """Return the tokens of the tickets for the camp deleted since the cursor."""
+        if not cursor:
+            # the device gets the full list of tickets
+            return []
+        return list(
+            DeletedTicket.objects.filter(camp=self.camp, created__gte=cursor).values_list("token", flat=True),
+        )
+
+
 class ShopTicketOverview(
     LoginRequiredMixin,
     InfoTeamPermissionMixin,
@@ -319,25 +484,25 @@ class InvoiceDownloadMultipleView(CampViewMixin, EconomyTeamPermissionMixin, For
         return render(self.request, self.template_name, context)
 
 
-class InvoiceListCSVView(CampViewMixin, InfoTeamPermissionMixin, ListView):
+class InvoiceListCSVView(CampViewMixin, InfoTeamPermissionMixin, CsvExportMixin, ListView):
     """CSV export of invoices for bookkeeping stuff."""
 
-    def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = f'attachment; filename="bornhack-infoices-{timezone.now()}.csv"'
-        writer = csv.writer(response)
-        writer.writerow(["invoice", "invoice_date", "amount_dkk", "order", "paid"])
-        for invoice in Invoice.objects.all().order_by("-id"):
-            writer.writerow(
-                [
-                    invoice.id,
-                    invoice.created.date(),
-                    (invoice.order.total if invoice.order else invoice.customorder.amount),
-                    invoice.get_order,
-                    invoice.get_order.paid,
-                ],
-            )
-        return response
+    csv_header = ("invoice", "invoice_date", "amount_dkk", "order", "paid")
+
+    def get_csv_filename(self) -> str:
+        return f"bornhack-infoices-{timezone.now()}.csv"
+
+    def get_csv_queryset(self):
+        return Invoice.objects.with_order_total().order_by("-id")
+
+    def get_csv_row(self, invoice) -> list:
+        return [
+            invoice.id,
+            invoice.created.date(),
+            invoice.amount,
+            invoice.get_order,
+            invoice.get_order.paid,
+        ]
 
 
 class InvoiceDownloadView(LoginRequiredMixin, InfoTeamPermissionMixin, DetailView):
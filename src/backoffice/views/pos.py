@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import json
+import io
 import logging
 from typing import TYPE_CHECKING
 
@@ -8,6 +8,7 @@ from django.contrib import messages
 from django.db import models
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils import timezone
 from django.views.generic import DetailView
 from django.views.generic import ListView
 from django.views.generic.edit import CreateView
@@ -37,8 +38,10 @@ from economy.tables import PosProductTable
 from economy.tables import PosSaleTable
 from economy.tables import PosTransactionTable
 from economy.utils import import_pos_sales_json
+from economy.utils import iter_json_objects
 from teams.models import Team
 from utils.mixins import AnyTeamPosRequiredMixin
+from utils.mixins import CsvExportMixin
 
 if TYPE_CHECKING:
     from django.db.models import QuerySet
@@ -327,17 +330,64 @@ class PosSaleListView(
         return context
 
 
+class PosSaleCSVView(
+    CampViewMixin,
+    AnyTeamPosRequiredMixin,
+    CsvExportMixin,
+    FilterView,
+):
+    """CSV export of the PosSale objects matching the filter from PosSaleListView."""
+
+    model = PosSale
+    filterset_class = PosSaleFilter
+    csv_header = (
+        "pos",
+        "transaction",
+        "timestamp",
+        "product",
+        "brand",
+        "name",
+        "description",
+        "unit_size",
+        "size_unit",
+        "tags",
+        "sales_price",
+    )
+
+    def get_csv_filename(self) -> str:
+        return f"bornhack-{self.camp.slug}-pos-sales-{timezone.now()}.csv"
+
+    def get_csv_queryset(self):
+        filterset = self.get_filterset(self.get_filterset_class())
+        return filterset.qs.select_related("transaction__pos", "product").order_by("transaction__timestamp")
+
+    def get_csv_row(self, sale) -> list:
+        return [
+            sale.transaction.pos.name,
+            sale.transaction.external_transaction_id,
+            sale.transaction.timestamp,
+            sale.product.external_id,
+            sale.product.brand_name,
+            sale.product.name,
+            sale.product.description,
+            sale.product.unit_size,
+            sale.product.size_unit,
+            sale.product.tags,
+            sale.sales_price,
+        ]
+
+
 class PosSalesImportView(CampViewMixin, OrgaTeamPermissionMixin, FormView):
     form_class = PosSalesJSONForm
     template_name = "pos_sales_json_upload_form.html"
 
     def form_valid(self, form):
         if "sales" in form.files:
-            sales_data = json.loads(form.files["sales"].read().decode())
-            products, transactions, sales = import_pos_sales_json(sales_data)
+            sales_data = iter_json_objects(io.TextIOWrapper(form.files["sales"], encoding="utf-8"))
+            products, transactions, sales, costs = import_pos_sales_json(sales_data)
             messages.success(
                 self.request,
-                f"PoS sales json processed OK. Created {products} new products and {transactions} new transactions containing {sales} new sales.",
+                f"PoS sales json processed OK. Created {products} new products and {transactions} new transactions containing {sales} new sales and {costs} new product costs.",
             )
         return redirect(
             reverse(
@@ -20,7 +20,7 @@ from django.views.generic.edit import DeleteView
 from django.views.generic.edit import FormView
 from django.views.generic.edit import UpdateView
 
-from backoffice.forms import AutoScheduleApplyForm
+from backoffice.forms import AutoScheduleJobForm
 from backoffice.forms import AutoScheduleValidateForm
 from backoffice.forms import EventScheduleForm
 from backoffice.forms import SpeakerForm
@@ -29,6 +29,7 @@ from camps.mixins import CampViewMixin
 from program.autoscheduler import AutoScheduler
 from program.email import add_event_scheduled_email
 from program.mixins import AvailabilityMatrixViewMixin
+from program.models import AutoScheduleJob
 from program.models import Event
 from program.models import EventLocation
 from program.models import EventProposal
@@ -37,6 +38,7 @@ from program.models import EventSlot
 from program.models import EventType
 from program.models import Speaker
 from program.models import SpeakerProposal
+from program.utils import EventSlotAvailability
 from program.utils import save_speaker_availability
 
 logger = logging.getLogger(f"bornhack.{__name__}")
@@ -505,12 +507,14 @@ class EventScheduleView(CampViewMixin, ContentTeamPermissionMixin, FormView):
         form = super().get_form(*args, **kwargs)
         self.slots = []
         slotindex = 0
+        # find the free slots for all sessions at once
+        availability = EventSlotAvailability(self.camp)
         # loop over sessions, get free slots
         for session in self.camp.event_sessions.filter(
             event_type=self.event.event_type,
             event_duration_minutes__gte=self.event.duration_minutes,
         ):
-            for slot in session.get_available_slots():
+            for slot in availability.get_available_slots(session):
                 # loop over speakers to see if they are all available
                 for speaker in self.event.speakers.all():
                     if not speaker.is_available(slot.when):
@@ -624,6 +628,10 @@ class EventSessionFormViewMixin:
         context["event_location"] = self.event_location
 
         context["sessions"] = self.event_type.event_sessions.filter(camp=self.camp)
+        # share one EventSlotAvailability between the sessions for the free_time column
+        availability = EventSlotAvailability(self.camp)
+        for session in context["sessions"]:
+            session.slot_availability = availability
         return context
 
 
@@ -816,6 +824,9 @@ class AutoScheduleValidateView(CampViewMixin, ContentTeamPermissionMixin, FormVi
     """This view is used to validate schedules. It uses the AutoScheduler and can
     either validate the currently applied schedule or a new similar schedule, or a
     brand new schedule.
+
+    Calculating a similar or new schedule can take a long time, so those are
+    created as an AutoScheduleJob and validated by the autoschedule worker.
     """
 
     template_name = "autoschedule_validate.html"
@@ -825,41 +836,25 @@ class AutoScheduleValidateView(CampViewMixin, ContentTeamPermissionMixin, FormVi
         kwargs = copy.deepcopy(form.cleaned_data)
         del kwargs["schedule"]
 
+        if form.cleaned_data["schedule"] != "current":
+            job = AutoScheduleJob.objects.create(
+                camp=self.camp,
+                user=self.request.user,
+                schedule=form.cleaned_data["schedule"],
+                constraints=kwargs,
+            )
+            messages.success(
+                self.request,
+                f"AutoScheduleJob #{job.pk} created, the schedule will be calculated and validated in the background.",
+            )
+            return redirect(job.get_absolute_url())
+
         # initialise AutoScheduler
         scheduler = AutoScheduler(camp=self.camp, **kwargs)
-        autoschedule = None
 
         # get autoschedule
-        if form.cleaned_data["schedule"] == "current":
-            try:
-                autoschedule = scheduler.build_current_autoschedule()
-                message = f"The currently scheduled Events form a valid schedule! AutoScheduler has {len(scheduler.autoslots)} Slots based on {scheduler.event_sessions.count()} EventSessions for {scheduler.event_types.count()} EventTypes. {scheduler.events.count()} Events in the schedule."
-            except ValueError:
-                messages.error(
-                    self.request,
-                    "Unable to calculate autoschedule, no valid solution found!",
-                )
-        elif form.cleaned_data["schedule"] == "similar":
-            try:
-                original_autoschedule = scheduler.build_current_autoschedule()
-                autoschedule, diff = scheduler.calculate_similar_autoschedule(
-                    original_autoschedule,
-                )
-                message = f"The new similar schedule is valid! AutoScheduler has {len(scheduler.autoslots)} Slots based on {scheduler.event_sessions.count()} EventSessions for {scheduler.event_types.count()} EventTypes. Differences to the current schedule: {len(diff['event_diffs'])} Event diffs and {len(diff['slot_diffs'])} Slot diffs."
-            except ValueError:
-                messages.error(
-                    self.request,
-                    "Unable to calculate autoschedule, no valid solution found!",
-                )
-        elif form.cleaned_data["schedule"] == "new":
-            try:
-                autoschedule = scheduler.calculate_autoschedule()
-                message = f"The new schedule is valid! AutoScheduler has {len(scheduler.autoslots)} Slots based on {scheduler.event_sessions.count()} EventSessions for {scheduler.event_types.count()} EventTypes. {scheduler.events.count()} Events in the schedule."
-            except ValueError:
-                messages.error(
-                    self.request,
-                    "Unable to calculate autoschedule, no valid solution found!",
-                )
+        autoschedule = scheduler.build_current_autoschedule()
+        message = f"The currently scheduled Events form a valid schedule! AutoScheduler has {len(scheduler.autoslots)} Slots based on {scheduler.event_sessions.count()} EventSessions for {scheduler.event_types.count()} EventTypes. {scheduler.events.count()} Events in the schedule."
 
         if autoschedule:
             # check validity
@@ -881,37 +876,110 @@ class AutoScheduleValidateView(CampViewMixin, ContentTeamPermissionMixin, FormVi
 
 
 class AutoScheduleDiffView(CampViewMixin, ContentTeamPermissionMixin, TemplateView):
+    """Show the diff between the current schedule and the latest similar schedule
+    calculated by the autoschedule worker.
+    """
+
     template_name = "autoschedule_diff.html"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        scheduler = AutoScheduler(camp=self.camp)
-        autoschedule, diff = scheduler.calculate_similar_autoschedule()
-        context["diff"] = diff
-        context["scheduler"] = scheduler
+        job = self.camp.autoschedule_jobs.filter(
+            schedule="similar",
+            status=AutoScheduleJob.STATUS_FINISHED,
+        ).first()
+        context["job"] = job
+        if job:
+            scheduler = AutoScheduler(camp=self.camp, **job.constraints)
+            try:
+                autoschedule = scheduler.load_autoschedule(
+                    job.result["schedule"],
+                    input_hash=job.result.get("input_hash"),
+                )
+            except ValueError:
+                context["outdated"] = True
+            else:
+                context["diff"] = scheduler.diff(
+                    scheduler.build_current_autoschedule(),
+                    autoschedule,
+                )
+                context["scheduler"] = scheduler
         return context
 
 
-class AutoScheduleApplyView(CampViewMixin, ContentTeamPermissionMixin, FormView):
-    """This view is used by the Content Team to apply a new schedules by unscheduling
-    all autoscheduled Events, and scheduling all Event/Slot combinations in the schedule.
+class AutoScheduleJobListView(CampViewMixin, ContentTeamPermissionMixin, ListView):
+    """List AutoScheduleJobs for this camp."""
+
+    model = AutoScheduleJob
+    template_name = "autoschedule_job_list.html"
+
+
+class AutoScheduleJobCreateView(CampViewMixin, ContentTeamPermissionMixin, FormView):
+    """Create an AutoScheduleJob to calculate a schedule in the background."""
+
+    template_name = "autoschedule_job_create.html"
+    form_class = AutoScheduleJobForm
+
+    def form_valid(self, form):
+        constraints = copy.deepcopy(form.cleaned_data)
+        del constraints["schedule"]
+        del constraints["time_limit"]
+        del constraints["decompose"]
+        job = AutoScheduleJob.objects.create(
+            camp=self.camp,
+            user=self.request.user,
+            schedule=form.cleaned_data["schedule"],
+            time_limit=form.cleaned_data["time_limit"],
+            decompose=form.cleaned_data["decompose"],
+            constraints=constraints,
+        )
+        messages.success(
+            self.request,
+            f"AutoScheduleJob #{job.pk} created, the schedule will be calculated in the background.",
+        )
+        return redirect(job.get_absolute_url())
+
+
+class AutoScheduleJobDetailView(CampViewMixin, ContentTeamPermissionMixin, DetailView):
+    """Show status and result for an AutoScheduleJob. The template reloads the page until the job is done."""
+
+    model = AutoScheduleJob
+    template_name = "autoschedule_job_detail.html"
+    context_object_name = "job"
+
+
+class AutoScheduleJobApplyView(CampViewMixin, ContentTeamPermissionMixin, UpdateView):
+    """This view is used by the Content Team to apply the schedule calculated by an
+    AutoScheduleJob by unscheduling all autoscheduled Events, and scheduling all
+    Event/Slot combinations in the schedule.
 
     TODO: see comment in program.autoscheduler.AutoScheduler.apply() method.
     """
 
-    template_name = "autoschedule_apply.html"
-    form_class = AutoScheduleApplyForm
+    model = AutoScheduleJob
+    template_name = "autoschedule_job_apply.html"
+    fields = []
+    context_object_name = "job"
 
     def form_valid(self, form):
-        # initialise AutoScheduler
-        scheduler = AutoScheduler(camp=self.camp)
+        job = self.get_object()
+        if job.status != AutoScheduleJob.STATUS_FINISHED:
+            messages.error(self.request, "This job has not finished, cannot apply!")
+            return redirect(job.get_absolute_url())
 
-        # get autoschedule
-        if form.cleaned_data["schedule"] == "similar":
-            autoschedule, diff = scheduler.calculate_similar_autoschedule()
-        elif form.cleaned_data["schedule"] == "new":
-            autoschedule = scheduler.calculate_autoschedule()
-            diff = None
+        # initialise AutoScheduler
+        scheduler = AutoScheduler(camp=self.camp, **job.constraints)
+        try:
+            autoschedule = scheduler.load_autoschedule(
+                job.result["schedule"],
+                input_hash=job.result.get("input_hash"),
+            )
+        except ValueError:
+            messages.error(
+                self.request,
+                "Events or EventSlots changed since this schedule was calculated, cannot apply! Please calculate a new schedule.",
+            )
+            return redirect(job.get_absolute_url())
 
         # check validity
         valid, violations = scheduler.is_valid(autoschedule, return_violations=True)
@@ -922,19 +990,9 @@ class AutoScheduleApplyView(CampViewMixin, ContentTeamPermissionMixin, FormView)
                 self.request,
                 f"Schedule has been applied! {deleted} Events removed from schedule, {created} new Events scheduled.",
             )
-            if diff:
-                messages.success(
-                    self.request,
-                    "Differences to the previous schedule: {len(diff['event_diffs'])} Event diffs and {len(diff['slot_diffs'])} Slot diffs.",
-                )
         else:
             messages.error(self.request, "Schedule is NOT valid, cannot apply!")
-        return redirect(
-            reverse(
-                "backoffice:autoschedule_apply",
-                kwargs={"camp_slug": self.camp.slug},
-            ),
-        )
+        return redirect(job.get_absolute_url())
 
 
 class AutoScheduleDebugEventSlotUnavailabilityView(
@@ -284,6 +284,45 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "tile-cache",
     },
+    # the schedule documents and versions of program.schedule_snapshot and the generation
+    # of camps.registry, shared by all processes
+    "schedule": SCHEDULE_CACHE,  # noqa: F405
+}
+
+# the number of CSV files the accounting export writes at the same time,
+# each of them uses a database connection of its own
+ACCOUNTING_EXPORT_WORKERS = 4
+
+# how long to cache the Frab XML and ICS schedule exports, in seconds. The cache is also
+# invalidated when the schedule version changes, this is a backstop for changes
+# which do not bump the version (like Event URLs).
+SCHEDULE_EXPORT_CACHE_TIMEOUT = 600
+
+# an AutoScheduleJob which has been running for longer than this many seconds is assumed
+# to belong to a crashed autoschedule worker and is run again. Keep it well above the
+# time limit used for the jobs.
+AUTOSCHEDULE_JOB_TIMEOUT = 6 * 60 * 60
+
+# the number of processes the invoiceworker uses to generate PDF files. Documents are
+# claimed with SKIP LOCKED so it is also safe to run more than one invoiceworker.
+INVOICEWORKER_PDF_PROCESSES = 1
+
+# the outgoing email worker claims this many emails at a time and sends them over one
+# SMTP connection, sending at most OUTGOING_EMAIL_RATE_LIMIT emails per second (0 for
+# no limit). Emails failing OUTGOING_EMAIL_MAX_ATTEMPTS times are put on hold.
+OUTGOING_EMAIL_BATCH_SIZE = 100
+OUTGOING_EMAIL_RATE_LIMIT = 0
+OUTGOING_EMAIL_MAX_ATTEMPTS = 5
+
+# keep rendered QR codes in this directory as well as in memory, None to only use memory
+QR_CODE_CACHE_DIR = None
+
+# the models each worker module processes. Saving an object of one of the models wakes
+# up the worker modules listing it, when run with "run_managepy_worker --listen"
+WORKER_WAKEUP_MODELS = {
+    "program.autoscheduleworker": ["program.AutoScheduleJob"],
+    "shop.invoiceworker": ["shop.Order", "shop.CustomOrder", "shop.Refund", "shop.Invoice", "shop.CreditNote"],
+    "utils.outgoingemailworker": ["utils.OutgoingEmail"],
 }
 
 # Use pytest as test runner for integrating with `./manage.py test`
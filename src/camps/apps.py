@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+from django.apps import AppConfig
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+
+
+class CampsConfig(AppConfig):
+    name = "camps"
+
+    def ready(self) -> None:
+        from .registry import invalidate_camp_registry
+
+        # drop the cached camps when a camp changes
+        post_save.connect(
+            invalidate_camp_registry,
+            sender="camps.Camp",
+            dispatch_uid="camp_registry_save_signal",
+        )
+        post_delete.connect(
+            invalidate_camp_registry,
+            sender="camps.Camp",
+            dispatch_uid="camp_registry_delete_signal",
+        )
@@ -6,15 +6,15 @@ list in tempalte context but not all views need queryset filtering by camp.
 
 from __future__ import annotations
 
-from .models import Camp
+from .registry import get_request_camps
 
 
 def camp(request):
     """If we have a camp in the request object (added by RequestCampMiddleware based on
     the camp_slug url kwarg) add it to the context.
-    Also add a "camps" queryset containing all camps (used to build the menu and such).
+    Also add a "camps" list containing all camps (used to build the menu and such).
     """
     camp = None
     if hasattr(request, "camp"):
         camp = request.camp
-    return {"camps": Camp.objects.all().order_by("-camp"), "camp": camp}
+    return {"camps": get_request_camps(request), "camp": camp}
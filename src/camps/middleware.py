@@ -6,7 +6,7 @@ there is request.camp.
 
 from __future__ import annotations
 
-from django.shortcuts import get_object_or_404
+from .registry import get_request_camp
 
 
 class RequestCampMiddleware:
@@ -22,12 +22,9 @@ class RequestCampMiddleware:
 
     def process_view(self, request, view_func, view_args, view_kwargs) -> None:
         """Check url kwargs for a camp_slug and add camp to request object where relevant."""
-        from camps.models import Camp
-
         if (
             hasattr(request, "resolver_match")
             and request.resolver_match
             and "camp_slug" in request.resolver_match.kwargs
         ):
-            camp = get_object_or_404(Camp, slug=view_kwargs["camp_slug"])
-            request.camp = camp
+            get_request_camp(request, view_kwargs["camp_slug"])
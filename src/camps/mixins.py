@@ -8,13 +8,13 @@ from __future__ import annotations
 
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.shortcuts import get_object_or_404
 from django.views.generic import CreateView
 from django.views.generic import DeleteView
 from django.views.generic import FormView
 from django.views.generic import UpdateView
 
-from camps.models import Camp
+from camps.registry import get_request_camp
+from camps.registry import get_request_camps
 
 
 class CampViewMixin:
@@ -25,7 +25,7 @@ class CampViewMixin:
     def setup(self, *args, **kwargs) -> None:
         """Set self.camp, and raise PermissionDenied if camp is readonly and it is an edit view."""
         super().setup(*args, **kwargs)
-        self.camp = get_object_or_404(Camp, slug=self.kwargs["camp_slug"])
+        self.camp = get_request_camp(self.request, self.kwargs["camp_slug"])
         if self.camp.read_only and isinstance(
             self,
             FormView | CreateView | UpdateView | DeleteView,
@@ -85,7 +85,7 @@ class CampViewMixin:
         context = super().get_context_data(*args, **kwargs)
         context.update(
             {
-                "camps": Camp.objects.all().order_by("-camp"),
+                "camps": get_request_camps(self.request),
                 "camp": self.camp,
             },
         )
@@ -0,0 +1,108 @@
+"""Process-level registry of camps.
+
+Nearly every request needs the camp from the camp_slug url kwarg and the list of
+all camps for the menu. Camps rarely change, so the registry loads them all with
+one query and keeps them in memory.
+
+When a Camp is saved or deleted the generation number in the shared "schedule"
+cache is bumped. Each lookup reads the generation with one cache get, and the
+registry reloads the camps when it has changed, so all processes see the change
+on their next request.
+
+The registry hands out new Camp instances, so related objects cached on a camp
+during one request are never shared with another.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+# the cache key of the generation number, bumped whenever a camp changes
+GENERATION_KEY = "camp-registry:generation"
+
+
+class CampRegistry:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.rows = None
+        self.generation = None
+
+    def get_generation(self) -> int:
+        """Return the current generation from the shared cache."""
+        return caches["schedule"].get(GENERATION_KEY, 0)
+
+    def invalidate(self) -> None:
+        """Clear the registry in this process and bump the generation for all the others."""
+        cache = caches["schedule"]
+        cache.add(GENERATION_KEY, 0, None)
+        cache.incr(GENERATION_KEY)
+        self.rows = None
+
+    def get_rows(self):
+        """Return the field names and the rows of all camps, loading them if needed."""
+        generation = self.get_generation()
+        with self.lock:
+            if self.rows is None or self.generation != generation:
+                from .models import Camp
+
+                fields = [field.attname for field in Camp._meta.concrete_fields]
+                self.rows = (fields, list(Camp.objects.order_by("-camp").values_list(*fields)))
+                self.generation = generation
+            return self.rows
+
+    def get_camps(self) -> list:
+        """Return all camps, newest first."""
+        from .models import Camp
+
+        fields, rows = self.get_rows()
+        return [Camp.from_db("default", fields, row) for row in rows]
+
+    def get_camp(self, slug):
+        """Return the camp with the slug, or None."""
+        from .models import Camp
+
+        fields, rows = self.get_rows()
+        index = fields.index("slug")
+        for row in rows:
+            if row[index] == slug:
+                return Camp.from_db("default", fields, row)
+        return None
+
+
+camp_registry = CampRegistry()
+
+
+def invalidate_camp_registry(sender, **kwargs) -> None:
+    """post_save and post_delete signal handler for Camp."""
+    camp_registry.invalidate()
+    # another request might reload the old camps before the transaction commits
+    transaction.on_commit(camp_registry.invalidate)
+
+
+def get_request_camp(request, camp_slug):
+    """Return the camp for camp_slug and set it as request.camp, or raise Http404.
+
+    The camp is only looked up once per request, RequestCampMiddleware and
+    CampViewMixin share it.
+    """
+    camp = getattr(request, "camp", None)
+    if camp is None or camp.slug != camp_slug:
+        camp = camp_registry.get_camp(camp_slug)
+        if camp is None:
+            raise Http404(f"No camp with the slug {camp_slug}")
+        request.camp = camp
+    return camp
+
+
+def get_request_camps(request) -> list:
+    """Return the list of all camps, newest first, once per request."""
+    if not hasattr(request, "_camps"):
+        request._camps = camp_registry.get_camps()
+    return request._camps
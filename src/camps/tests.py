@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import datetime
+from unittest import mock
 
+from django.core.cache import caches
+from django.http import Http404
+from django.test import RequestFactory
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
+from camps.models import Camp
+from camps.registry import GENERATION_KEY
+from camps.registry import camp_registry
+from camps.registry import get_request_camp
+from camps.registry import get_request_camps
 from sponsors.models import Sponsor
 from tickets.models import PrizeTicket
 from tickets.models import ShopTicket
@@ -254,3 +263,39 @@ class TestCampModel(BornhackTestBase):
 
         assert self.camp.year == expected
 
+
+class TestCampRegistry(BornhackTestBase):
+    """Tests for the camp registry used by RequestCampMiddleware and CampViewMixin."""
+
+    def test_camp_resolved_once_per_request(self) -> None:
+        """The camp and camps list are loaded once, and new instances are handed out."""
+        request = RequestFactory().get("/")
+        camp = get_request_camp(request, self.camp.slug)
+        assert camp == self.camp
+        assert camp is not camp_registry.get_camp(self.camp.slug)
+        with self.assertNumQueries(0):
+            assert get_request_camp(request, self.camp.slug) is camp
+            assert get_request_camps(request) == get_request_camps(request)
+        with self.assertRaises(Http404):
+            get_request_camp(request, "no-such-camp")
+
+    def test_registry_invalidated_on_save(self) -> None:
+        """Saving a camp clears the registry."""
+        self.camp.title = "Renamed camp"
+        self.camp.save()
+        assert camp_registry.get_camp(self.camp.slug).title == "Renamed camp"
+
+    def test_registry_reloaded_on_new_generation(self) -> None:
+        """A camp saved in another process is seen on the next lookup, with one cache get per lookup."""
+        camp_registry.get_camps()
+        Camp.objects.filter(pk=self.camp.pk).update(title="Renamed elsewhere")
+        assert camp_registry.get_camp(self.camp.slug).title != "Renamed elsewhere"
+
+        # another process bumps the generation when it saves the camp
+        cache = caches["schedule"]
+        cache.add(GENERATION_KEY, 0, None)
+        cache.incr(GENERATION_KEY)
+        assert camp_registry.get_camp(self.camp.slug).title == "Renamed elsewhere"
+        with self.assertNumQueries(0), mock.patch.object(cache, "get", wraps=cache.get) as get:
+            camp_registry.get_camp(self.camp.slug)
+        get.assert_called_once()
@@ -4,7 +4,6 @@ from django.contrib import admin
 from django.utils import timezone
 
 from camps.models import Camp
-from economy.models import Pos
 
 
 def get_current_camp():
@@ -52,28 +51,31 @@ class CampPropertyListFilter(admin.SimpleListFilter):
         return queryset
 
 
-def get_closest_camp(timestamp, max_days_from_prev: int=0):
+def get_closest_camp(timestamp, max_days_from_prev: int = 0):
     """Return the Camp object happening closest to the provided datetime."""
+    return find_closest_camp(Camp.objects.all(), timestamp, max_days_from_prev)
+
+
+def find_closest_camp(camps, timestamp, max_days_from_prev: int = 0):
+    """Return the camp in camps happening closest to the provided datetime.
+
+    camps must be in the default Camp ordering. Importers which look up the camp
+    for many timestamps load the camps once and call this instead of get_closest_camp().
+    """
+    camps = list(camps)
+
     # is the timestamp during a camp?
-    try:
-        return Camp.objects.get(
-            buildup__startswith__lt=timestamp,
-            teardown__endswith__gt=timestamp,
-        )
-    except Camp.DoesNotExist:
-        pass
+    for camp in camps:
+        if camp.buildup.lower < timestamp < camp.teardown.upper:
+            return camp
 
     # get the upcoming/next camp after the timestamp
-    try:
-        next_camp = Camp.objects.filter(buildup__startswith__gt=timestamp).last()
-    except Pos.DoesNotExist:
-        next_camp = None
+    upcoming = [camp for camp in camps if camp.buildup.lower > timestamp]
+    next_camp = upcoming[-1] if upcoming else None
 
     # get the previous camp before the timestamp
-    try:
-        prev_camp = Camp.objects.filter(teardown__endswith__lt=timestamp).first()
-    except Pos.DoesNotExist:
-        prev_camp = None
+    previous = [camp for camp in camps if camp.teardown.upper < timestamp]
+    prev_camp = previous[0] if previous else None
 
     if not prev_camp:
         # no bornhack happened before the timestamp
@@ -87,7 +89,7 @@ def get_closest_camp(timestamp, max_days_from_prev: int=0):
     time_since_prev = timestamp - prev_camp.teardown.upper
     time_until_next = next_camp.buildup.lower - timestamp
 
-    if time_since_prev > time_until_next or ( max_days_from_prev and time_since_prev.days > max_days_from_prev):
+    if time_since_prev > time_until_next or (max_days_from_prev and time_since_prev.days > max_days_from_prev):
         # timestamp is closer to the next camp or max_days_from_prev was exceeded
         return next_camp
     # timestamp is closer to the previous camp
@@ -0,0 +1,165 @@
+"""Bulk import engine for the CSV and Excel importers in economy.utils.
+
+The importers used to call get_or_create() or update_or_create() once per row,
+which means a query or two per row. The BulkImporter reads the rows in chunks,
+finds the existing objects for a whole chunk with one query, and then creates
+the new objects with bulk_create() and updates the changed ones with bulk_update().
+
+The imported models have no unique constraints on the columns which identify a
+row (for most of them it is all the columns), so existing objects are matched on
+the key fields in Python instead of with bulk_create(update_conflicts=True).
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+from itertools import islice
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class ImportResult(NamedTuple):
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+    def __add__(self, other):
+        return ImportResult(*(a + b for a, b in zip(self, other, strict=True)))
+
+    def __str__(self) -> str:
+        return f"{self.created} created, {self.updated} updated, {self.skipped} skipped"
+
+
+class BulkImporter:
+    """Create or update objects of a model from an iterable of rows.
+
+    Each row is a dict of field name to value. Rows are matched to existing objects
+    (and to earlier rows in the same import) on key_fields:
+
+    - Rows without a match are created.
+    - Rows with a match get their update_fields updated if any of them changed,
+      like update_or_create(). Without update_fields matched rows are skipped, like
+      get_or_create().
+
+    The first of key_fields is used to find the existing objects for each chunk,
+    so it should be one which (nearly) identifies a row, like an ID or a timestamp.
+    Fields in scope are set on all objects and limit the objects which are matched,
+    like the bank account for bank transactions.
+
+    Created and updated objects are checked with clean_fields() and clean(), like
+    CleanedModel.save() does. The fields in scope are not checked, they are the same
+    for all rows and checking a foreign key takes a query per object. Unlike
+    CleanedModel.save() validate_unique() is not called either, for the same reason.
+    """
+
+    def __init__(self, model, key_fields, update_fields=(), scope=None, chunk_size=1000) -> None:
+        self.model = model
+        self.key_fields = list(key_fields)
+        self.update_fields = list(update_fields)
+        self.scope = scope or {}
+        self.chunk_size = chunk_size
+        self.fields = {name: model._meta.get_field(name) for name in self.key_fields + self.update_fields}
+        # objects created or matched in this import, so duplicate rows are only imported once
+        self.seen = {}
+
+    def normalise(self, name, value):
+        """Convert value to what we get back from the database, so parsed and loaded values can be compared."""
+        value = self.fields[name].to_python(value)
+        if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+            # the database would interpret it in the default timezone
+            value = timezone.make_aware(value)
+        return value
+
+    def get_key(self, row) -> tuple:
+        return tuple(self.normalise(name, row[name]) for name in self.key_fields)
+
+    def get_existing(self, rows) -> dict:
+        """Return a dict of key to (pk, update values) for the existing objects matching the rows."""
+        match_field = self.key_fields[0]
+        match_values = {row[match_field] for row in rows}
+        condition = Q(**{f"{match_field}__in": [value for value in match_values if value is not None]})
+        if None in match_values:
+            condition |= Q(**{f"{match_field}__isnull": True})
+        existing = {}
+        for pk, *values in (
+            self.model.objects.filter(**self.scope)
+            .filter(condition)
+            .values_list("pk", *self.key_fields, *self.update_fields)
+            .iterator(chunk_size=self.chunk_size)
+        ):
+            key = tuple(self.normalise(name, value) for name, value in zip(self.key_fields, values, strict=False))
+            existing.setdefault(key, (pk, values[len(self.key_fields) :]))
+        return existing
+
+    def import_chunk(self, rows) -> ImportResult:
+        existing = self.get_existing(rows)
+        create = []
+        update = {}
+        updated = 0
+        skipped = 0
+        for row in rows:
+            key = self.get_key(row)
+            obj = self.seen.get(key)
+            if obj is None and key in existing:
+                pk, values = existing[key]
+                obj = self.model(pk=pk, **self.scope, **row)
+                obj._state.adding = False
+                # start from the loaded values so we can tell if anything changed
+                for name, value in zip(self.update_fields, values, strict=True):
+                    setattr(obj, name, value)
+                self.seen[key] = obj
+            elif obj is None:
+                obj = self.model(**self.scope, **row)
+                self.seen[key] = obj
+                create.append(obj)
+                continue
+
+            changed = False
+            for name in self.update_fields:
+                value = self.normalise(name, row[name])
+                if self.normalise(name, getattr(obj, name)) != value:
+                    setattr(obj, name, value)
+                    changed = True
+            if not changed:
+                skipped += 1
+                continue
+            updated += 1
+            if not obj._state.adding:
+                update[obj.pk] = obj
+
+        for obj in create + list(update.values()):
+            obj.clean_fields(exclude=self.scope)
+            obj.clean()
+        with transaction.atomic():
+            self.model.objects.bulk_create(create, batch_size=self.chunk_size)
+            if update:
+                fields = list(self.update_fields)
+                if hasattr(self.model, "updated"):
+                    # bulk_update() does not set auto_now fields
+                    fields.append("updated")
+                    now = timezone.now()
+                    for obj in update.values():
+                        obj.updated = now
+                self.model.objects.bulk_update(update.values(), fields, batch_size=self.chunk_size)
+        return ImportResult(created=len(create), updated=updated, skipped=skipped)
+
+    def run(self, rows) -> ImportResult:
+        """Import the rows in chunks of chunk_size and return the counts."""
+        result = ImportResult()
+        for chunk in chunked(rows, self.chunk_size):
+            result += self.import_chunk(chunk)
+        logger.info(f"Imported {self.model.__name__} objects: {result}")
+        return result
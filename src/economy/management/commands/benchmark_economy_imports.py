@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import csv
+import logging
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from economy.models import Bank
+from economy.utils import CoinifyCSVImporter
+from economy.utils import MobilePayCSVImporter
+from economy.utils import ZettleExcelImporter
+from economy.utils import import_clearhaus_csv
+from economy.utils import import_epay_csv
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+class Command(BaseCommand):
+    args = "none"
+    help = (
+        "Benchmark the economy CSV and Excel importers with the files in testdata/. "
+        "Each file is imported twice, to time both new and existing rows. Everything is rolled back afterwards."
+    )
+
+    def output(self, message) -> None:
+        self.stdout.write(
+            "{}: {}".format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"), message),
+        )
+
+    def get_importers(self):
+        """Return a list of (filename, function) where function imports the open file."""
+
+        def csv_importer(importer, delimiter):
+            return lambda f: importer(csv.reader(f, delimiter=delimiter, quotechar='"'))
+
+        account = Bank.objects.create(name="Benchmark bank").accounts.create(
+            name="Benchmark account",
+            reg_no="1234",
+            account_no="12345678",
+        )
+        return [
+            ("bank.csv", csv_importer(account.import_csv, ";")),
+            ("epay_test.csv", csv_importer(import_epay_csv, ";")),
+            ("clearhaus_settlements.csv", csv_importer(import_clearhaus_csv, ",")),
+            (
+                "coinify-invoices-20200101-20200630.csv",
+                csv_importer(CoinifyCSVImporter.import_coinify_invoice_csv, ","),
+            ),
+            (
+                "coinify-payouts-20210701-20210904.csv",
+                csv_importer(CoinifyCSVImporter.import_coinify_payout_csv, ","),
+            ),
+            (
+                "coinify-account-balances-20210701-20210904.csv",
+                csv_importer(CoinifyCSVImporter.import_coinify_balance_csv, ","),
+            ),
+            (
+                "MobilePay_Transfer_overview_csv_MyShop_25-08-2021_14-09-2021.csv",
+                csv_importer(MobilePayCSVImporter.import_mobilepay_transfer_csv, ";"),
+            ),
+            (
+                "MobilePay_Sales_overview_csv_MyShop_25-08-2021_14-09-2021.csv",
+                csv_importer(MobilePayCSVImporter.import_mobilepay_sales_csv, ";"),
+            ),
+            (
+                "Zettle-Receipts-Report-20210101-20210910.xlsx",
+                lambda f: ZettleExcelImporter.import_zettle_receipts_df(
+                    ZettleExcelImporter.load_zettle_receipts_excel(f),
+                ),
+            ),
+            (
+                "Zettle-Account-Statement-Report-20230901-20250903.xlsx",
+                lambda f: ZettleExcelImporter.import_zettle_balances_df(
+                    ZettleExcelImporter.load_zettle_balances_excel(f),
+                ),
+            ),
+        ]
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            for filename, importer in self.get_importers():
+                path = settings.FIXTURE_DIR / filename
+                for label in ["first import", "second import"]:
+                    mode = {"mode": "rb"} if path.suffix == ".xlsx" else {"encoding": "utf-8-sig"}
+                    with open(path, **mode) as f, CaptureQueriesContext(connection) as queries:
+                        start = perf_counter()
+                        result = importer(f)
+                        duration = perf_counter() - start
+                    self.output(f"{filename} {label}: {result} in {duration:.3f}s with {len(queries)} queries")
+            transaction.set_rollback(True)
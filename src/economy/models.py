@@ -12,6 +12,7 @@ from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.text import slugify
 from django_prometheus.models import ExportModelOperationsMixin
@@ -25,6 +26,7 @@ from utils.models import CreatedUpdatedUUIDModel
 from utils.models import UUIDModel
 from utils.slugs import unique_slugify
 
+from .bulkimport import BulkImporter
 from .email import send_accountingsystem_expense_email
 from .email import send_accountingsystem_revenue_email
 from .email import send_expense_approved_email
@@ -33,35 +35,63 @@ from .email import send_revenue_approved_email
 from .email import send_revenue_rejected_email
 
 
-class ChainManager(models.Manager):
-    """ChainManager adds 'expenses_total' and 'revenues_total' to the Chain qs
-    Also adds 'expenses_count' and 'revenues_count' and prefetches all expenses
-    and revenues for the credebtors.
+def get_total_annotations(queryset, group_by, prefix) -> dict:
+    """Return annotations with the number and total amount of the objects in queryset.
+
+    queryset must be filtered on group_by=OuterRef("pk"). The totals are calculated
+    in subqueries instead of with Count() and Sum() across several joins, which would
+    multiply the rows (and Sum(distinct=True) only adds up each distinct amount once).
     """
+    totals = queryset.order_by().values(group_by)
+    return {
+        f"{prefix}_count": Coalesce(
+            models.Subquery(totals.annotate(total_count=models.Count("pk")).values("total_count")),
+            0,
+        ),
+        f"{prefix}_amount": models.Subquery(
+            totals.annotate(total_amount=models.Sum("amount")).values("total_amount"),
+        ),
+    }
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        qs = qs.prefetch_related(
-            models.Prefetch("credebtors__expenses", to_attr="all_expenses"),
-            models.Prefetch("credebtors__revenues", to_attr="all_revenues"),
-        )
-        qs = qs.annotate(
-            all_expenses_amount=models.Sum(
-                "credebtors__expenses__amount",
-                distinct=True,
+
+class ChainQuerySet(models.QuerySet):
+    def with_camp_totals(self, camp):
+        """Add 'camp_expenses_count', 'camp_expenses_amount', 'camp_revenues_count' and 'camp_revenues_amount' for the camp."""
+        return self.annotate(
+            **get_total_annotations(
+                Expense.objects.filter(creditor__chain=models.OuterRef("pk"), camp=camp),
+                "creditor__chain",
+                "camp_expenses",
             ),
-        )
-        qs = qs.annotate(
-            all_expenses_count=models.Count("credebtors__expenses", distinct=True),
-        )
-        qs = qs.annotate(
-            all_revenues_amount=models.Sum(
-                "credebtors__revenues__amount",
-                distinct=True,
+            **get_total_annotations(
+                Revenue.objects.filter(debtor__chain=models.OuterRef("pk"), camp=camp),
+                "debtor__chain",
+                "camp_revenues",
             ),
         )
-        return qs.annotate(
-            all_revenues_count=models.Count("credebtors__revenues", distinct=True),
+
+
+class ChainManager(models.Manager.from_queryset(ChainQuerySet)):
+    """ChainManager adds 'all_expenses_amount' and 'all_revenues_amount' to the Chain qs
+    Also adds 'all_expenses_count' and 'all_revenues_count' for all camps.
+    """
+
+    def get_queryset(self):
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                **get_total_annotations(
+                    Expense.objects.filter(creditor__chain=models.OuterRef("pk")),
+                    "creditor__chain",
+                    "all_expenses",
+                ),
+                **get_total_annotations(
+                    Revenue.objects.filter(debtor__chain=models.OuterRef("pk")),
+                    "debtor__chain",
+                    "all_revenues",
+                ),
+            )
         )
 
 
@@ -115,19 +145,45 @@ class Chain(ExportModelOperationsMixin("chain"), CreatedUpdatedModel, UUIDModel)
         return Revenue.objects.filter(debtor__chain__pk=self.pk)
 
 
-class CredebtorManager(models.Manager):
-    """CredebtorManager adds 'expenses_total' and 'revenues_total' to the Credebtor qs,
-    and prefetches expenses and revenues for the credebtor(s).
+class CredebtorQuerySet(models.QuerySet):
+    def with_camp_totals(self, camp):
+        """Add 'camp_expenses_count', 'camp_expenses_amount', 'camp_revenues_count' and 'camp_revenues_amount' for the camp."""
+        return self.annotate(
+            **get_total_annotations(
+                Expense.objects.filter(creditor=models.OuterRef("pk"), camp=camp),
+                "creditor",
+                "camp_expenses",
+            ),
+            **get_total_annotations(
+                Revenue.objects.filter(debtor=models.OuterRef("pk"), camp=camp),
+                "debtor",
+                "camp_revenues",
+            ),
+        )
+
+
+class CredebtorManager(models.Manager.from_queryset(CredebtorQuerySet)):
+    """CredebtorManager adds 'all_expenses_amount' and 'all_revenues_amount' to the Credebtor qs
+    Also adds 'all_expenses_count' and 'all_revenues_count' for all camps.
     """
 
     def get_queryset(self):
-        qs = super().get_queryset()
-        qs = qs.prefetch_related(
-            models.Prefetch("expenses", to_attr="all_expenses"),
-            models.Prefetch("revenues", to_attr="all_revenues"),
+        return (
+            super()
+            .get_queryset()
+            .annotate(
+                **get_total_annotations(
+                    Expense.objects.filter(creditor=models.OuterRef("pk")),
+                    "creditor",
+                    "all_expenses",
+                ),
+                **get_total_annotations(
+                    Revenue.objects.filter(debtor=models.OuterRef("pk")),
+                    "debtor",
+                    "all_revenues",
+                ),
+            )
         )
-        qs = qs.annotate(all_expenses_amount=models.Sum("expenses__amount"))
-        return qs.annotate(all_revenues_amount=models.Sum("revenues__amount"))
 
 
 class Credebtor(
@@ -761,6 +817,7 @@ class Pos(ExportModelOperationsMixin("pos"), CampRelatedModel, UUIDModel):
         filename = f"bornhack_pos_{self.slug}_{period.lower}_{period.upper}.csv"
         with open(workdir / filename, "w", newline="") as f:
             posreports = self.pos_reports.filter(period__contained_by=period)
+            count = 0
             writer = csv.writer(f, dialect="excel")
             writer.writerow(
                 [
@@ -779,7 +836,8 @@ class Pos(ExportModelOperationsMixin("pos"), CampRelatedModel, UUIDModel):
                     "pos_transactions",
                 ],
             )
-            for pr in posreports:
+            for pr in posreports.iterator(chunk_size=2000):
+                count += 1
                 writer.writerow(
                     [
                         pr.pk,
@@ -797,7 +855,7 @@ class Pos(ExportModelOperationsMixin("pos"), CampRelatedModel, UUIDModel):
                         pr.pos_json_sales[0],
                     ],
                 )
-        return (self, filename, posreports.count())
+        return (self, filename, count)
 
     @property
     def total_sales(self):
@@ -1436,26 +1494,28 @@ class BankAccount(ExportModelOperationsMixin("bank_account"), CreatedUpdatedUUID
         Timezone for dates are defined in settings.TIME_ZONE.
         """
         tz = ZoneInfo(settings.TIME_ZONE)
-        create_count = 0
         # Bank csv has the most recent lines first in the file, and the oldest last.
         # Read lines in reverse so we add the earliest transaction first,
         # this is important because bank csv transactions are only date stamped,
         # not time stamped. So we use the creation time of the db record in addition
-        # to the transaction date for sorting.
-        for row in reversed(list(csvreader)):
-            # use update_or_create() so we can import a new CSV with the same transactions
-            # but with updated descriptions, in case we fix a description in the bank
-            tx, created = self.transactions.update_or_create(
-                date=datetime.strptime(row[0], "%d/%m/%Y").replace(tzinfo=tz),
-                amount=Decimal(row[3].replace(".", "").replace(",", ".")),
-                balance=Decimal(row[4].replace(".", "").replace(",", ".")),
-                defaults={
-                    "text": row[1],
-                },
-            )
-            if created:
-                create_count += 1
-        return create_count
+        # to the transaction date for sorting. bulk_create() keeps the order.
+        rows = (
+            {
+                "date": datetime.strptime(row[0], "%d/%m/%Y").replace(tzinfo=tz).date(),
+                "amount": Decimal(row[3].replace(".", "").replace(",", ".")),
+                "balance": Decimal(row[4].replace(".", "").replace(",", ".")),
+                "text": row[1],
+            }
+            for row in reversed(list(csvreader))
+        )
+        # update existing transactions so we can import a new CSV with the same transactions
+        # but with updated descriptions, in case we fix a description in the bank
+        return BulkImporter(
+            BankTransaction,
+            key_fields=["date", "amount", "balance"],
+            update_fields=["text"],
+            scope={"bank_account": self},
+        ).run(rows)
 
     def export_csv(self, period, workdir, filename=None):
         """Write a CSV file to disk with all transactions for the requested period."""
@@ -1468,9 +1528,11 @@ class BankAccount(ExportModelOperationsMixin("bank_account"), CreatedUpdatedUUID
             )
             writer = csv.writer(f, dialect="excel")
             writer.writerow(["bornhack_uuid", "date", "text", "amount", "balance"])
-            for tx in transactions:
-                writer.writerow([tx.pk, tx.date, tx.text, tx.amount, tx.balance])
-        return (self, filename, transactions.count())
+            count = 0
+            for tx in transactions.values_list("pk", "date", "text", "amount", "balance").iterator(chunk_size=2000):
+                writer.writerow(tx)
+                count += 1
+        return (self, filename, count)
 
 
 class BankTransaction(
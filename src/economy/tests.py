@@ -1,19 +1,45 @@
 from __future__ import annotations
 
 import csv
+import io
+import json
+import tempfile
+from pathlib import Path
 
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.utils import timezone
 from django.conf import settings
+from psycopg2.extras import DateTimeTZRange
 
+from camps.factories import CampFactory
+from camps.models import Camp
+from shop.factories import OrderProductRelationFactory
+from shop.models import Order
+from utils.factories import UserFactory
+from utils.models import CampReadOnlyModeError
+
+from .bulkimport import ImportResult
+from .factories import CredebtorFactory
+from .factories import ExpenseFactory
+from .factories import PosFactory
+from .factories import RevenueFactory
 from .models import Bank
 from .models import BankAccount
+from .models import Chain
+from .models import ClearhausSettlement
+from .models import Credebtor
+from .models import PosProduct
+from .models import PosSale
+from .utils import AccountingExporter
 from .utils import CoinifyCSVImporter
 from .utils import MobilePayCSVImporter
+from .utils import PosSalesImporter
 from .utils import ZettleExcelImporter
 from .utils import import_clearhaus_csv
 from .utils import import_epay_csv
+from .utils import import_pos_sales_json
+from .utils import iter_json_objects
 
 
 class BankAccountCsvImportTest(TestCase):
@@ -33,14 +59,14 @@ class BankAccountCsvImportTest(TestCase):
         # make sure we create 6 transactions
         with open(settings.FIXTURE_DIR / "bank.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = account.import_csv(reader)
-            self.assertEqual(created, 6)
+            result = account.import_csv(reader)
+            self.assertEqual(result.created, 6)
 
         # make sure we create 0 if we load the same file again
         with open(settings.FIXTURE_DIR / "bank.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = account.import_csv(reader)
-            self.assertEqual(created, 0)
+            result = account.import_csv(reader)
+            self.assertEqual(result, ImportResult(created=0, updated=0, skipped=6))
 
         # make sure we refuse transactions before start_date of the account
         account.transactions.all().delete()
@@ -52,7 +78,7 @@ class BankAccountCsvImportTest(TestCase):
         ):
             with open(settings.FIXTURE_DIR / "bank.csv", encoding="utf-8-sig") as f:
                 reader = csv.reader(f, delimiter=";", quotechar='"')
-                created = account.import_csv(reader)
+                result = account.import_csv(reader)
 
 
 class CoinifyCSVImportTest(TestCase):
@@ -63,8 +89,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
-            self.assertEqual(created, 4)
+            result = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
+            self.assertEqual(result.created, 4)
 
         # make sure we create 0 invoices if the same csv is imported again
         with open(
@@ -72,8 +98,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
-            self.assertEqual(created, 0)
+            result = CoinifyCSVImporter.import_coinify_invoice_csv(reader)
+            self.assertEqual(result.created, 0)
 
     def test_coinify_payout_csv_import(self):
         # make sure we create 2 payouts
@@ -82,8 +108,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_payout_csv(reader)
-            self.assertEqual(created, 2)
+            result = CoinifyCSVImporter.import_coinify_payout_csv(reader)
+            self.assertEqual(result.created, 2)
 
         # make sure we create 0 payouts if the same csv is imported again
         with open(
@@ -91,8 +117,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_payout_csv(reader)
-            self.assertEqual(created, 0)
+            result = CoinifyCSVImporter.import_coinify_payout_csv(reader)
+            self.assertEqual(result.created, 0)
 
     def test_coinify_balance_csv_import(self):
         # make sure we create 66 balances
@@ -101,8 +127,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_balance_csv(reader)
-            self.assertEqual(created, 66)
+            result = CoinifyCSVImporter.import_coinify_balance_csv(reader)
+            self.assertEqual(result.created, 66)
 
         # make sure we create 0 balances if the same csv is imported again
         with open(
@@ -110,8 +136,8 @@ class CoinifyCSVImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = CoinifyCSVImporter.import_coinify_balance_csv(reader)
-            self.assertEqual(created, 0)
+            result = CoinifyCSVImporter.import_coinify_balance_csv(reader)
+            self.assertEqual(result.created, 0)
 
 
 class EpayCSVImportTest(TestCase):
@@ -119,14 +145,14 @@ class EpayCSVImportTest(TestCase):
         # make sure we create 4 epay transactions
         with open(settings.FIXTURE_DIR / "epay_test.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = import_epay_csv(reader)
-            self.assertEqual(created, 3)
+            result = import_epay_csv(reader)
+            self.assertEqual(result.created, 3)
 
         # make sure we create 0 if the same csv is imported again
         with open(settings.FIXTURE_DIR / "epay_test.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = import_epay_csv(reader)
-            self.assertEqual(created, 0)
+            result = import_epay_csv(reader)
+            self.assertEqual(result.created, 0)
 
 
 class ClearhausCSVImportTest(TestCase):
@@ -134,34 +160,46 @@ class ClearhausCSVImportTest(TestCase):
         # make sure we create 10 clearhaus settlements
         with open(settings.FIXTURE_DIR / "clearhaus_settlements.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = import_clearhaus_csv(reader)
-            self.assertEqual(created, 9)
+            result = import_clearhaus_csv(reader)
+            self.assertEqual(result.created, 9)
 
         # make sure we create 0 if the same csv is imported again
         with open(settings.FIXTURE_DIR / "clearhaus_settlements.csv", encoding="utf-8-sig") as f:
             reader = csv.reader(f, delimiter=",", quotechar='"')
-            created = import_clearhaus_csv(reader)
-            self.assertEqual(created, 0)
+            result = import_clearhaus_csv(reader)
+            self.assertEqual(result.created, 0)
+
+        # changed settlements are updated when the csv is imported again
+        settlement = ClearhausSettlement.objects.exclude(payout_date=None).first()
+        payout_date = settlement.payout_date
+        ClearhausSettlement.objects.filter(pk=settlement.pk).update(payout_date=None)
+        with open(settings.FIXTURE_DIR / "clearhaus_settlements.csv", encoding="utf-8-sig") as f:
+            reader = csv.reader(f, delimiter=",", quotechar='"')
+            with self.assertNumQueries(4):
+                result = import_clearhaus_csv(reader)
+            self.assertEqual(result, ImportResult(created=0, updated=1, skipped=8))
+        settlement.refresh_from_db()
+        self.assertEqual(settlement.payout_date, payout_date)
 
 
 class ZettleImportTest(TestCase):
     def test_zettle_receipts_import(self):
         with open(settings.FIXTURE_DIR / "Zettle-Receipts-Report-20210101-20210910.xlsx", "rb") as f:
             df = ZettleExcelImporter.load_zettle_receipts_excel(f)
-        created = ZettleExcelImporter.import_zettle_receipts_df(df)
-        self.assertEqual(created, 6)
+        result = ZettleExcelImporter.import_zettle_receipts_df(df)
+        self.assertEqual(result.created, 6)
         # import the same df again to make sure we don't create duplicates
-        created = ZettleExcelImporter.import_zettle_receipts_df(df)
-        self.assertEqual(created, 0)
+        result = ZettleExcelImporter.import_zettle_receipts_df(df)
+        self.assertEqual(result.created, 0)
 
     def test_zettle_balances_import(self):
         with open(settings.FIXTURE_DIR / "Zettle-Account-Statement-Report-20230901-20250903.xlsx", "rb") as f:
             df = ZettleExcelImporter.load_zettle_balances_excel(f)
-        created = ZettleExcelImporter.import_zettle_balances_df(df)
-        self.assertEqual(created, 4059)
+        result = ZettleExcelImporter.import_zettle_balances_df(df)
+        self.assertEqual(result.created, 4059)
         # import the same df again to make sure we don't create duplicates
-        created = ZettleExcelImporter.import_zettle_balances_df(df)
-        self.assertEqual(created, 0)
+        result = ZettleExcelImporter.import_zettle_balances_df(df)
+        self.assertEqual(result.created, 0)
 
 
 class MobilePayImportTest(TestCase):
@@ -171,8 +209,8 @@ class MobilePayImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
-            self.assertEqual(created, 8)
+            result = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
+            self.assertEqual(result.created, 8)
 
         # make sure we create 0 if the same csv is imported again
         with open(
@@ -180,8 +218,8 @@ class MobilePayImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
-            self.assertEqual(created, 0)
+            result = MobilePayCSVImporter.import_mobilepay_transfer_csv(reader)
+            self.assertEqual(result.created, 0)
 
         # now test importing sales CSV, 3 out of 4 lines are already in from above import
         with open(
@@ -189,10 +227,10 @@ class MobilePayImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
+            result = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
             # the CSV contains three sales and a refund but the sales are already in the db
             self.assertEqual(
-                created,
+                result.created,
                 1,
                 "more than 1 new mobilepay tx was created, something is fucky",
             )
@@ -202,5 +240,127 @@ class MobilePayImportTest(TestCase):
             encoding="utf-8-sig",
         ) as f:
             reader = csv.reader(f, delimiter=";", quotechar='"')
-            created = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
-            self.assertEqual(created, 0)
+            result = MobilePayCSVImporter.import_mobilepay_sales_csv(reader)
+            self.assertEqual(result.created, 0)
+
+
+class PosSalesImportTest(TestCase):
+    def test_pos_sales_json_import(self):
+        """Test importing Pos sales from a JSON file, and that importing it again creates nothing."""
+        pos = PosFactory()
+        timestamp = {"$date": timezone.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
+        product = {
+            "_id": "7oCSE2xt6szw5cZYQ",
+            "brandName": "Gamma",
+            "name": "Tap: Bando",
+            "salePrice": "35",
+            "unitSize": "40",
+            "sizeUnit": "cl",
+            "abv": {"$numberDouble": "NaN"},
+            "tags": ["beer", "tap"],
+            "shopPrices": [{"buyPrice": 17.5, "timestamp": timestamp}],
+        }
+        transactions = [
+            {
+                "_id": f"tx{i}",
+                "userId": "Y7NgNzTJRxPKupCv5",
+                "locationId": pos.external_id,
+                "timestamp": timestamp,
+                "products": [product, {**product, "_id": "free", "salePrice": 0}],
+            }
+            for i in range(3)
+        ]
+        data = json.dumps(transactions, indent=2)
+
+        result = import_pos_sales_json(iter_json_objects(io.StringIO(data), read_size=100))
+        assert result == (1, 3, 3, 1)
+        assert PosProduct.objects.get(external_id="7oCSE2xt6szw5cZYQ").tags == "beer,tap"
+        assert PosSale.objects.filter(transaction__pos=pos).count() == 3
+
+        result = import_pos_sales_json(iter_json_objects(io.StringIO(data)))
+        assert result == (0, 0, 0, 0)
+
+    def test_pos_sales_import_read_only_previous_camp(self):
+        """Known costs from a read only camp are skipped, only new ones fail the import."""
+        pos = PosFactory()
+        now = timezone.now()
+        year = timezone.timedelta(days=365)
+        previous_camp = CampFactory(
+            buildup=DateTimeTZRange(now - year - timezone.timedelta(days=3), now - year),
+            camp=DateTimeTZRange(now - year, now - year + timezone.timedelta(days=8)),
+            teardown=DateTimeTZRange(now - year + timezone.timedelta(days=8), now - year + timezone.timedelta(days=11)),
+        )
+        old_timestamp = {"$date": (now - year).strftime("%Y-%m-%dT%H:%M:%S.%fZ")}
+        product = {
+            "_id": "7oCSE2xt6szw5cZYQ",
+            "brandName": "Gamma",
+            "name": "Tap: Bando",
+            "salePrice": "35",
+            "unitSize": "40",
+            "sizeUnit": "cl",
+            "tags": ["beer"],
+            "shopPrices": [{"buyPrice": 17.5, "timestamp": old_timestamp}],
+        }
+
+        def import_transaction(tx_id, product) -> tuple:
+            transaction = {
+                "_id": tx_id,
+                "locationId": pos.external_id,
+                "timestamp": {"$date": now.strftime("%Y-%m-%dT%H:%M:%S.%fZ")},
+                "products": [product],
+            }
+            return PosSalesImporter().run([transaction])
+
+        assert import_transaction("tx1", product) == (1, 1, 1, 1)
+        Camp.objects.filter(pk=previous_camp.pk).update(read_only=True)
+
+        # the cost from the read only camp already exists
+        assert import_transaction("tx2", product) == (0, 1, 1, 0)
+
+        product["shopPrices"].append({"buyPrice": 18.5, "timestamp": old_timestamp})
+        with self.assertRaises(CampReadOnlyModeError):
+            import_transaction("tx3", product)
+
+
+class AccountingExporterTest(TestCase):
+    def test_shoporder_csv_export(self):
+        """Test that the webshop orders are exported with their totals from a single query."""
+        opr = OrderProductRelationFactory(quantity=2)
+        Order.objects.filter(pk=opr.order.pk).update(paid=True)
+        exporter = AccountingExporter(
+            startdate=timezone.now() - timezone.timedelta(days=1),
+            enddate=timezone.now() + timezone.timedelta(days=1),
+            workers=1,
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            workdir = Path(tmpdir)
+            with self.assertNumQueries(1):
+                filename, count = exporter.shoporder_csv_export(workdir)
+            assert count == 1
+            with open(workdir / filename, newline="") as f:
+                rows = list(csv.reader(f))
+        assert rows[1][:3] == [str(opr.order.pk), str(opr.product.price * 2), "True"]
+        assert rows[1][-1] == "N/A"
+
+
+class ChainTotalsTest(TestCase):
+    def test_chain_and_credebtor_totals(self):
+        """Test that expenses with the same amount are all counted, and revenues do not multiply them."""
+        camp = CampFactory()
+        user = UserFactory()
+        creditor = CredebtorFactory()
+        debtor = CredebtorFactory(chain=creditor.chain)
+        for _ in range(2):
+            ExpenseFactory(camp=camp, creditor=creditor, user=user, amount=100)
+            RevenueFactory(camp=camp, debtor=debtor, user=user, amount=50)
+        ExpenseFactory(camp=CampFactory(), creditor=creditor, user=user, amount=100)
+
+        chain = Chain.objects.with_camp_totals(camp).get(pk=creditor.chain.pk)
+        assert (chain.camp_expenses_count, chain.camp_expenses_amount) == (2, 200)
+        assert (chain.camp_revenues_count, chain.camp_revenues_amount) == (2, 100)
+        assert (chain.all_expenses_count, chain.all_expenses_amount) == (3, 300)
+
+        credebtors = Credebtor.objects.filter(chain=chain).with_camp_totals(camp)
+        assert credebtors.get(pk=creditor.pk).camp_expenses_amount == 200
+        assert credebtors.get(pk=debtor.pk).camp_expenses_count == 0
+        assert credebtors.get(pk=debtor.pk).camp_expenses_amount is None
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import csv
 import datetime
-import io
+import json
 import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from decimal import InvalidOperation
 from os.path import basename
@@ -13,11 +14,21 @@ from zipfile import ZipFile
 
 import pandas as pd
 from django.conf import settings
+from django.db import connections
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Prefetch
+from django.db.models import Q
+from django.db.models import Subquery
 from django.template.loader import render_to_string
 from django.utils import timezone
 from psycopg2.extras import DateTimeTZRange
 
-from camps.utils import get_closest_camp
+from camps.models import Camp
+from camps.utils import find_closest_camp
+from economy.bulkimport import BulkImporter
+from economy.bulkimport import chunked
 from economy.models import BankAccount
 from economy.models import ClearhausSettlement
 from economy.models import CoinifyBalance
@@ -42,6 +53,7 @@ from shop.models import CreditNote
 from shop.models import CustomOrder
 from shop.models import Invoice
 from shop.models import Order
+from utils.models import CampReadOnlyModeError
 from zoneinfo import ZoneInfo
 
 # we need the Danish timezone here and there
@@ -49,6 +61,21 @@ cph = ZoneInfo(settings.TIME_ZONE)
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
+EPAY_TRANSACTION_FIELDS = [
+    "transaction_id",
+    "merchant_id",
+    "order_id",
+    "auth_amount",
+    "currency",
+    "auth_date",
+    "description",
+    "card_type",
+    "captured_amount",
+    "captured_date",
+    "transaction_fee",
+]
+
+
 def import_epay_csv(csvreader):
     """Import an ePay CSV file. Assumes a CSV structure like this:
 
@@ -61,32 +88,31 @@ def import_epay_csv(csvreader):
 
     This function expects an initiated csvreader object, or alternatively some other iterable with the data in the right index locations.
     """
-    create_count = 0
     # skip header row
     next(csvreader)
-    for row in csvreader:
-        et, created = EpayTransaction.objects.get_or_create(
-            transaction_id=row[0],
-            merchant_id=row[2],
-            order_id=row[3],
-            auth_amount=Decimal(row[4]),
-            currency=row[16],
-            auth_date=timezone.make_aware(
+    rows = (
+        {
+            "transaction_id": row[0],
+            "merchant_id": row[2],
+            "order_id": row[3],
+            "auth_amount": Decimal(row[4]),
+            "currency": row[16],
+            "auth_date": timezone.make_aware(
                 datetime.datetime.strptime(row[6], "%d-%m-%Y %H:%M"),
                 timezone=cph,
             ),
-            description=row[11],
-            card_type=row[13],
-            captured_amount=Decimal(row[19]),
-            captured_date=timezone.make_aware(
+            "description": row[11],
+            "card_type": row[13],
+            "captured_amount": Decimal(row[19]),
+            "captured_date": timezone.make_aware(
                 datetime.datetime.strptime(row[21], "%d-%m-%Y %H:%M"),
                 timezone=cph,
             ),
-            transaction_fee=row[24],
-        )
-        if created:
-            create_count += 1
-    return create_count
+            "transaction_fee": row[24],
+        }
+        for row in csvreader
+    )
+    return BulkImporter(EpayTransaction, key_fields=EPAY_TRANSACTION_FIELDS).run(rows)
 
 
 class CoinifyCSVImporter:
@@ -100,34 +126,68 @@ class CoinifyCSVImporter:
         2666cbe3-ff7d-4fa6-aa49-b86784c3ecb4,payment_intent,8bb8d156-f7ad-4c52-9372-a383ae06f8c4,Sandbox Business,,,failed,failed_overpaid,55,coinifycustomer@example.com,100,DKK,2025-02-15T17:14:30.887Z,,
 
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            ci, created = CoinifyPaymentIntent.objects.get_or_create(
-                coinify_id=row[0],
-                reference_type=row[1],
-                merchant_id=row[2],
-                merchant_name=row[3],
-                subaccount_id=row[4],
-                subaccount_name=row[5],
-                state=row[6],
-                state_reason=row[7],
-                original_order_id=row[8],
-                customer_email=row[9],
-                requested_amount=Decimal(row[10]),
-                requested_currency=row[11],
-                coinify_created=datetime.datetime.fromisoformat(row[12]),
-                amount=Decimal(row[13]) if row[13] else Decimal(0),
-                currency=row[14],
-                order=Order.objects.filter(pk=row[8]).first(),
-                api_payment_intent=CoinifyAPIPaymentIntent.objects.filter(
-                    coinify_id=row[0],
-                ).first(),
-            )
-            if created:
-                create_count += 1
-        return create_count
+        importer = BulkImporter(
+            CoinifyPaymentIntent,
+            key_fields=[
+                "coinify_id",
+                "reference_type",
+                "merchant_id",
+                "merchant_name",
+                "subaccount_id",
+                "subaccount_name",
+                "state",
+                "state_reason",
+                "original_order_id",
+                "customer_email",
+                "requested_amount",
+                "requested_currency",
+                "coinify_created",
+                "amount",
+                "currency",
+                "order_id",
+                "api_payment_intent_id",
+            ],
+        )
+
+        def rows():
+            for chunk in chunked(csvreader, importer.chunk_size):
+                # look up the orders and api payment intents for the whole chunk
+                orders = {
+                    str(pk)
+                    for pk in Order.objects.filter(
+                        pk__in={row[8] for row in chunk if row[8].isdigit()},
+                    ).values_list("pk", flat=True)
+                }
+                api_payment_intents = {
+                    str(coinify_id): pk
+                    for coinify_id, pk in CoinifyAPIPaymentIntent.objects.filter(
+                        coinify_id__in={row[0] for row in chunk},
+                    ).values_list("coinify_id", "pk")
+                }
+                for row in chunk:
+                    yield {
+                        "coinify_id": row[0],
+                        "reference_type": row[1],
+                        "merchant_id": row[2],
+                        "merchant_name": row[3],
+                        "subaccount_id": row[4],
+                        "subaccount_name": row[5],
+                        "state": row[6],
+                        "state_reason": row[7],
+                        "original_order_id": row[8],
+                        "customer_email": row[9],
+                        "requested_amount": Decimal(row[10]),
+                        "requested_currency": row[11],
+                        "coinify_created": datetime.datetime.fromisoformat(row[12]),
+                        "amount": Decimal(row[13]) if row[13] else Decimal(0),
+                        "currency": row[14],
+                        "order_id": int(row[8]) if row[8] in orders else None,
+                        "api_payment_intent_id": api_payment_intents.get(row[0]),
+                    }
+
+        return importer.run(rows())
 
     @staticmethod
     def import_coinify_invoice_csv(csvreader):
@@ -145,50 +205,76 @@ class CoinifyCSVImporter:
 
         This method expects an initiated csvreader object, or alternatively some other iterable with the data in the right index locations.
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            ci, created = CoinifyInvoice.objects.get_or_create(
-                coinify_id=row[0],
-                coinify_id_alpha=row[1],
-                coinify_created=timezone.make_aware(
+        rows = (
+            {
+                "coinify_id": row[0],
+                "coinify_id_alpha": row[1],
+                "coinify_created": timezone.make_aware(
                     datetime.datetime.strptime(row[2], "%Y-%m-%d %H:%M:%S"),
                     timezone=datetime.UTC,
                 ),
-                payment_amount=Decimal(row[3]),
-                payment_currency=row[4],
-                payment_btc_amount=Decimal(row[5]),
-                description=row[6],
-                custom=row[7],
-                credited_amount=row[8],
-                credited_currency=row[9],
-                state=row[10],
-                payment_type=row[11],
-                original_payment_id=row[12] or None,
-            )
-            if created:
-                create_count += 1
-        return create_count
+                "payment_amount": Decimal(row[3]),
+                "payment_currency": row[4],
+                "payment_btc_amount": Decimal(row[5]),
+                "description": row[6],
+                "custom": row[7],
+                "credited_amount": row[8],
+                "credited_currency": row[9],
+                "state": row[10],
+                "payment_type": row[11],
+                "original_payment_id": row[12] or None,
+            }
+            for row in csvreader
+        )
+        return BulkImporter(
+            CoinifyInvoice,
+            key_fields=[
+                "coinify_id",
+                "coinify_id_alpha",
+                "coinify_created",
+                "payment_amount",
+                "payment_currency",
+                "payment_btc_amount",
+                "description",
+                "custom",
+                "credited_amount",
+                "credited_currency",
+                "state",
+                "payment_type",
+                "original_payment_id",
+            ],
+        ).run(rows)
 
     @staticmethod
     def import_coinify_settlements_csv(csvreader):
         """Settlement ID,Account,Gross amount,Fee,Net amount,Payout amount,Create Time."""
-        create_count = 0
         next(csvreader)
-        for row in csvreader:
-            cs, created = CoinifySettlement.objects.get_or_create(
-                settlement_id=row[0],
-                account=row[1],
-                gross_amount=Decimal(row[2]),
-                fee=Decimal(row[3]),
-                net_amount=Decimal(row[4]),
-                payout_amount=Decimal(row[5]),
-                create_time=row[6],
-            )
-            if created:
-                create_count += 1
-        return create_count
+        rows = (
+            {
+                "settlement_id": row[0],
+                "account": row[1],
+                "gross_amount": Decimal(row[2]),
+                "fee": Decimal(row[3]),
+                "net_amount": Decimal(row[4]),
+                "payout_amount": Decimal(row[5]),
+                "create_time": row[6],
+            }
+            for row in csvreader
+        )
+        return BulkImporter(
+            CoinifySettlement,
+            key_fields=[
+                "settlement_id",
+                "account",
+                "gross_amount",
+                "fee",
+                "net_amount",
+                "payout_amount",
+                "create_time",
+            ],
+        ).run(rows)
 
     @staticmethod
     def import_coinify_payout_csv(csvreader):
@@ -204,25 +290,27 @@ class CoinifyCSVImporter:
 
         This method expects an initiated csvreader object, or alternatively some other iterable with the data in the right index locations.
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            ci, created = CoinifyPayout.objects.get_or_create(
-                coinify_id=row[0],
-                coinify_created=timezone.make_aware(
+        rows = (
+            {
+                "coinify_id": row[0],
+                "coinify_created": timezone.make_aware(
                     datetime.datetime.strptime(row[1], "%Y-%m-%d %H:%M:%S"),
                     timezone=datetime.UTC,
                 ),
-                amount=Decimal(row[2]),
-                fee=Decimal(row[3]),
-                transferred=Decimal(row[4]),
-                currency=row[5],
-                btc_txid=row[6] or None,
-            )
-            if created:
-                create_count += 1
-        return create_count
+                "amount": Decimal(row[2]),
+                "fee": Decimal(row[3]),
+                "transferred": Decimal(row[4]),
+                "currency": row[5],
+                "btc_txid": row[6] or None,
+            }
+            for row in csvreader
+        )
+        return BulkImporter(
+            CoinifyPayout,
+            key_fields=["coinify_id", "coinify_created", "amount", "fee", "transferred", "currency", "btc_txid"],
+        ).run(rows)
 
     @staticmethod
     def import_coinify_balance_csv(csvreader):
@@ -248,19 +336,54 @@ class CoinifyCSVImporter:
 
         This method expects an initiated csvreader object, or alternatively some other iterable with the data in the right index locations.
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            ci, created = CoinifyBalance.objects.get_or_create(
-                date=row[0],
-                btc=Decimal(row[1]),
-                dkk=Decimal(row[2]),
-                eur=Decimal(row[3]),
-            )
-            if created:
-                create_count += 1
-        return create_count
+        rows = (
+            {
+                "date": row[0],
+                "btc": Decimal(row[1]),
+                "dkk": Decimal(row[2]),
+                "eur": Decimal(row[3]),
+            }
+            for row in csvreader
+        )
+        return BulkImporter(CoinifyBalance, key_fields=["date", "btc", "dkk", "eur"]).run(rows)
+
+
+CLEARHAUS_SETTLEMENT_FIELDS = [
+    "merchant_id",
+    "merchant_name",
+    "settled",
+    "currency",
+    "period_start_date",
+    "period_end_date",
+    "payout_amount",
+    "payout_date",
+    "summary_sales",
+    "summary_credits",
+    "summary_refunds",
+    "summary_chargebacks",
+    "summary_fees",
+    "summary_other_postings",
+    "summary_net",
+    "reserve_amount",
+    "reserve_date",
+    "fees_sales",
+    "fees_refunds",
+    "fees_authorisations",
+    "fees_credits",
+    "fees_minimum_processing",
+    "fees_service",
+    "fees_wire_transfer",
+    "fees_chargebacks",
+    "fees_retrieval_requests",
+    "payout_reference_number",
+    "payout_descriptor",
+    "reserve_reference_number",
+    "reserve_descriptor",
+    "fees_interchange",
+    "fees_scheme",
+]
 
 
 def import_clearhaus_csv(csvreader):
@@ -275,51 +398,52 @@ def import_clearhaus_csv(csvreader):
 
     This function expects an initiated csvreader object, or alternatively some other iterable with the data in the right index locations.
     """
-    create_count = 0
     # skip header row
     next(csvreader)
-    for row in csvreader:
-        # use create_or_update() so we can import CSV with the same settlements and update stuff like payout_date
-        cs, created = ClearhausSettlement.objects.update_or_create(
-            clearhaus_uuid=row[2],
-            defaults={
-                "merchant_id": row[0],
-                "merchant_name": row[1],
-                "settled": row[3] == "true",
-                "currency": row[4],
-                "period_start_date": row[5],
-                "period_end_date": row[6] if row[6] else None,
-                "payout_amount": Decimal(row[7]) if row[7] else None,
-                "payout_date": row[8] if row[8] else None,
-                "summary_sales": Decimal(row[9]),
-                "summary_credits": Decimal(row[10]),
-                "summary_refunds": Decimal(row[11]),
-                "summary_chargebacks": Decimal(row[12]),
-                "summary_fees": Decimal(row[13]),
-                "summary_other_postings": Decimal(row[14]),
-                "summary_net": Decimal(row[15]),
-                "reserve_amount": Decimal(row[16]) if row[16] else None,
-                "reserve_date": row[17] if row[17] else None,
-                "fees_sales": Decimal(row[18]),
-                "fees_refunds": Decimal(row[19]),
-                "fees_authorisations": Decimal(row[20]),
-                "fees_credits": Decimal(row[21]),
-                "fees_minimum_processing": Decimal(row[22]),
-                "fees_service": Decimal(row[23]),
-                "fees_wire_transfer": Decimal(row[24]),
-                "fees_chargebacks": Decimal(row[25]),
-                "fees_retrieval_requests": Decimal(row[26]),
-                "payout_reference_number": row[27] if row[27] else None,
-                "payout_descriptor": row[28] if row[28] else None,
-                "reserve_reference_number": row[29] if row[29] else None,
-                "reserve_descriptor": row[30] if row[30] else None,
-                "fees_interchange": Decimal(row[31]),
-                "fees_scheme": Decimal(row[32]),
-            },
-        )
-        if created:
-            create_count += 1
-    return create_count
+    rows = (
+        {
+            "clearhaus_uuid": row[2],
+            "merchant_id": row[0],
+            "merchant_name": row[1],
+            "settled": row[3] == "true",
+            "currency": row[4],
+            "period_start_date": row[5],
+            "period_end_date": row[6] if row[6] else None,
+            "payout_amount": Decimal(row[7]) if row[7] else None,
+            "payout_date": row[8] if row[8] else None,
+            "summary_sales": Decimal(row[9]),
+            "summary_credits": Decimal(row[10]),
+            "summary_refunds": Decimal(row[11]),
+            "summary_chargebacks": Decimal(row[12]),
+            "summary_fees": Decimal(row[13]),
+            "summary_other_postings": Decimal(row[14]),
+            "summary_net": Decimal(row[15]),
+            "reserve_amount": Decimal(row[16]) if row[16] else None,
+            "reserve_date": row[17] if row[17] else None,
+            "fees_sales": Decimal(row[18]),
+            "fees_refunds": Decimal(row[19]),
+            "fees_authorisations": Decimal(row[20]),
+            "fees_credits": Decimal(row[21]),
+            "fees_minimum_processing": Decimal(row[22]),
+            "fees_service": Decimal(row[23]),
+            "fees_wire_transfer": Decimal(row[24]),
+            "fees_chargebacks": Decimal(row[25]),
+            "fees_retrieval_requests": Decimal(row[26]),
+            "payout_reference_number": row[27] if row[27] else None,
+            "payout_descriptor": row[28] if row[28] else None,
+            "reserve_reference_number": row[29] if row[29] else None,
+            "reserve_descriptor": row[30] if row[30] else None,
+            "fees_interchange": Decimal(row[31]),
+            "fees_scheme": Decimal(row[32]),
+        }
+        for row in csvreader
+    )
+    # update existing settlements so we can import CSV with the same settlements and update stuff like payout_date
+    return BulkImporter(
+        ClearhausSettlement,
+        key_fields=["clearhaus_uuid"],
+        update_fields=CLEARHAUS_SETTLEMENT_FIELDS,
+    ).run(rows)
 
 
 def optional_int(value):
@@ -388,24 +512,39 @@ class ZettleExcelImporter:
     @staticmethod
     def import_zettle_receipts_df(df):
         """Import a pandas dataframe with Zettle receipts (from POS sales)."""
-        create_count = 0
-        for _index, row in df.iterrows():
-            zr, created = ZettleReceipt.objects.get_or_create(
-                zettle_created=pd.to_datetime(row["Dato"]).replace(tzinfo=cph),
-                receipt_number=row["Kvitteringsnummer"],
-                vat=row["Moms (25.0%)"],
-                total=row["Total"],
-                fee=row["Afgift"],
-                net=row["Netto"],
-                payment_method=row["Betalingsmetode"],
-                card_issuer=(row["Kortudsteder"] if not pd.isnull(row["Kortudsteder"]) else None),
-                staff=row["Personale"],
-                description=row["Beskrivelse"],
-                sold_via=row["Solgt via"],
-            )
-            if created:
-                create_count += 1
-        return create_count
+        rows = (
+            {
+                "zettle_created": pd.to_datetime(row["Dato"]).replace(tzinfo=cph).to_pydatetime(),
+                "receipt_number": row["Kvitteringsnummer"],
+                "vat": row["Moms (25.0%)"],
+                "total": row["Total"],
+                "fee": row["Afgift"],
+                "net": row["Netto"],
+                "payment_method": row["Betalingsmetode"],
+                "card_issuer": (row["Kortudsteder"] if not pd.isnull(row["Kortudsteder"]) else None),
+                "staff": row["Personale"],
+                "description": row["Beskrivelse"],
+                "sold_via": row["Solgt via"],
+            }
+            # to_dict() is a lot faster than iterrows()
+            for row in df.to_dict("records")
+        )
+        return BulkImporter(
+            ZettleReceipt,
+            key_fields=[
+                "zettle_created",
+                "receipt_number",
+                "vat",
+                "total",
+                "fee",
+                "net",
+                "payment_method",
+                "card_issuer",
+                "staff",
+                "description",
+                "sold_via",
+            ],
+        ).run(rows)
 
     @staticmethod
     def load_zettle_balances_excel(fh):
@@ -439,24 +578,41 @@ class ZettleExcelImporter:
     @staticmethod
     def import_zettle_balances_df(df):
         """Import a pandas dataframe with Zettle account statements and balances."""
-        create_count = 0
-        for _index, row in df.iterrows():
-            # create balance
-            zb, created = ZettleBalance.objects.get_or_create(
-                statement_time=timezone.make_aware(row["Afregningsdato"], timezone=cph),
-                payment_time=(
-                    timezone.make_aware(row["Betalingsdato"], timezone=cph)
+        rows = (
+            {
+                "statement_time": timezone.make_aware(
+                    pd.to_datetime(row["Afregningsdato"]).to_pydatetime(), timezone=cph
+                ),
+                "payment_time": (
+                    timezone.make_aware(pd.to_datetime(row["Betalingsdato"]).to_pydatetime(), timezone=cph)
                     if not pd.isnull(row["Betalingsdato"])
                     else None
                 ),
-                payment_reference=(row["Reference"] if not pd.isnull(row["Reference"]) else None),
-                description=row["Type"],
-                amount=row["Netto"],
-                balance=row["Saldo"],
-            )
-            if created:
-                create_count += 1
-        return create_count
+                "payment_reference": (row["Reference"] if not pd.isnull(row["Reference"]) else None),
+                "description": row["Type"],
+                "amount": row["Netto"],
+                "balance": row["Saldo"],
+            }
+            # to_dict() is a lot faster than iterrows()
+            for row in df.to_dict("records")
+        )
+        return BulkImporter(
+            ZettleBalance,
+            key_fields=["statement_time", "payment_time", "payment_reference", "description", "amount", "balance"],
+        ).run(rows)
+
+
+# transfer_id and bank_account are left out, transactions in the sales CSV do not have them yet
+MOBILEPAY_TRANSACTION_KEY_FIELDS = [
+    "mobilepay_created",
+    "event",
+    "currency",
+    "amount",
+    "comment",
+    "transaction_id",
+    "payment_point",
+    "myshop_number",
+]
 
 
 class MobilePayCSVImporter:
@@ -474,27 +630,24 @@ class MobilePayCSVImporter:
 
         We skip the columns with Customer name, MP-number and the last two date/time columns (redundant)
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            mt, created = MobilePayTransaction.objects.get_or_create(
-                event=row[0],
-                currency=row[1],
-                amount=Decimal(row[2].replace(",", ".")),
-                mobilepay_created=row[3],
-                comment=row[6],
-                transaction_id=row[7] or None,
-                payment_point=row[9],
-                myshop_number=row[10],
-                defaults={
-                    "transfer_id": row[8] or None,
-                    "bank_account": row[11],
-                },
-            )
-            if created:
-                create_count += 1
-        return create_count
+        rows = (
+            {
+                "event": row[0],
+                "currency": row[1],
+                "amount": Decimal(row[2].replace(",", ".")),
+                "mobilepay_created": row[3],
+                "comment": row[6],
+                "transaction_id": row[7] or None,
+                "payment_point": row[9],
+                "myshop_number": row[10],
+                "transfer_id": row[8] or None,
+                "bank_account": row[11],
+            }
+            for row in csvreader
+        )
+        return BulkImporter(MobilePayTransaction, key_fields=MOBILEPAY_TRANSACTION_KEY_FIELDS).run(rows)
 
     @staticmethod
     def import_mobilepay_sales_csv(csvreader):
@@ -512,68 +665,116 @@ class MobilePayCSVImporter:
 
         We skip the columns with Customer name, MP-number and the last two date/time columns (redundant)
         """
-        create_count = 0
         # skip header row
         next(csvreader)
-        for row in csvreader:
-            mt, created = MobilePayTransaction.objects.get_or_create(
-                event=row[0],
-                currency=row[1],
-                amount=Decimal(row[2].replace(",", ".")),
-                mobilepay_created=row[3],
-                comment=row[6],
-                transaction_id=row[7] or None,
-                payment_point=row[8],
-                myshop_number=row[9],
-                defaults={
-                    "transfer_id": None,
-                    "bank_account": None,
-                },
-            )
-            if created:
-                create_count += 1
-        return create_count
+        rows = (
+            {
+                "event": row[0],
+                "currency": row[1],
+                "amount": Decimal(row[2].replace(",", ".")),
+                "mobilepay_created": row[3],
+                "comment": row[6],
+                "transaction_id": row[7] or None,
+                "payment_point": row[8],
+                "myshop_number": row[9],
+                "transfer_id": None,
+                "bank_account": None,
+            }
+            for row in csvreader
+        )
+        return BulkImporter(MobilePayTransaction, key_fields=MOBILEPAY_TRANSACTION_KEY_FIELDS).run(rows)
+
+
+def write_csv(path, header, rows) -> int:
+    """Write the header and rows to a CSV file and return the number of rows written."""
+    count = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, dialect="excel")
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
 
 
 class AccountingExporter:
-    """A class with methods for exporting all the financial data for the bookkeeper."""
+    """A class with methods for exporting all the financial data for the bookkeeper.
+
+    The exports are independent of each other, so they run in a pool of threads,
+    each with its own database connection. Every CSV file is written from a single
+    query which is read in chunks, and the zipfile is written to a temporary file,
+    so big exports neither keep all the rows nor the archive in memory.
+    """
 
-    def __init__(self, startdate, enddate) -> None:
-        """Requires startdate and enddate."""
+    # the number of rows to fetch from the database at a time
+    chunk_size = 2000
+
+    def __init__(self, startdate, enddate, workers=None) -> None:
+        """Requires startdate and enddate. Runs settings.ACCOUNTING_EXPORT_WORKERS exports at a time by default."""
         self.period = DateTimeTZRange(startdate, enddate)
+        self.workers = workers or settings.ACCOUNTING_EXPORT_WORKERS
 
-    def doit(self) -> None:
-        """Do all the things."""
-        with tempfile.TemporaryDirectory(prefix="django-accounting-") as tmpdir:
-            workdir = Path(tmpdir)
+    def get_exports(self) -> dict:
+        """Return a dict of attribute name to (export method, kwargs) for all the exports."""
+        return {
             # bank
-            self.bankaccounts = self.bank_csv_export(workdir)
+            "bankaccounts": (self.bank_csv_export, {}),
             # website stuff
-            self.paid_invoices = self.invoice_csv_export(workdir, paid=True)
-            self.unpaid_invoices = self.invoice_csv_export(workdir, paid=False)
-            self.paid_creditnotes = self.creditnote_csv_export(workdir, paid=True)
-            self.unpaid_creditnotes = self.creditnote_csv_export(workdir, paid=False)
-            self.orders = self.shoporder_csv_export(workdir)
-            self.customorders = self.customorder_csv_export(workdir)
-            self.expenses = self.expense_csv_export(workdir)
-            self.revenues = self.revenue_csv_export(workdir)
-            self.reimbursements = self.reimbursement_csv_export(workdir)
-            self.pos = self.pos_csv_export(workdir)
+            "paid_invoices": (self.invoice_csv_export, {"paid": True}),
+            "unpaid_invoices": (self.invoice_csv_export, {"paid": False}),
+            "paid_creditnotes": (self.creditnote_csv_export, {"paid": True}),
+            "unpaid_creditnotes": (self.creditnote_csv_export, {"paid": False}),
+            "orders": (self.shoporder_csv_export, {}),
+            "customorders": (self.customorder_csv_export, {}),
+            "expenses": (self.expense_csv_export, {}),
+            "revenues": (self.revenue_csv_export, {}),
+            "reimbursements": (self.reimbursement_csv_export, {}),
+            "pos": (self.pos_csv_export, {}),
             # PSPs
-            self.coinify = self.coinify_csv_export(workdir)
-            self.epay = self.epay_csv_export(workdir)
-            self.clearhaus = self.clearhaus_csv_export(workdir)
-            self.zettle = self.zettle_csv_export(workdir)
-            self.mobilepay = self.mobilepay_csv_export(workdir)
+            "coinify": (self.coinify_csv_export, {}),
+            "epay": (self.epay_csv_export, {}),
+            "clearhaus": (self.clearhaus_csv_export, {}),
+            "zettle": (self.zettle_csv_export, {}),
+            "mobilepay": (self.mobilepay_csv_export, {}),
+        }
+
+    @staticmethod
+    def run_export(method, workdir, **kwargs):
+        """Run an export method in a worker thread and close the database connection of the thread afterwards."""
+        try:
+            return method(workdir, **kwargs)
+        finally:
+            connections.close_all()
+
+    def doit(self, archive=None) -> None:
+        """Do all the things.
+
+        The zipfile is written to archive if it is given, which can be any writable
+        file object, or to a temporary file which is available as self.archivedata.
+        """
+        with tempfile.TemporaryDirectory(prefix="django-accounting-") as tmpdir:
+            workdir = Path(tmpdir)
+            exports = self.get_exports()
+            if self.workers > 1:
+                with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="accounting-export") as executor:
+                    futures = {
+                        name: executor.submit(self.run_export, method, workdir, **kwargs)
+                        for name, (method, kwargs) in exports.items()
+                    }
+                    results = {name: future.result() for name, future in futures.items()}
+            else:
+                results = {name: method(workdir, **kwargs) for name, (method, kwargs) in exports.items()}
+            for name, result in results.items():
+                setattr(self, name, result)
             # wrap up
             self.create_index_html(workdir)
-            self.create_archive(workdir)
+            self.create_archive(workdir, archive)
 
     def bank_csv_export(self, workdir):
         """Export bank accounting data in CSV files."""
         files = []
         for ba in (
-            BankAccount.objects.all()
+            BankAccount.objects.select_related("bank")
             .exclude(start_date__gte=self.period.upper)
             .exclude(end_date__lte=self.period.lower)
         ):
@@ -585,35 +786,28 @@ class AccountingExporter:
         if not filename:
             paid_str = "paid" if paid else "unpaid"
             filename = f"bornhack_{paid_str}_invoices_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
-                ["invoice_date", "invoice_number", "order", "amount", "vat"],
-            )
-            invoices = Invoice.objects.filter(
+        invoices = (
+            Invoice.objects.filter(
                 created__gte=self.period.lower,
                 created__lte=self.period.upper,
             )
-            count = 0
-            for invoice in invoices:
-                if invoice.get_order.paid != paid:
-                    continue
-                if invoice.order:
-                    amount = invoice.order.total
-                    vat = True
-                else:
-                    amount = invoice.customorder.amount
-                    vat = invoice.customorder.danish_vat
-                writer.writerow(
-                    [
-                        invoice.created.date(),
-                        invoice.id,
-                        invoice.get_order,
-                        amount,
-                        vat,
-                    ],
-                )
-                count += 1
+            .filter(Q(order__paid=paid) | Q(order__isnull=True, customorder__paid=paid))
+            .with_order_total()
+        )
+        count = write_csv(
+            workdir / filename,
+            ["invoice_date", "invoice_number", "order", "amount", "vat"],
+            (
+                [
+                    invoice.created.date(),
+                    invoice.id,
+                    invoice.get_order,
+                    invoice.amount,
+                    True if invoice.order else invoice.customorder.danish_vat,
+                ]
+                for invoice in invoices.iterator(chunk_size=self.chunk_size)
+            ),
+        )
         return (filename, count)
 
     def creditnote_csv_export(self, workdir, paid=True, filename=None):
@@ -621,225 +815,238 @@ class AccountingExporter:
         if not filename:
             paid_str = "paid" if paid else "unpaid"
             filename = f"bornhack_{paid_str}_creditnotes_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        creditnotes = CreditNote.objects.filter(
+            paid=paid,
+            created__gte=self.period.lower,
+            created__lte=self.period.upper,
+        ).select_related("user")
+        count = write_csv(
+            workdir / filename,
+            [
+                "creditnote_date",
+                "creditnote_number",
+                "customer",
+                "text",
+                "amount",
+                "vat",
+            ],
+            (
                 [
-                    "creditnote_date",
-                    "creditnote_number",
-                    "customer",
-                    "text",
-                    "amount",
-                    "vat",
-                ],
-            )
-            creditnotes = CreditNote.objects.filter(
-                paid=paid,
-                created__gte=self.period.lower,
-                created__lte=self.period.upper,
-            )
-            for creditnote in creditnotes:
-                writer.writerow(
-                    [
-                        creditnote.created.date(),
-                        creditnote.id,
-                        creditnote.user if creditnote.user else creditnote.customer,
-                        creditnote.text,
-                        creditnote.amount,
-                        creditnote.danish_vat,
-                    ],
-                )
-        return (filename, creditnotes.count())
+                    creditnote.created.date(),
+                    creditnote.id,
+                    creditnote.user if creditnote.user else creditnote.customer,
+                    creditnote.text,
+                    creditnote.amount,
+                    creditnote.danish_vat,
+                ]
+                for creditnote in creditnotes.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def shoporder_csv_export(self, workdir, filename=None):
         """Export webshop orders in our system. Only paid orders are interesting for accounting."""
         if not filename:
             filename = f"bornhack_paid_webshop_orders_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
-                [
-                    "id",
-                    "amount",
-                    "vat",
-                    "payment_method",
-                    "cancelled",
-                    "refunded",
-                    "notes",
-                    "invoice",
-                ],
-            )
-            orders = Order.objects.filter(
+        orders = (
+            Order.objects.filter(
                 paid=True,
                 created__gte=self.period.lower,
                 created__lte=self.period.upper,
             )
-            for order in orders:
-                invoiceid = order.invoice.id if order.invoice else "N/A"
-                writer.writerow(
-                    [
-                        order.id,
-                        order.total,
-                        True,
-                        order.payment_method,
-                        order.cancelled,
-                        order.refunded,
-                        order.notes,
-                        invoiceid,
-                    ],
-                )
-        return (filename, orders.count())
+            .with_total()
+            .annotate(invoice_number=F("invoice__id"))
+        )
+        count = write_csv(
+            workdir / filename,
+            [
+                "id",
+                "amount",
+                "vat",
+                "payment_method",
+                "cancelled",
+                "refunded",
+                "notes",
+                "invoice",
+            ],
+            (
+                [
+                    order.id,
+                    order.total,
+                    True,
+                    order.payment_method,
+                    order.cancelled,
+                    order.refunded,
+                    order.notes,
+                    order.invoice_number or "N/A",
+                ]
+                for order in orders.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def customorder_csv_export(self, workdir, filename=None):
         """Export customorders in our system."""
         if not filename:
             filename = f"bornhack_custom_orders_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(["id", "amount", "vat", "paid", "customer"])
-            orders = CustomOrder.objects.filter(
-                created__gte=self.period.lower,
-                created__lte=self.period.upper,
-            )
-            for order in orders:
-                writer.writerow(
-                    [
-                        order.id,
-                        order.amount,
-                        order.danish_vat,
-                        order.paid,
-                        order.customer,
-                    ],
-                )
-        return (filename, orders.count())
+        orders = CustomOrder.objects.filter(
+            created__gte=self.period.lower,
+            created__lte=self.period.upper,
+        )
+        count = write_csv(
+            workdir / filename,
+            ["id", "amount", "vat", "paid", "customer"],
+            (
+                [
+                    order.id,
+                    order.amount,
+                    order.danish_vat,
+                    order.paid,
+                    order.customer,
+                ]
+                for order in orders.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def expense_csv_export(self, workdir, filename=None):
         """Export expenses in our system."""
         if not filename:
             filename = f"bornhack_expenses_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        expenses = Expense.objects.filter(
+            invoice_date__gte=self.period.lower,
+            invoice_date__lte=self.period.upper,
+        ).select_related("camp", "user", "creditor", "reimbursement")
+        count = write_csv(
+            workdir / filename,
+            [
+                "uuid",
+                "camp",
+                "creating_user",
+                "creditor",
+                "amount",
+                "description",
+                "paid_by_bornhack",
+                "invoice",
+                "invoice_date",
+                "reimbursement",
+                "notes",
+            ],
+            (
                 [
-                    "uuid",
-                    "camp",
-                    "creating_user",
-                    "creditor",
-                    "amount",
-                    "description",
-                    "paid_by_bornhack",
-                    "invoice",
-                    "invoice_date",
-                    "reimbursement",
-                    "notes",
-                ],
-            )
-            expenses = Expense.objects.filter(
-                invoice_date__gte=self.period.lower,
-                invoice_date__lte=self.period.upper,
-            )
-            for expense in expenses:
-                writer.writerow(
-                    [
-                        expense.uuid,
-                        expense.camp.title,
-                        expense.user,
-                        expense.creditor,
-                        expense.amount,
-                        expense.description,
-                        expense.paid_by_bornhack,
-                        expense.invoice.path,
-                        expense.invoice_date,
-                        expense.reimbursement,
-                        expense.notes,
-                    ],
-                )
-        return (filename, expenses.count())
+                    expense.uuid,
+                    expense.camp.title,
+                    expense.user,
+                    expense.creditor,
+                    expense.amount,
+                    expense.description,
+                    expense.paid_by_bornhack,
+                    expense.invoice.path,
+                    expense.invoice_date,
+                    expense.reimbursement,
+                    expense.notes,
+                ]
+                for expense in expenses.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def revenue_csv_export(self, workdir, filename=None):
         """Export revenues in our system."""
         if not filename:
             filename = f"bornhack_revenues_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        revenues = Revenue.objects.filter(
+            invoice_date__gte=self.period.lower,
+            invoice_date__lte=self.period.upper,
+        ).select_related("camp", "user", "debtor")
+        count = write_csv(
+            workdir / filename,
+            [
+                "uuid",
+                "camp",
+                "creating_user",
+                "debtor",
+                "amount",
+                "description",
+                "invoice",
+                "invoice_date",
+                "notes",
+            ],
+            (
                 [
-                    "uuid",
-                    "camp",
-                    "creating_user",
-                    "debtor",
-                    "amount",
-                    "description",
-                    "invoice",
-                    "invoice_date",
-                    "notes",
-                ],
-            )
-            revenues = Revenue.objects.filter(
-                invoice_date__gte=self.period.lower,
-                invoice_date__lte=self.period.upper,
-            )
-            for revenue in revenues:
-                writer.writerow(
-                    [
-                        revenue.uuid,
-                        revenue.camp.title,
-                        revenue.user,
-                        revenue.debtor,
-                        revenue.amount,
-                        revenue.description,
-                        revenue.invoice.path,
-                        revenue.invoice_date,
-                        revenue.notes,
-                    ],
-                )
-        return (filename, revenues.count())
+                    revenue.uuid,
+                    revenue.camp.title,
+                    revenue.user,
+                    revenue.debtor,
+                    revenue.amount,
+                    revenue.description,
+                    revenue.invoice.path,
+                    revenue.invoice_date,
+                    revenue.notes,
+                ]
+                for revenue in revenues.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def reimbursement_csv_export(self, workdir, filename=None):
         """Export reimbursements in our system."""
         if not filename:
             filename = f"bornhack_reimbursements_{self.period.lower}_{self.period.upper}.csv"
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
-                [
-                    "uuid",
-                    "created_by",
-                    "created_for",
-                    "notes",
-                    "paid",
-                    "covered_expenses",
-                    "payback_expense",
-                ],
+        # the expense created to pay back each reimbursement
+        payback_expenses = Expense.objects.filter(
+            reimbursement=OuterRef("pk"),
+            created_for_reimbursement=True,
+        )
+        reimbursements = (
+            Reimbursement.objects.filter(paid=True)
+            .annotate(
+                payback_expense_uuid=Subquery(payback_expenses.values("uuid")[:1]),
+                payback_expense_date=Subquery(payback_expenses.values("invoice_date")[:1]),
             )
-            count = 0
-            for reimbursement in Reimbursement.objects.filter(paid=True):
-                if not reimbursement.payback_expense:
-                    continue
-                if reimbursement.payback_expense.invoice_date < self.period.lower:
-                    continue
-                if reimbursement.payback_expense.invoice_date > self.period.upper:
-                    continue
-                writer.writerow(
-                    [
-                        reimbursement.uuid,
-                        reimbursement.user,
-                        reimbursement.reimbursement_user,
-                        reimbursement.notes,
-                        reimbursement.paid,
-                        reimbursement.expenses.exclude(
-                            paid_by_bornhack=True,
-                        ).values_list("uuid", flat=True),
-                        reimbursement.payback_expense.uuid,
-                    ],
-                )
-                count += 1
+            .filter(
+                payback_expense_date__gte=self.period.lower,
+                payback_expense_date__lte=self.period.upper,
+            )
+            .select_related("user", "reimbursement_user")
+            .prefetch_related(
+                Prefetch(
+                    "expenses",
+                    queryset=Expense.objects.exclude(paid_by_bornhack=True),
+                    to_attr="covered_expense_list",
+                ),
+            )
+        )
+        count = write_csv(
+            workdir / filename,
+            [
+                "uuid",
+                "created_by",
+                "created_for",
+                "notes",
+                "paid",
+                "covered_expenses",
+                "payback_expense",
+            ],
+            (
+                [
+                    reimbursement.uuid,
+                    reimbursement.user,
+                    reimbursement.reimbursement_user,
+                    reimbursement.notes,
+                    reimbursement.paid,
+                    [expense.uuid for expense in reimbursement.covered_expense_list],
+                    reimbursement.payback_expense_uuid,
+                ]
+                for reimbursement in reimbursements.iterator(chunk_size=self.chunk_size)
+            ),
+        )
         return (filename, count)
 
     def pos_csv_export(self, workdir):
         """Export PoS data in CSV files."""
         files = []
-        for pos in Pos.objects.filter(pos_reports__period__overlap=self.period):
+        for pos in Pos.objects.filter(pos_reports__period__overlap=self.period).distinct():
             files.append(pos.export_csv(self.period, workdir))
         return files
 
@@ -851,43 +1058,42 @@ class AccountingExporter:
             coinify_created__gte=self.period.lower,
             coinify_created__lte=self.period.upper,
         )
-        with open(workdir / invoices_filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        invoices_count = write_csv(
+            workdir / invoices_filename,
+            [
+                "bornhack_uuid",
+                "coinify_id",
+                "coinify_id_alpha",
+                "coinify_created",
+                "payment_amount",
+                "payment_currency",
+                "payment_btc_amount",
+                "description",
+                "credited_amount",
+                "credited_currency",
+                "state",
+                "payment_type",
+                "original_payment_id",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "coinify_id",
-                    "coinify_id_alpha",
-                    "coinify_created",
-                    "payment_amount",
-                    "payment_currency",
-                    "payment_btc_amount",
-                    "description",
-                    "credited_amount",
-                    "credited_currency",
-                    "state",
-                    "payment_type",
-                    "original_payment_id",
-                ],
-            )
-            for ci in invoices:
-                writer.writerow(
-                    [
-                        ci.pk,
-                        ci.coinify_id,
-                        ci.coinify_id_alpha,
-                        ci.coinify_created,
-                        ci.payment_amount,
-                        ci.payment_currency,
-                        ci.payment_btc_amount,
-                        ci.description,
-                        ci.credited_amount,
-                        ci.credited_currency,
-                        ci.state,
-                        ci.payment_type,
-                        ci.original_payment_id,
-                    ],
-                )
+                    ci.pk,
+                    ci.coinify_id,
+                    ci.coinify_id_alpha,
+                    ci.coinify_created,
+                    ci.payment_amount,
+                    ci.payment_currency,
+                    ci.payment_btc_amount,
+                    ci.description,
+                    ci.credited_amount,
+                    ci.credited_currency,
+                    ci.state,
+                    ci.payment_type,
+                    ci.original_payment_id,
+                ]
+                for ci in invoices.iterator(chunk_size=self.chunk_size)
+            ),
+        )
 
         # payouts
         payouts_filename = f"bornhack_coinify_payouts_{self.period.lower}_{self.period.upper}.csv"
@@ -895,37 +1101,36 @@ class AccountingExporter:
             coinify_created__gte=self.period.lower,
             coinify_created__lte=self.period.upper,
         )
-        with open(workdir / payouts_filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        payouts_count = write_csv(
+            workdir / payouts_filename,
+            [
+                "bornhack_uuid",
+                "coinify_id",
+                "coinify_created",
+                "amount",
+                "fee",
+                "transferred",
+                "currency",
+                "amount_dkk",
+                "fee_dkk",
+                "transferred_dkk",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "coinify_id",
-                    "coinify_created",
-                    "amount",
-                    "fee",
-                    "transferred",
-                    "currency",
-                    "amount_dkk",
-                    "fee_dkk",
-                    "transferred_dkk",
-                ],
-            )
-            for cp in payouts:
-                writer.writerow(
-                    [
-                        cp.pk,
-                        cp.coinify_id,
-                        cp.coinify_created,
-                        cp.amount,
-                        cp.fee,
-                        cp.transferred,
-                        cp.currency,
-                        cp.amount_dkk,
-                        cp.fee_dkk,
-                        cp.transferred_dkk,
-                    ],
-                )
+                    cp.pk,
+                    cp.coinify_id,
+                    cp.coinify_created,
+                    cp.amount,
+                    cp.fee,
+                    cp.transferred,
+                    cp.currency,
+                    cp.amount_dkk,
+                    cp.fee_dkk,
+                    cp.transferred_dkk,
+                ]
+                for cp in payouts.iterator(chunk_size=self.chunk_size)
+            ),
+        )
 
         # balances
         balances_filename = f"bornhack_coinify_balances_{self.period.lower}_{self.period.upper}.csv"
@@ -933,25 +1138,24 @@ class AccountingExporter:
             date__gte=self.period.lower,
             date__lte=self.period.upper,
         )
-        with open(workdir / balances_filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
-                [
-                    "bornhack_uuid",
-                    "date",
-                    "btc",
-                    "dkk",
-                    "eur",
-                ],
-            )
-            for balance in balances:
-                writer.writerow(
-                    [balance.pk, balance.date, balance.btc, balance.dkk, balance.eur],
-                )
+        balances_count = write_csv(
+            workdir / balances_filename,
+            [
+                "bornhack_uuid",
+                "date",
+                "btc",
+                "dkk",
+                "eur",
+            ],
+            (
+                [balance.pk, balance.date, balance.btc, balance.dkk, balance.eur]
+                for balance in balances.iterator(chunk_size=self.chunk_size)
+            ),
+        )
         return (
-            (balances_filename, balances.count()),
-            (payouts_filename, payouts.count()),
-            (invoices_filename, invoices.count()),
+            (balances_filename, balances_count),
+            (payouts_filename, payouts_count),
+            (invoices_filename, invoices_count),
         )
 
     def epay_csv_export(self, workdir):
@@ -961,42 +1165,41 @@ class AccountingExporter:
             auth_date__gte=self.period.lower,
             auth_date__lte=self.period.upper,
         )
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        count = write_csv(
+            workdir / filename,
+            [
+                "bornhack_uuid",
+                "merchant_id",
+                "transaction_id",
+                "order_id",
+                "currency",
+                "auth_date",
+                "auth_amount",
+                "captured_date",
+                "captured_amount",
+                "card_type",
+                "description",
+                "transaction_fee",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "merchant_id",
-                    "transaction_id",
-                    "order_id",
-                    "currency",
-                    "auth_date",
-                    "auth_amount",
-                    "captured_date",
-                    "captured_amount",
-                    "card_type",
-                    "description",
-                    "transaction_fee",
-                ],
-            )
-            for et in transactions:
-                writer.writerow(
-                    [
-                        et.pk,
-                        et.merchant_id,
-                        et.transaction_id,
-                        et.order_id,
-                        et.currency,
-                        et.auth_date,
-                        et.auth_amount,
-                        et.captured_date,
-                        et.captured_amount,
-                        et.card_type,
-                        et.description,
-                        et.transaction_fee,
-                    ],
-                )
-        return (filename, transactions.count())
+                    et.pk,
+                    et.merchant_id,
+                    et.transaction_id,
+                    et.order_id,
+                    et.currency,
+                    et.auth_date,
+                    et.auth_amount,
+                    et.captured_date,
+                    et.captured_amount,
+                    et.card_type,
+                    et.description,
+                    et.transaction_fee,
+                ]
+                for et in transactions.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def clearhaus_csv_export(self, workdir):
         """Export Clearhaus settlements in our system."""
@@ -1005,86 +1208,47 @@ class AccountingExporter:
             payout_date__gte=self.period.lower,
             payout_date__lte=self.period.upper,
         )
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
-                [
-                    "bornhack_uuid",
-                    "merchant_id",
-                    "merchant_name",
-                    "clearhaus_uuid",
-                    "settled",
-                    "currency",
-                    "period_start_date",
-                    "period_end_date",
-                    "payout_amount",
-                    "payout_date",
-                    "summary_sales",
-                    "summary_credits",
-                    "summary_refunds",
-                    "summary_chargebacks",
-                    "summary_fees",
-                    "summary_other_postings",
-                    "summary_net",
-                    "reserve_amount",
-                    "reserve_date",
-                    "fees_sales",
-                    "fees_refunds",
-                    "fees_authorisations",
-                    "fees_credits",
-                    "fees_minimum_processing",
-                    "fees_service",
-                    "fees_wire_transfer",
-                    "fees_chargebacks",
-                    "fees_retrieval_requests",
-                    "payout_reference_number",
-                    "payout_descriptor",
-                    "reserve_reference_number",
-                    "reserve_descriptor",
-                    "fees_interchange",
-                    "fees_scheme",
-                ],
-            )
-            for s in settlements:
-                writer.writerow(
-                    [
-                        s.pk,
-                        s.merchant_id,
-                        s.merchant_name,
-                        s.clearhaus_uuid,
-                        s.settled,
-                        s.currency,
-                        s.period_start_date,
-                        s.period_end_date,
-                        s.payout_amount,
-                        s.payout_date,
-                        s.summary_sales,
-                        s.summary_credits,
-                        s.summary_refunds,
-                        s.summary_chargebacks,
-                        s.summary_fees,
-                        s.summary_other_postings,
-                        s.summary_net,
-                        s.reserve_amount,
-                        s.reserve_date,
-                        s.fees_sales,
-                        s.fees_refunds,
-                        s.fees_authorisations,
-                        s.fees_credits,
-                        s.fees_minimum_processing,
-                        s.fees_service,
-                        s.fees_wire_transfer,
-                        s.fees_chargebacks,
-                        s.fees_retrieval_requests,
-                        s.payout_reference_number,
-                        s.payout_descriptor,
-                        s.reserve_reference_number,
-                        s.reserve_descriptor,
-                        s.fees_interchange,
-                        s.fees_scheme,
-                    ],
-                )
-        return (filename, settlements.count())
+        fields = [
+            "merchant_id",
+            "merchant_name",
+            "clearhaus_uuid",
+            "settled",
+            "currency",
+            "period_start_date",
+            "period_end_date",
+            "payout_amount",
+            "payout_date",
+            "summary_sales",
+            "summary_credits",
+            "summary_refunds",
+            "summary_chargebacks",
+            "summary_fees",
+            "summary_other_postings",
+            "summary_net",
+            "reserve_amount",
+            "reserve_date",
+            "fees_sales",
+            "fees_refunds",
+            "fees_authorisations",
+            "fees_credits",
+            "fees_minimum_processing",
+            "fees_service",
+            "fees_wire_transfer",
+            "fees_chargebacks",
+            "fees_retrieval_requests",
+            "payout_reference_number",
+            "payout_descriptor",
+            "reserve_reference_number",
+            "reserve_descriptor",
+            "fees_interchange",
+            "fees_scheme",
+        ]
+        count = write_csv(
+            workdir / filename,
+            ["bornhack_uuid", *fields],
+            settlements.values_list("pk", *fields).iterator(chunk_size=self.chunk_size),
+        )
+        return (filename, count)
 
     def zettle_csv_export(self, workdir):
         """Export Zettle data in our system. Two different CSV files will be created."""
@@ -1094,30 +1258,30 @@ class AccountingExporter:
             statement_time__gte=self.period.lower,
             statement_time__lte=self.period.upper,
         )
-        with open(workdir / balances_filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        balances_count = write_csv(
+            workdir / balances_filename,
+            [
+                "bornhack_uuid",
+                "statement_time",
+                "payment_time",
+                "payment_reference",
+                "description",
+                "amount",
+                "balance",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "statement_time",
-                    "payment_time",
-                    "payment_reference",
-                    "description",
-                    "amount",
-                    "balance",
-                ],
-            )
-            for balance in balances:
-                writer.writerow(
-                    [
-                        balance.pk,
-                        balance.statement_time,
-                        balance.payment_reference,
-                        balance.description,
-                        balance.amount,
-                        balance.balance,
-                    ],
-                )
+                    balance.pk,
+                    balance.statement_time,
+                    balance.payment_time,
+                    balance.payment_reference,
+                    balance.description,
+                    balance.amount,
+                    balance.balance,
+                ]
+                for balance in balances.iterator(chunk_size=self.chunk_size)
+            ),
+        )
 
         # receipts
         receipts_filename = f"bornhack_zettle_receipts_{self.period.lower}_{self.period.upper}.csv"
@@ -1125,45 +1289,44 @@ class AccountingExporter:
             zettle_created__gte=self.period.lower,
             zettle_created__lte=self.period.upper,
         )
-        with open(workdir / receipts_filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        receipts_count = write_csv(
+            workdir / receipts_filename,
+            [
+                "bornhack_uuid",
+                "zettle_created",
+                "receipt_number",
+                "vat",
+                "total",
+                "fee",
+                "net",
+                "payment_method",
+                "card_issuer",
+                "staff",
+                "description",
+                "sold_via",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "zettle_created",
-                    "receipt_number",
-                    "vat",
-                    "total",
-                    "fee",
-                    "net",
-                    "payment_method",
-                    "card_issuer",
-                    "staff",
-                    "description",
-                    "sold_via",
-                ],
-            )
-            for re in receipts:
-                writer.writerow(
-                    [
-                        re.pk,
-                        re.zettle_created,
-                        re.receipt_number,
-                        re.vat,
-                        re.total,
-                        re.fee,
-                        re.net,
-                        re.payment_method,
-                        re.card_issuer,
-                        re.staff,
-                        re.description,
-                        re.sold_via,
-                    ],
-                )
+                    re.pk,
+                    re.zettle_created,
+                    re.receipt_number,
+                    re.vat,
+                    re.total,
+                    re.fee,
+                    re.net,
+                    re.payment_method,
+                    re.card_issuer,
+                    re.staff,
+                    re.description,
+                    re.sold_via,
+                ]
+                for re in receipts.iterator(chunk_size=self.chunk_size)
+            ),
+        )
 
         return (
-            (balances_filename, balances.count()),
-            (receipts_filename, receipts.count()),
+            (balances_filename, balances_count),
+            (receipts_filename, receipts_count),
         )
 
     def mobilepay_csv_export(self, workdir):
@@ -1173,40 +1336,39 @@ class AccountingExporter:
             mobilepay_created__gte=self.period.lower,
             mobilepay_created__lte=self.period.upper,
         )
-        with open(workdir / filename, "w", newline="") as f:
-            writer = csv.writer(f, dialect="excel")
-            writer.writerow(
+        count = write_csv(
+            workdir / filename,
+            [
+                "bornhack_uuid",
+                "event",
+                "currency",
+                "amount",
+                "mobilepay_created",
+                "comment",
+                "transaction_id",
+                "transfer_id",
+                "payment_point",
+                "myshop_number",
+                "bank_account",
+            ],
+            (
                 [
-                    "bornhack_uuid",
-                    "event",
-                    "currency",
-                    "amount",
-                    "mobilepay_created",
-                    "comment",
-                    "transaction_id",
-                    "transfer_id",
-                    "payment_point",
-                    "myshop_number",
-                    "bank_account",
-                ],
-            )
-            for mt in transactions:
-                writer.writerow(
-                    [
-                        mt.pk,
-                        mt.event,
-                        mt.currency,
-                        mt.amount,
-                        mt.mobilepay_created,
-                        mt.comment,
-                        mt.transaction_id,
-                        mt.transfer_id,
-                        mt.payment_point,
-                        mt.myshop_number,
-                        mt.bank_account,
-                    ],
-                )
-        return (filename, transactions.count())
+                    mt.pk,
+                    mt.event,
+                    mt.currency,
+                    mt.amount,
+                    mt.mobilepay_created,
+                    mt.comment,
+                    mt.transaction_id,
+                    mt.transfer_id,
+                    mt.payment_point,
+                    mt.myshop_number,
+                    mt.bank_account,
+                ]
+                for mt in transactions.iterator(chunk_size=self.chunk_size)
+            ),
+        )
+        return (filename, count)
 
     def create_index_html(self, workdir) -> None:
         """Create a HTML file with links for everything."""
@@ -1232,11 +1394,13 @@ class AccountingExporter:
         with open(workdir / "index.html", "w") as f:
             f.write(rendered)
 
-    def create_archive(self, workdir) -> None:
-        """Create an in-memory zip-file with all the CSV data and the HTML file."""
-        self.archivedata = io.BytesIO()
+    def create_archive(self, workdir, archive=None) -> None:
+        """Write a zip-file with all the CSV data and the HTML file to archive, or to a temporary file."""
+        if archive is None:
+            archive = tempfile.TemporaryFile()
         subdir = "bornhack_accounting_export"
-        with ZipFile(self.archivedata, "w") as zh:
+        # ZipFile copies the files in chunks, and works with unseekable streams too
+        with ZipFile(archive, "w") as zh:
             # add everything in the workdir
             for filename in workdir.glob("*"):
                 zh.write(filename, f"{subdir}/{basename(filename)}")
@@ -1251,138 +1415,233 @@ class AccountingExporter:
                 # generate an absolute path
                 fullpath = Path(settings.BASE_DIR) / "static_src" / filepath
                 zh.write(fullpath, f"{subdir}/{basename(fullpath)}")
+        if archive.seekable():
+            archive.seek(0)
+        self.archivedata = archive
 
 
-def import_pos_sales_json(transactions):
-    """Importer for sales details from the Pos system.
+def iter_json_objects(fh, read_size=65536):
+    """Yield the objects in a JSON file one at a time without reading the whole file.
 
-    Expects a list of dicts like so:
+    Reads a JSON array of objects, or one object per line, from the text file fh
+    in blocks of read_size characters, so memory use depends on the size of the
+    largest object rather than the size of the file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+    while True:
+        # skip whitespace and the array brackets and commas between the objects
+        buffer = buffer.lstrip(" \t\r\n,[]")
+        if buffer:
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                buffer = buffer[end:]
+                continue
+        elif eof:
+            return
+        chunk = fh.read(read_size)
+        eof = not chunk
+        buffer += chunk
 
-        {'_id': 'eKCFbcn6fvi5eaTJJ', 'userId': 'Y7NgNzTJRxPKupCv5', 'locationId': 'bTasxE2YYXZh35wtQ', 'currency': 'HAX', 'country': 'DK', 'amount': 55, 'timestamp': {'$date': '2021-08-23T18:11:05.379Z'}, 'products': [{'_id': '7oCSE2xt6szw5cZYQ', 'createdAt': {'$date': '2021-08-21T13:41:32.073Z'}, 'brandName': 'Gamma', 'name': 'Tap: Bando', 'description': 'IPA', 'salePrice': '35', 'unitSize': '40', 'sizeUnit': 'cl', 'abv': '6.5', 'tags': ['beer', 'tap'], 'shopPrices': [{'buyPrice': 17.5, 'timestamp': {'$date': '2021-08-21T13:41:32.073Z'}}], 'locationIds': ['bTasxE2YYXZh35wtQ'], 'updatedAt': {'$date': '2021-08-23T11:27:05.459Z'}, 'tap': '1'}, {'_id': 'Z4ZxsPPEDfDbTLHsz', 'createdAt': {'$date': '2021-08-21T13:27:25.47Z'}, 'brandName': 'Vestfyen', 'name': 'Tap: Pilsner', 'description': '', 'salePrice': '20', 'unitSize': '40', 'sizeUnit': 'cl', 'abv': '4.6', 'tags': ['tap', 'beer'], 'shopPrices': [{'buyPrice': 8.65, 'timestamp': {'$date': '2021-08-21T13:27:25.471Z'}}], 'tap': '2', 'updatedAt': {'$date': '2021-08-23T14:46:27.259Z'}, 'locationIds': ['bTasxE2YYXZh35wtQ']}]}
 
+def parse_pos_timestamp(value):
+    """Parse a timestamp from the Pos system, with or without ms."""
+    try:
+        # with ms
+        return datetime.datetime.strptime(value["$date"], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=datetime.UTC)
+    except ValueError:
+        # without ms
+        return datetime.datetime.strptime(value["$date"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=datetime.UTC)
+
+
+def get_pos_product_values(sale) -> dict:
+    """Return the PosProduct field values for a sale from the Pos system."""
+    # get abv when possible
+    try:
+        abv = Decimal(str(sale.get("abv", 0)))
+    except (ValueError, InvalidOperation):
+        # handle stuff like 'abv': {'$numberDouble': 'NaN'}
+        abv = Decimal(0)
+    # get tags (sometimes a list and sometimes a comma seperated string, we want the latter)
+    tags = sale.get("tags", [])
+    if isinstance(tags, list):
+        tags = ",".join(tags)
+    return {
+        "brand_name": sale["brandName"],
+        "name": sale["name"],
+        "description": sale.get("description", ""),
+        "sales_price": int(sale["salePrice"]),
+        "unit_size": Decimal(sale["unitSize"]),
+        "size_unit": sale["sizeUnit"],
+        "abv": abv,
+        "tags": tags,
+    }
+
+
+class PosSalesImporter:
+    """Import sales from the Pos system in batches of transactions.
+
+    Camps, Pos objects and products are looked up once and kept for the whole
+    import, and the transactions, sales and costs of each batch are created with
+    bulk_create() in one database transaction, so a failed import keeps the
+    batches which were already imported. Since transactions which already exist are
+    skipped the import can just be run again.
     """
-    new_transactions = 0
-    new_products = 0
-    new_sales = 0
-    new_costs = 0
-    # loop over transactions
-    logger.info(f"Importing {len(transactions)} transactions...")
-    for tx in transactions:
-        # parse timestamp
-        try:
-            # with ms
-            timestamp = datetime.datetime.strptime(
-                tx["timestamp"]["$date"],
-                "%Y-%m-%dT%H:%M:%S.%fZ",
-            ).replace(tzinfo=datetime.UTC)
-        except ValueError:
-            # without ms
-            timestamp = datetime.datetime.strptime(
-                tx["timestamp"]["$date"],
-                "%Y-%m-%dT%H:%M:%SZ",
-            ).replace(tzinfo=datetime.UTC)
-        # find the Pos related to the camp during which the transaction happened
-        camp = get_closest_camp(timestamp)
-        pos = Pos.objects.get(
-            external_id=tx["locationId"],
-            team__camp=camp,
-        )
 
-        # create or get the transaction
-        transaction, created = PosTransaction.objects.get_or_create(
-            external_transaction_id=tx["_id"],
-            defaults={
-                "pos": pos,
-                "external_user_id": tx.get("userId", ""),
-                "timestamp": timestamp,
-            },
-        )
-        if not created:
-            continue
-        new_transactions += 1
-        logger.debug(
-            f"Found new transaction with txid {transaction.external_transaction_id} as PosTransaction {transaction.pk} - importing products and sales...",
+    product_fields = ("brand_name", "name", "description", "sales_price", "unit_size", "size_unit", "abv", "tags")
+
+    def __init__(self, batch_size=1000) -> None:
+        self.batch_size = batch_size
+        self.camps = list(Camp.objects.all())
+        self.pos = {}
+        self.products = {}
+        # (camp_id, product_id, timestamp, product_cost) of the PosProductCost objects of the products in self.products
+        self.costs = set()
+        self.new_products = 0
+        self.new_transactions = 0
+        self.new_sales = 0
+        self.new_costs = 0
+
+    def check_camp(self, camp) -> None:
+        """Raise CampReadOnlyModeError if objects can not be created for the camp."""
+        if camp and camp.read_only:
+            # bulk_create() skips the check in CampRelatedModel.save()
+            raise CampReadOnlyModeError(f"The camp {camp} is in read only mode.")
+
+    def get_camp(self, timestamp):
+        camp = find_closest_camp(self.camps, timestamp)
+        self.check_camp(camp)
+        return camp
+
+    def get_pos(self, external_id, camp):
+        """Return the Pos for a locationId during the camp."""
+        key = (external_id, camp)
+        if key not in self.pos:
+            self.pos[key] = Pos.objects.get(external_id=external_id, team__camp=camp)
+        return self.pos[key]
+
+    def save_products(self, sales) -> None:
+        """Create or update the products of the sales, like update_or_create() on each of them would."""
+        values = {sale["_id"]: get_pos_product_values(sale) for sale in sales}
+        missing = [external_id for external_id in values if external_id not in self.products]
+        loaded = []
+        for product in PosProduct.objects.filter(external_id__in=missing):
+            self.products[product.external_id] = product
+            loaded.append(product.pk)
+        for cost in PosProductCost.objects.filter(product__in=loaded).values_list(
+            "camp_id",
+            "product_id",
+            "timestamp",
+            "product_cost",
+        ):
+            self.costs.add(cost)
+
+        create = []
+        update = []
+        for external_id, fields in values.items():
+            product = self.products.get(external_id)
+            if product is None:
+                product = PosProduct(external_id=external_id, **fields)
+                self.products[external_id] = product
+                create.append(product)
+                logger.debug(f"Created new product {external_id}: {product.brand_name} - {product.name}")
+            elif any(getattr(product, name) != value for name, value in fields.items()):
+                for name, value in fields.items():
+                    setattr(product, name, value)
+                update.append(product)
+        PosProduct.objects.bulk_create(create, batch_size=self.batch_size)
+        PosProduct.objects.bulk_update(update, self.product_fields, batch_size=self.batch_size)
+        self.new_products += len(create)
+
+    def get_costs(self, sale, product) -> list:
+        """Return the new PosProductCost objects for the shopPrices of a sale."""
+        costs = []
+        for cost in sale.get("shopPrices", []):
+            timestamp = parse_pos_timestamp(cost["timestamp"])
+            # the camp is only checked for costs which are created, a cost from a
+            # read only camp is still in shopPrices of sales in later camps
+            camp = find_closest_camp(self.camps, timestamp)
+            # parse price
+            try:
+                price = Decimal(str(round(cost["buyPrice"], 2)))
+            except (ValueError, InvalidOperation, TypeError):
+                # skip stuff like 'abv': {'$numberDouble': 'NaN'}
+                continue
+            key = (camp.pk, product.pk, timestamp, price)
+            if key in self.costs:
+                continue
+            self.check_camp(camp)
+            self.costs.add(key)
+            costs.append(PosProductCost(camp=camp, product=product, timestamp=timestamp, product_cost=price))
+        return costs
+
+    def import_batch(self, batch) -> None:
+        existing = set(
+            PosTransaction.objects.filter(
+                external_transaction_id__in=[tx["_id"] for tx in batch],
+            ).values_list("external_transaction_id", flat=True),
         )
-        # loop over each sale in the transaction
-        for sale in tx["products"]:
-            if sale["salePrice"] == 0:
-                # skip sales where the sales_price is 0, these are typically pre-sold special
-                # event sales like for birthdays and weddings
+        new = []
+        for tx in batch:
+            if tx["_id"] in existing:
                 continue
-            # get abv when possible
-            try:
-                abv = Decimal(str(sale.get("abv", 0)))
-            except (ValueError, InvalidOperation):
-                # handle stuff like 'abv': {'$numberDouble': 'NaN'}
-                abv = 0
-            # get tags (sometimes a list and sometimes a comma seperated string, we want the latter)
-            tags = sale.get("tags", [])
-            if isinstance(tags, list):
-                tags = ",".join(tags)
-            # create or update the PosProduct
-            product, created = PosProduct.objects.update_or_create(
-                external_id=sale["_id"],
-                defaults={
-                    "brand_name": sale["brandName"],
-                    "name": sale["name"],
-                    "description": sale.get("description", ""),
-                    "sales_price": int(sale["salePrice"]),
-                    "unit_size": Decimal(sale["unitSize"]),
-                    "size_unit": sale["sizeUnit"],
-                    "abv": abv,
-                    "tags": tags,
-                },
-            )
-            if created:
-                logger.debug(
-                    f"Created new product {product.external_id} as PosProduct {product.pk}: {product.brand_name} - {product.name}",
-                )
-                new_products += 1
-            # create PosProductCost objects
-            if "shopPrices" in sale:
-                for cost in sale["shopPrices"]:
-                    # parse timestamp
-                    try:
-                        # with ms
-                        timestamp = datetime.datetime.strptime(
-                            cost["timestamp"]["$date"],
-                            "%Y-%m-%dT%H:%M:%S.%fZ",
-                        ).replace(tzinfo=datetime.UTC)
-                    except ValueError:
-                        # without ms
-                        timestamp = datetime.datetime.strptime(
-                            cost["timestamp"]["$date"],
-                            "%Y-%m-%dT%H:%M:%SZ",
-                        ).replace(tzinfo=datetime.UTC)
-                    camp = get_closest_camp(timestamp)
-                    # parse price
-                    try:
-                        price = Decimal(str(round(cost["buyPrice"], 2)))
-                    except (ValueError, InvalidOperation, TypeError):
-                        # skip stuff like 'abv': {'$numberDouble': 'NaN'}
-                        continue
-                    # create cost as needed
-                    cost, created = PosProductCost.objects.get_or_create(
-                        camp=camp,
-                        product=product,
-                        timestamp=timestamp,
-                        product_cost=price,
-                    )
-                    if created:
-                        logger.debug(
-                            f"Created new PosProductCost object {cost.pk} for product {product} at price {cost.product_cost}",
-                        )
-                        new_costs += 1
-
-            # create the PosSale object
-            possale = PosSale.objects.create(
-                transaction=transaction,
-                product=product,
-                sales_price=int(sale["salePrice"]),
+            existing.add(tx["_id"])
+            new.append(tx)
+
+        # skip sales where the sales_price is 0, these are typically pre-sold special
+        # event sales like for birthdays and weddings
+        self.save_products(sale for tx in new for sale in tx["products"] if sale["salePrice"] != 0)
+
+        transactions = []
+        sales = []
+        costs = []
+        for tx in new:
+            timestamp = parse_pos_timestamp(tx["timestamp"])
+            # find the Pos related to the camp during which the transaction happened
+            transaction = PosTransaction(
+                pos=self.get_pos(tx["locationId"], self.get_camp(timestamp)),
+                external_transaction_id=tx["_id"],
+                external_user_id=tx.get("userId", ""),
+                timestamp=timestamp,
             )
-            new_sales += 1
-            logger.debug(
-                f"Created new PosSale {possale.pk} for PosProduct {product.brand_name} - {product.name} sold for {possale.sales_price} HAX",
-            )
-    # all done
-    return new_products, new_transactions, new_sales, new_costs
+            transactions.append(transaction)
+            for sale in tx["products"]:
+                if sale["salePrice"] == 0:
+                    continue
+                product = self.products[sale["_id"]]
+                costs.extend(self.get_costs(sale, product))
+                sales.append(PosSale(transaction=transaction, product=product, sales_price=int(sale["salePrice"])))
+
+        PosTransaction.objects.bulk_create(transactions, batch_size=self.batch_size)
+        PosProductCost.objects.bulk_create(costs, batch_size=self.batch_size)
+        PosSale.objects.bulk_create(sales, batch_size=self.batch_size)
+        self.new_transactions += len(transactions)
+        self.new_costs += len(costs)
+        self.new_sales += len(sales)
+        logger.debug(f"Imported {len(transactions)} new transactions with {len(sales)} sales")
+
+    def run(self, transactions) -> tuple:
+        """Import the transactions and return the number of new products, transactions, sales and costs."""
+        for batch in chunked(transactions, self.batch_size):
+            with db_transaction.atomic():
+                self.import_batch(batch)
+        logger.info(f"Imported {self.new_transactions} new Pos transactions")
+        return self.new_products, self.new_transactions, self.new_sales, self.new_costs
+
+
+def import_pos_sales_json(transactions):
+    """Importer for sales details from the Pos system.
+
+    Expects an iterable of dicts like so, for example from iter_json_objects():
+
+        {'_id': 'eKCFbcn6fvi5eaTJJ', 'userId': 'Y7NgNzTJRxPKupCv5', 'locationId': 'bTasxE2YYXZh35wtQ', 'currency': 'HAX', 'country': 'DK', 'amount': 55, 'timestamp': {'$date': '2021-08-23T18:11:05.379Z'}, 'products': [{'_id': '7oCSE2xt6szw5cZYQ', 'createdAt': {'$date': '2021-08-21T13:41:32.073Z'}, 'brandName': 'Gamma', 'name': 'Tap: Bando', 'description': 'IPA', 'salePrice': '35', 'unitSize': '40', 'sizeUnit': 'cl', 'abv': '6.5', 'tags': ['beer', 'tap'], 'shopPrices': [{'buyPrice': 17.5, 'timestamp': {'$date': '2021-08-21T13:41:32.073Z'}}], 'locationIds': ['bTasxE2YYXZh35wtQ'], 'updatedAt': {'$date': '2021-08-23T11:27:05.459Z'}, 'tap': '1'}, {'_id': 'Z4ZxsPPEDfDbTLHsz', 'createdAt': {'$date': '2021-08-21T13:27:25.47Z'}, 'brandName': 'Vestfyen', 'name': 'Tap: Pilsner', 'description': '', 'salePrice': '20', 'unitSize': '40', 'sizeUnit': 'cl', 'abv': '4.6', 'tags': ['tap', 'beer'], 'shopPrices': [{'buyPrice': 8.65, 'timestamp': {'$date': '2021-08-21T13:27:25.471Z'}}], 'tap': '2', 'updatedAt': {'$date': '2021-08-23T14:46:27.259Z'}, 'locationIds': ['bTasxE2YYXZh35wtQ']}]}
+
+    Returns the number of new products, transactions, sales and costs.
+    """
+    return PosSalesImporter().run(transactions)
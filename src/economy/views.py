@@ -7,6 +7,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
+from django.db.models import Count
 from django.db.models import Prefetch
 from django.db.models import Q
 from django.db.models import Sum
@@ -50,78 +51,45 @@ class EconomyDashboardView(LoginRequiredMixin, CampViewMixin, TemplateView):
         """Add expenses, reimbursements and revenues to the context."""
         context = super().get_context_data(**kwargs)
 
+        user = self.request.user
+        mine = Q(user=user, camp=self.camp)
+        # the expenses and revenues covered by reimbursements, like Reimbursement.amount
+        reimbursed = Q(
+            reimbursement__reimbursement_user=user,
+            reimbursement__camp=self.camp,
+            created_for_reimbursement=False,
+        )
+
         # get reimbursement stats
-        context["reimbursement_count"] = Reimbursement.objects.filter(
-            reimbursement_user=self.request.user,
-            camp=self.camp,
-        ).count()
-        context["unpaid_reimbursement_count"] = Reimbursement.objects.filter(
-            reimbursement_user=self.request.user,
-            paid=False,
-            camp=self.camp,
-        ).count()
-        context["paid_reimbursement_count"] = Reimbursement.objects.filter(
-            reimbursement_user=self.request.user,
-            paid=True,
-            camp=self.camp,
-        ).count()
-        reimbursement_total = 0
-        for reimbursement in Reimbursement.objects.filter(
-            reimbursement_user=self.request.user,
-            camp=self.camp,
-        ):
-            reimbursement_total += reimbursement.amount
-        context["reimbursement_total"] = reimbursement_total
-
-        # get expense stats
-        context["expense_count"] = Expense.objects.filter(
-            user=self.request.user,
-            camp=self.camp,
-        ).count()
-        context["unapproved_expense_count"] = Expense.objects.filter(
-            user=self.request.user,
-            approved__isnull=True,
-            camp=self.camp,
-        ).count()
-        context["approved_expense_count"] = Expense.objects.filter(
-            user=self.request.user,
-            approved=True,
-            camp=self.camp,
-        ).count()
-        context["rejected_expense_count"] = Expense.objects.filter(
-            user=self.request.user,
-            approved=False,
-            camp=self.camp,
-        ).count()
-        context["expense_total"] = Expense.objects.filter(
-            user=self.request.user,
-            camp=self.camp,
-        ).aggregate(Sum("amount"))["amount__sum"]
-
-        # get revenue stats
-        context["revenue_count"] = Revenue.objects.filter(
-            user=self.request.user,
-            camp=self.camp,
-        ).count()
-        context["unapproved_revenue_count"] = Revenue.objects.filter(
-            user=self.request.user,
-            approved__isnull=True,
-            camp=self.camp,
-        ).count()
-        context["approved_revenue_count"] = Revenue.objects.filter(
-            user=self.request.user,
-            approved=True,
-            camp=self.camp,
-        ).count()
-        context["rejected_revenue_count"] = Revenue.objects.filter(
-            user=self.request.user,
-            approved=False,
-            camp=self.camp,
-        ).count()
-        context["revenue_total"] = Revenue.objects.filter(
-            user=self.request.user,
-            camp=self.camp,
-        ).aggregate(Sum("amount"))["amount__sum"]
+        context.update(
+            Reimbursement.objects.filter(
+                reimbursement_user=user,
+                camp=self.camp,
+            ).aggregate(
+                reimbursement_count=Count("pk"),
+                unpaid_reimbursement_count=Count("pk", filter=Q(paid=False)),
+                paid_reimbursement_count=Count("pk", filter=Q(paid=True)),
+            ),
+        )
+
+        # get expense and revenue stats, one query for each
+        reimbursed_totals = {}
+        for model, name in ((Expense, "expense"), (Revenue, "revenue")):
+            stats = model.objects.filter(mine | reimbursed).aggregate(
+                count=Count("pk", filter=mine),
+                unapproved_count=Count("pk", filter=mine & Q(approved__isnull=True)),
+                approved_count=Count("pk", filter=mine & Q(approved=True)),
+                rejected_count=Count("pk", filter=mine & Q(approved=False)),
+                total=Sum("amount", filter=mine),
+                reimbursed_total=Sum("amount", filter=reimbursed, default=0),
+            )
+            context[f"{name}_count"] = stats["count"]
+            context[f"unapproved_{name}_count"] = stats["unapproved_count"]
+            context[f"approved_{name}_count"] = stats["approved_count"]
+            context[f"rejected_{name}_count"] = stats["rejected_count"]
+            context[f"{name}_total"] = stats["total"]
+            reimbursed_totals[name] = stats["reimbursed_total"]
+        context["reimbursement_total"] = reimbursed_totals["expense"] - reimbursed_totals["revenue"]
 
         return context
 
@@ -158,14 +126,16 @@ class ChainListView(CampViewMixin, RaisePermissionRequiredMixin, ListView):
     permission_required = "camps.expense_create_permission"
 
     def get_queryset(self):
-        queryset = Chain.objects.filter(credebtors__expenses__camp=self.camp).order_by("name")
+        queryset = Chain.objects.filter(credebtors__expenses__camp=self.camp).distinct().order_by("name")
 
         return queryset
 
     def get_context_data(self, **kwargs):
         """Add chains with expenses in past years"""
         context = super().get_context_data(**kwargs)
-        context["past_year_chains"] = Chain.objects.filter(~Q(credebtors__expenses__camp=self.camp)).order_by("name")
+        context["past_year_chains"] = (
+            Chain.objects.filter(~Q(credebtors__expenses__camp=self.camp)).distinct().order_by("name")
+        )
         return context
 
 
@@ -1,7 +1,5 @@
 from __future__ import annotations
 
-import base64
-import io
 import logging
 
 import qrcode
@@ -17,6 +15,7 @@ from django_prometheus.models import ExportModelOperationsMixin
 from maps.utils import LeafletMarkerChoices
 from utils.models import CampRelatedModel
 from utils.models import UUIDModel
+from utils.qr import qr_code_data_url
 from utils.slugs import unique_slugify
 
 logger = logging.getLogger(f"bornhack.{__name__}")
@@ -156,15 +155,12 @@ class Facility(ExportModelOperationsMixin("facility"), CampRelatedModel, UUIDMod
         )
 
     def get_feedback_qr(self, request) -> str:
-        qr = qrcode.make(
+        return qr_code_data_url(
             self.get_feedback_url(request),
+            size=250,
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_H,
-        ).resize((250, 250))
-        file_like = io.BytesIO()
-        qr.save(file_like, format="png")
-        qrcode_base64 = base64.b64encode(file_like.getvalue()).decode("utf-8")
-        return f"data:image/png;base64,{qrcode_base64}"
+        )
 
     def unhandled_feedbacks(self):
         return self.feedbacks.filter(handled=False)
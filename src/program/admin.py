@@ -4,6 +4,8 @@ from django.contrib import admin
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 
+from .models import AutoScheduleJob
+from .models import AutoSchedulerSnapshot
 from .models import Event
 from .models import EventFeedback
 from .models import EventInstance
@@ -106,6 +108,20 @@ class EventSlotAdmin(admin.ModelAdmin):
     list_filter = ("event_session__camp", "event_session__event_type", "event_session")
 
 
+@admin.register(AutoSchedulerSnapshot)
+class AutoSchedulerSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("camp", "version", "updated")
+    readonly_fields = ("version", "hashes")
+    exclude = ("data",)
+
+
+@admin.register(AutoScheduleJob)
+class AutoScheduleJobAdmin(admin.ModelAdmin):
+    list_display = ("camp", "schedule", "status", "user", "created", "finished")
+    list_filter = ("camp", "status")
+    readonly_fields = ("result",)
+
+
 @admin.register(EventInstance)
 class EventInstanceAdmin(admin.ModelAdmin):
     list_display = ("event", "when", "location", "autoscheduled")
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from django.apps import AppConfig
 from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 
 
@@ -9,10 +10,18 @@ class ProgramConfig(AppConfig):
     name = "program"
 
     def ready(self) -> None:
+        from .models import Event
+        from .models import EventInstance
+        from .models import EventLocation
         from .models import EventSession
+        from .models import EventSlot
+        from .models import EventTrack
+        from .models import EventType
         from .models import Speaker
         from .signal_handlers import check_speaker_event_camp_consistency
         from .signal_handlers import event_session_post_save
+        from .signal_handlers import publish_schedule_change
+        from .signal_handlers import publish_speakers_change
 
         m2m_changed.connect(
             check_speaker_event_camp_consistency,
@@ -20,3 +29,9 @@ class ProgramConfig(AppConfig):
         )
 
         post_save.connect(event_session_post_save, sender=EventSession)
+
+        # publish changes to ScheduleConsumer clients and rebuild the schedule document
+        for model in [Event, EventInstance, EventLocation, EventSlot, EventTrack, EventType, Speaker]:
+            post_save.connect(publish_schedule_change, sender=model)
+            post_delete.connect(publish_schedule_change, sender=model)
+        m2m_changed.connect(publish_speakers_change, sender=Speaker.events.through)
@@ -1,22 +1,270 @@
 from __future__ import annotations
 
+import hashlib
 import logging
+import multiprocessing
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from datetime import timedelta
+from typing import TYPE_CHECKING
 
+import pulp
+from conference_scheduler import converter
 from conference_scheduler import resources
 from conference_scheduler import scheduler
 from conference_scheduler.lp_problem import objective_functions
 from conference_scheduler.validator import is_valid_schedule
 from conference_scheduler.validator import schedule_violations
-from psycopg2.extras import DateTimeTZRange
+from django.db import transaction
+from django.db.models import Q
 
-from program.email import add_event_scheduled_email
+from program.email import add_events_scheduled_email
+from utils.models import CampReadOnlyModeError
 
+from .models import AutoSchedulerSnapshot
+from .models import EventSlot
 from .models import EventType
+from .models import Speaker
+from .models import SpeakerAvailability
+from .schedule_snapshot import publish_schedule_resync
+from .utils import EventSlotAvailability
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from django.db.models import QuerySet
+
+    from camps.models import Camp
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
+class AutoSlotIndex:
+    """An interval index over a list of conference_scheduler.resources.Slot objects.
+
+    The autoslots are sorted by start time once, which makes it possible to find the
+    slots overlapping or contained in a period of time with a binary search instead of
+    looping over every slot. All lookups return indexes into the original list.
+    """
+
+    def __init__(self, autoslots: list[resources.Slot]) -> None:
+        """Sort the autoslots by start time and remember the longest duration."""
+        self.order = sorted(range(len(autoslots)), key=lambda i: autoslots[i].starts_at)
+        self.starts = [autoslots[i].starts_at for i in self.order]
+        self.ends = [slot.starts_at + timedelta(minutes=slot.duration) for slot in autoslots]
+        self.max_duration = timedelta(minutes=max((slot.duration for slot in autoslots), default=0))
+
+    def overlapping(self, lower: datetime, upper: datetime) -> list[int]:
+        """Return the indexes of the autoslots overlapping the period from lower to upper."""
+        # a slot can not overlap unless it starts less than max_duration before lower
+        first = bisect_right(self.starts, lower - self.max_duration)
+        last = bisect_left(self.starts, upper)
+        return [i for i in self.order[first:last] if self.ends[i] > lower]
+
+    def contained_in(self, lower: datetime, upper: datetime) -> list[int]:
+        """Return the indexes of the autoslots which start and end within the period from lower to upper."""
+        first = bisect_left(self.starts, lower)
+        last = bisect_right(self.starts, upper)
+        return [i for i in self.order[first:last] if self.ends[i] <= upper]
+
+
+def get_rows_hash(*iterables: Iterable) -> str:
+    """Return a sha256 hexdigest of all the rows in the iterables."""
+    digest = hashlib.sha256()
+    for rows in iterables:
+        for row in rows:
+            digest.update(repr(row).encode())
+        # separate the iterables so rows can not "move" from one to the next
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def serialise_autoslots(autoslots: list[resources.Slot]) -> list[dict]:
+    """Return a JSON serialisable list of autoslots."""
+    return [
+        {
+            "venue": slot.venue,
+            "starts_at": slot.starts_at.isoformat(),
+            "duration": slot.duration,
+            "capacity": slot.capacity,
+            "session": slot.session,
+        }
+        for slot in autoslots
+    ]
+
+
+def deserialise_autoslots(data: list[dict]) -> list[resources.Slot]:
+    """Return a list of autoslots from the output of serialise_autoslots()."""
+    return [
+        resources.Slot(
+            venue=slot["venue"],
+            starts_at=datetime.fromisoformat(slot["starts_at"]),
+            duration=slot["duration"],
+            capacity=slot["capacity"],
+            session=slot["session"],
+        )
+        for slot in data
+    ]
+
+
+def serialise_autoevents(autoevents: list[resources.Event]) -> list[dict]:
+    """Return a JSON serialisable list of autoevents, without their unavailability."""
+    return [
+        {
+            "name": autoevent.name,
+            "duration": autoevent.duration,
+            "demand": autoevent.demand,
+            "tags": list(autoevent.tags),
+        }
+        for autoevent in autoevents
+    ]
+
+
+def deserialise_autoevents(data: list[dict]) -> list[resources.Event]:
+    """Return a list of autoevents from the output of serialise_autoevents()."""
+    return [
+        resources.Event(
+            name=autoevent["name"],
+            duration=autoevent["duration"],
+            demand=autoevent["demand"],
+            tags=autoevent["tags"],
+        )
+        for autoevent in data
+    ]
+
+
+def serialise_unavailability(autoevents: list[resources.Event], autoslots: list[resources.Slot]) -> list[dict]:
+    """Return a JSON serialisable list with the unavailability of each autoevent.
+
+    The unavailable slots and events are stored as indexes into the autoslots and
+    autoevents lists.
+    """
+    slotindex = {slot: index for index, slot in enumerate(autoslots)}
+    eventindex = {id(autoevent): index for index, autoevent in enumerate(autoevents)}
+    return [
+        {
+            "slots": [slotindex[item] for item in autoevent.unavailability if isinstance(item, resources.Slot)],
+            "events": [eventindex[id(item)] for item in autoevent.unavailability if isinstance(item, resources.Event)],
+        }
+        for autoevent in autoevents
+    ]
+
+
+def add_serialised_unavailability(
+    autoevents: list[resources.Event],
+    autoslots: list[resources.Slot],
+    data: list[dict],
+) -> None:
+    """Add unavailability to the autoevents from the output of serialise_unavailability()."""
+    for autoevent, unavailability in zip(autoevents, data, strict=True):
+        autoevent.add_unavailability(
+            *[autoslots[index] for index in unavailability["slots"]],
+            *[autoevents[index] for index in unavailability["events"]],
+        )
+
+
+def serialise_autoschedule(autoschedule: list[resources.ScheduledItem]) -> list[dict]:
+    """Return a JSON serialisable list of the Event and slot for each item in an autoschedule."""
+    return [
+        {
+            "event": item.event.name,
+            "session": item.slot.session,
+            "starts_at": item.slot.starts_at.isoformat(),
+        }
+        for item in autoschedule
+    ]
+
+
+def get_subproblems(
+    autoevents: list[resources.Event],
+    autoslots: list[resources.Slot],
+) -> list[tuple[list[int], list[int]]]:
+    """Split the scheduling problem into independent sub-problems.
+
+    Two autoevents end up in the same sub-problem if they can be scheduled in the same
+    autoslot, if one is unavailable during the other (speaker conflicts), or if they share
+    a tag. The LP constraints and objective functions never link autoevents or autoslots
+    in different sub-problems, so the sub-problems can be solved separately and the
+    solutions merged into one schedule. With the event_type_constraint enabled this
+    means roughly one sub-problem per EventType.
+
+    Returns a list of (event indexes, slot indexes) tuples, one per sub-problem, with
+    the indexes in the same order as in the autoevents and autoslots lists.
+    """
+    # union-find over autoevents (0..E-1) and autoslots (E..E+S-1)
+    parent = list(range(len(autoevents) + len(autoslots)))
+
+    def find(node: int) -> int:
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(a: int, b: int) -> None:
+        parent[find(a)] = find(b)
+
+    eventindex = {autoevent.name: index for index, autoevent in enumerate(autoevents)}
+    slotindex = {autoslot: index for index, autoslot in enumerate(autoslots)}
+    tag_events = {}
+    for index, autoevent in enumerate(autoevents):
+        unavailable_slots = set()
+        for item in autoevent.unavailability:
+            if isinstance(item, resources.Event):
+                union(index, eventindex[item.name])
+            elif item in slotindex:
+                unavailable_slots.add(slotindex[item])
+        for slot, autoslot in enumerate(autoslots):
+            if slot not in unavailable_slots and autoevent.duration <= autoslot.duration:
+                union(index, len(autoevents) + slot)
+        for tag in autoevent.tags:
+            union(index, tag_events.setdefault(tag, index))
+
+    # group the indexes by sub-problem, ignoring autoslots with no autoevents
+    subproblems = {}
+    for index in range(len(autoevents)):
+        subproblems.setdefault(find(index), ([], []))[0].append(index)
+    for slot in range(len(autoslots)):
+        root = find(len(autoevents) + slot)
+        if root in subproblems:
+            subproblems[root][1].append(slot)
+    return list(subproblems.values())
+
+
+def calculate_solution(
+    autoevents: list[resources.Event],
+    autoslots: list[resources.Slot],
+    original_schedule: list[resources.ScheduledItem] | None = None,
+    time_limit: int | None = None,
+) -> list[tuple[int, int]]:
+    """Calculate a schedule for the autoevents and autoslots.
+
+    If original_schedule is given the schedule is calculated to minimise changes from it.
+
+    Returns the schedule in solution form, a list of (event index, slot index) tuples.
+    This is a module level function so it can run in a worker process.
+    """
+    kwargs = {}
+    kwargs["events"] = autoevents
+    kwargs["slots"] = autoslots
+
+    # include another schedule in the calculation?
+    if original_schedule:
+        kwargs["original_schedule"] = original_schedule
+        kwargs["objective_function"] = objective_functions.number_of_changes
+    else:
+        # otherwise use the capacity demand difference thing
+        kwargs["objective_function"] = objective_functions.efficiency_capacity_demand_difference
+
+    if time_limit:
+        # CBC keeps the best solution found when the time limit is reached
+        kwargs["solver"] = pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit)
+
+    return scheduler.solution(**kwargs)
+
+
 class AutoScheduler:
     """The BornHack AutoScheduler. Made with love by Tykling.
 
@@ -26,11 +274,29 @@ class AutoScheduler:
     Most of the code in this class deals with massaging our data into a list of Slot and
     Event objects defining the data and constraints for the scheduler.
 
-    Initialising this class takes a while because all the objects have to be created.
+    Initialising this class takes a while because all the objects have to be created,
+    so the result is saved as an AutoSchedulerSnapshot and reused on the next run,
+    rebuilding only the parts where the input rows have changed.
     """
 
-    def __init__(self, camp, **kwargs) -> None:
-        """Get EventTypes, EventSessions and Events, build autoslot and autoevent objects."""
+    # bump this when the snapshot format changes to ignore existing snapshots
+    SNAPSHOT_VERSION = 1
+
+    # the constraints supported by get_autoevents(), all enabled by default
+    CONSTRAINTS = (
+        "event_type_constraint",
+        "speakers_other_events_constraint",
+        "speaker_event_conflicts_constraint",
+        "speaker_availability_constraint",
+    )
+
+    def __init__(self, camp: Camp, *, use_snapshot: bool = True, **kwargs) -> None:
+        """Get EventTypes, EventSessions and Events, build autoslot and autoevent objects.
+
+        With use_snapshot=True the autoslots and autoevents are loaded from the
+        AutoSchedulerSnapshot for the camp where the input rows are unchanged,
+        and only the parts with changed inputs are rebuilt.
+        """
         self.camp = camp
 
         # Get all EventTypes which support autoscheduling
@@ -49,8 +315,17 @@ class AutoScheduler:
         # Get all Events for the current event_types
         self.events = self.get_events(self.event_types)
 
+        # get the existing snapshot (if any) and the hashes of the current inputs
+        snapshot = self.get_snapshot() if use_snapshot else None
+        hashes = self.get_input_hashes(**kwargs) if use_snapshot else {}
+        # the parts of the snapshot we can reuse because the inputs are unchanged
+        reusable = {part for part, digest in hashes.items() if snapshot and snapshot.hashes.get(part) == digest}
+
         # Get autoslots
-        self.autoslots = self.get_autoslots(self.event_sessions)
+        if "autoslots" in reusable:
+            self.autoslots = deserialise_autoslots(snapshot.data["autoslots"])
+        else:
+            self.autoslots = self.get_autoslots(self.event_sessions)
 
         # Build a lookup dict of autoslots per EventType
         self.event_type_slots = {}
@@ -64,22 +339,49 @@ class AutoScheduler:
                     break
 
         # get autoevents and a lookup dict which maps Event id to autoevent index
-        self.autoevents, self.autoeventindex = self.get_autoevents(
-            self.events,
-            **kwargs,
-        )
+        if "autoevents" in reusable:
+            # the Events are unchanged, reuse the autoevents from the snapshot
+            self.autoevents = deserialise_autoevents(snapshot.data["autoevents"])
+            events = self.events.in_bulk()
+            self.autoeventindex = {index: events[autoevent.name] for index, autoevent in enumerate(self.autoevents)}
+            if "constraints" in reusable:
+                # the constraints are unchanged too, reuse them
+                add_serialised_unavailability(
+                    self.autoevents,
+                    self.autoslots,
+                    snapshot.data["constraints"],
+                )
+            else:
+                self.add_autoevent_unavailability(
+                    self.autoevents,
+                    self.autoeventindex,
+                    **kwargs,
+                )
+        else:
+            self.autoevents, self.autoeventindex = self.get_autoevents(
+                self.events,
+                **kwargs,
+            )
 
-    def get_event_types(self):
+        # the hash of all the inputs, saved with a calculated schedule so load_autoschedule()
+        # can tell if anything changed since (the constraints hash covers the other parts)
+        self.input_hash = (hashes or self.get_input_hashes(**kwargs))["constraints"]
+
+        # save the snapshot if anything changed
+        if use_snapshot and reusable != set(hashes):
+            self.save_snapshot(hashes)
+
+    def get_event_types(self) -> QuerySet:
         """Return all EventTypes which support autoscheduling."""
         return EventType.objects.filter(support_autoscheduling=True)
 
-    def get_event_sessions(self, event_types):
+    def get_event_sessions(self, event_types: QuerySet) -> QuerySet:
         """Return all EventSessions for these EventTypes."""
         return self.camp.event_sessions.filter(
             event_type__in=event_types,
         ).prefetch_related("event_type", "event_location")
 
-    def get_events(self, event_types):
+    def get_events(self, event_types: QuerySet) -> QuerySet:
         """Return all Events that need scheduling."""
         # return all events for these event_types, but..
         return self.camp.events.filter(event_type__in=event_types).exclude(
@@ -89,133 +391,270 @@ class AutoScheduler:
             event_slots__autoscheduled=False,
         )
 
-    def get_autoslots(self, event_sessions):
+    def get_autoslots(self, event_sessions: QuerySet) -> list[resources.Slot]:
         """Return a list of autoslots for all slots in all EventSessions."""
         autoslots = []
+        # find the available slots for all sessions at once
+        availability = EventSlotAvailability(self.camp)
         # loop over the sessions
         for session in event_sessions:
-            # loop over available slots in this session
-            for slot in session.get_available_slots(count_autoscheduled_as_free=True):
-                autoslots.append(slot.get_autoscheduler_slot())
+            # add the available slots in this session
+            autoslots.extend(
+                slot.get_autoscheduler_slot()
+                for slot in availability.get_available_slots(
+                    session,
+                    count_autoscheduled_as_free=True,
+                )
+            )
         return autoslots
 
     def get_autoevents(
         self,
-        events,
-        event_type_constraint=True,
-        speakers_other_events_constraint=True,
-        speaker_event_conflicts_constraint=True,
-        speaker_availability_constraint=True,
-    ):
-        """Return a list of resources.Event objects, one for each Event."""
+        events: QuerySet,
+        *,
+        event_type_constraint: bool = True,
+        speakers_other_events_constraint: bool = True,
+        speaker_event_conflicts_constraint: bool = True,
+        speaker_availability_constraint: bool = True,
+    ) -> tuple[list[resources.Event], dict]:
+        """Return a list of resources.Event objects, one for each Event.
+
+        Also returns a dict mapping autoevent index to Event.
+        """
         autoevents = []
         autoeventindex = {}
-        eventindex = {}
-        for event in events:
+        for event in events.prefetch_related("tags"):
             autoevents.append(
                 resources.Event(
                     name=event.id,
                     duration=event.duration_minutes,
-                    tags=event.tags.names(),
+                    tags=[tag.name for tag in event.tags.all()],
                     demand=event.demand,
                 ),
             )
             # create a dict of events with the autoevent index as key and the Event as value
-            autoeventindex[autoevents.index(autoevents[-1])] = event
-            # create a dict of events with the Event as key and the autoevent index as value
-            eventindex[event] = autoevents.index(autoevents[-1])
+            autoeventindex[len(autoevents) - 1] = event
+
+        self.add_autoevent_unavailability(
+            autoevents,
+            autoeventindex,
+            event_type_constraint=event_type_constraint,
+            speakers_other_events_constraint=speakers_other_events_constraint,
+            speaker_event_conflicts_constraint=speaker_event_conflicts_constraint,
+            speaker_availability_constraint=speaker_availability_constraint,
+        )
+        return autoevents, autoeventindex
+
+    def add_autoevent_unavailability(
+        self,
+        autoevents: list[resources.Event],
+        autoeventindex: dict,
+        *,
+        event_type_constraint: bool = True,
+        speakers_other_events_constraint: bool = True,
+        speaker_event_conflicts_constraint: bool = True,
+        speaker_availability_constraint: bool = True,
+    ) -> None:
+        """Add unavailability to the autoevents based on the enabled constraints.
+
+        All the data needed for the constraints is loaded upfront in a few bulk queries,
+        and overlaps between slots and periods of time are resolved using an AutoSlotIndex,
+        so the number of queries does not grow with the number of Events, Speakers or slots.
+        """
+        # a dict of autoevent indexes with the Event id as key
+        eventindex = {event.id: index for index, event in autoeventindex.items()}
+
+        # get all Speakers for these Events, and all Events for those Speakers, in one query
+        event_speakers = defaultdict(set)
+        speaker_events = defaultdict(set)
+        for speaker_id, event_id in Speaker.events.through.objects.filter(
+            speaker_id__in=Speaker.events.through.objects.filter(
+                event_id__in=eventindex.keys(),
+            ).values("speaker_id"),
+        ).values_list("speaker_id", "event_id"):
+            speaker_events[speaker_id].add(event_id)
+            if event_id in eventindex:
+                event_speakers[event_id].add(speaker_id)
+
+        # get the Events each Speaker wishes to attend
+        speaker_conflicts = defaultdict(set)
+        if speaker_event_conflicts_constraint:
+            for speaker_id, event_id in Speaker.event_conflicts.through.objects.filter(
+                speaker_id__in=speaker_events.keys(),
+            ).values_list("speaker_id", "event_id"):
+                speaker_conflicts[speaker_id].add(event_id)
+
+        # get the times of EventSlots for conflicting Events which the AutoScheduler is not handling
+        conflict_slot_times = defaultdict(list)
+        unhandled_conflict_ids = set().union(*speaker_conflicts.values()).difference(eventindex)
+        if unhandled_conflict_ids:
+            for event_id, when in EventSlot.objects.filter(
+                event_id__in=unhandled_conflict_ids,
+            ).values_list("event_id", "when"):
+                conflict_slot_times[event_id].append(when)
+
+        # get the positive availability for each Speaker
+        speaker_availabilities = defaultdict(list)
+        if speaker_availability_constraint:
+            for speaker_id, when in SpeakerAvailability.objects.filter(
+                speaker_id__in=speaker_events.keys(),
+                available=True,
+            ).values_list("speaker_id", "when"):
+                speaker_availabilities[speaker_id].append(when)
+
+        slot_index = AutoSlotIndex(self.autoslots)
+
+        # the EventType of each autoslot, used for the event_type_constraint
+        session_event_types = {session.id: session.event_type_id for session in self.event_sessions}
+        slot_event_types = [session_event_types[slot.session] for slot in self.autoslots]
+        # cache of autoslot indexes for slots belonging to other EventTypes, per EventType
+        other_event_type_slots = {}
+        # cache of autoslot indexes where each speaker has no positive availability
+        speaker_unavailable_slots = {}
 
         # loop over all autoevents to add unavailability...
         # (we have to do this in a seperate loop because we need all the autoevents to exist)
-        for autoevent in autoevents:
+        for index, autoevent in enumerate(autoevents):
+            event = autoeventindex[index]
+            unavailable_slots = set()
+            unavailable_events = set()
+
             if event_type_constraint:
-                # get the Event
-                event = autoeventindex[autoevents.index(autoevent)]
-                # loop over all other event_types...
-                for et in self.event_types.all().exclude(pk=event.event_type.pk):
-                    if et in self.event_type_slots:
-                        # and add all slots for this EventType as unavailable for this event,
-                        # this means we don't schedule a talk in a workshop slot and vice versa.
-                        autoevent.add_unavailability(*self.event_type_slots[et])
+                # add all slots for other EventTypes as unavailable for this event,
+                # this means we don't schedule a talk in a workshop slot and vice versa.
+                if event.event_type_id not in other_event_type_slots:
+                    other_event_type_slots[event.event_type_id] = {
+                        i for i, et in enumerate(slot_event_types) if et != event.event_type_id
+                    }
+                unavailable_slots.update(other_event_type_slots[event.event_type_id])
 
             # loop over all speakers for this event and add event conflicts
-            for speaker in event.speakers.all():
+            for speaker_id in event_speakers[event.id]:
                 if speakers_other_events_constraint:
-                    # loop over other events featuring this speaker, register each conflict,
-                    # this means we dont schedule two events for the same speaker at the same time
-                    conflict_ids = speaker.events.exclude(id=event.id).values_list(
-                        "id",
-                        flat=True,
-                    )
-                    for conflictevent in autoevents:
-                        if conflictevent.name in conflict_ids:
-                            # only the event with the lowest index gets the unavailability,
-                            if autoevents.index(conflictevent) > autoevents.index(
-                                autoevent,
-                            ):
-                                autoevent.add_unavailability(conflictevent)
+                    # register each conflict with other events featuring this speaker,
+                    # this means we dont schedule two events for the same speaker at the same time.
+                    # Only the event with the lowest index gets the unavailability.
+                    for conflict_id in speaker_events[speaker_id]:
+                        if eventindex.get(conflict_id, -1) > index:
+                            unavailable_events.add(eventindex[conflict_id])
 
                 if speaker_event_conflicts_constraint:
-                    # loop over event_conflicts for this speaker, register unavailability for each,
+                    # register unavailability for each event_conflict for this speaker,
                     # this means we dont schedule this event at the same time as something the
                     # speaker wishes to attend.
-                    # Only process Events which the AutoScheduler is handling
-                    for conflictevent in speaker.event_conflicts.filter(
-                        pk__in=events.values_list("pk", flat=True),
-                    ):
-                        # only the event with the lowest index gets the unavailability
-                        if eventindex[conflictevent] > autoevents.index(autoevent):
-                            autoevent.add_unavailability(
-                                autoevents[eventindex[conflictevent]],
-                            )
-
-                    # loop over event_conflicts for this speaker, register unavailability for each,
-                    # only process Events which the AutoScheduler is not handling, and which have
-                    # been scheduled in one or more EventSlots
-                    for conflictevent in speaker.event_conflicts.filter(
-                        event_slots__isnull=False,
-                    ).exclude(pk__in=events.values_list("pk", flat=True)):
-                        # loop over the EventSlots this conflict is scheduled in
-                        for conflictslot in conflictevent.event_slots.all():
-                            # loop over all slots
-                            for slot in self.autoslots:
-                                # check if this slot overlaps with the conflictevents slot
-                                if conflictslot.when & DateTimeTZRange(
-                                    slot.starts_at,
-                                    slot.starts_at + timedelta(minutes=slot.duration),
-                                ):
-                                    # this slot overlaps with the conflicting event
-                                    autoevent.add_unavailability(slot)
+                    for conflict_id in speaker_conflicts[speaker_id]:
+                        if conflict_id in eventindex:
+                            # the AutoScheduler is handling this Event,
+                            # only the event with the lowest index gets the unavailability
+                            if eventindex[conflict_id] > index:
+                                unavailable_events.add(eventindex[conflict_id])
+                            continue
+                        # the AutoScheduler is not handling this Event, mark all slots
+                        # overlapping the EventSlots it is scheduled in as unavailable
+                        for when in conflict_slot_times[conflict_id]:
+                            unavailable_slots.update(slot_index.overlapping(when.lower, when.upper))
 
                 if speaker_availability_constraint:
                     # Register all slots where we have no positive availability
                     # for this speaker as unavailable
-                    available = []
-                    for availability in speaker.availabilities.filter(
-                        available=True,
-                    ).values_list("when", flat=True):
-                        availability = DateTimeTZRange(
-                            availability.lower,
-                            availability.upper,
-                            "()",
-                        )
-                        for slot in self.autoslots:
-                            slotrange = DateTimeTZRange(
-                                slot.starts_at,
-                                slot.starts_at + timedelta(minutes=slot.duration),
-                                "()",
-                            )
-                            if slotrange in availability:
-                                # the speaker is available for this slot
-                                available.append(self.autoslots.index(slot))
-                    autoevent.add_unavailability(
-                        *[s for s in self.autoslots if self.autoslots.index(s) not in available],
-                    )
+                    if speaker_id not in speaker_unavailable_slots:
+                        available = set()
+                        for when in speaker_availabilities[speaker_id]:
+                            available.update(slot_index.contained_in(when.lower, when.upper))
+                        speaker_unavailable_slots[speaker_id] = set(range(len(self.autoslots))) - available
+                    unavailable_slots.update(speaker_unavailable_slots[speaker_id])
+
+            autoevent.add_unavailability(
+                *[self.autoslots[i] for i in sorted(unavailable_slots)],
+                *[autoevents[i] for i in sorted(unavailable_events)],
+            )
 
-        return autoevents, autoeventindex
+    def get_snapshot(self) -> AutoSchedulerSnapshot | None:
+        """Return the AutoSchedulerSnapshot for this camp, or None if there is no usable snapshot."""
+        try:
+            snapshot = self.camp.autoscheduler_snapshot
+        except AutoSchedulerSnapshot.DoesNotExist:
+            return None
+        if snapshot.version != self.SNAPSHOT_VERSION:
+            logger.debug(f"Ignoring AutoScheduler snapshot with old version {snapshot.version}")
+            return None
+        return snapshot
+
+    def get_input_hashes(self, **kwargs) -> dict[str, str]:
+        """Return a dict with a hash of the input rows for each part of the snapshot.
+
+        The autoslots depend on the EventSessions, EventSlots and EventLocations, the
+        autoevents on the Events and their tags, and the constraints on both of those
+        plus the Speakers, their event conflicts and availability, and the enabled constraints.
+        """
+        autoslots = get_rows_hash(
+            self.event_sessions.order_by("id").values_list(
+                "id",
+                "event_type_id",
+                "event_location_id",
+                "when",
+                "event_duration_minutes",
+            ),
+            self.camp.event_slots.order_by("id").values_list(
+                "id",
+                "event_session_id",
+                "when",
+                "event_id",
+                "autoscheduled",
+            ),
+            self.camp.event_locations.order_by("id", "conflicts").values_list(
+                "id",
+                "capacity",
+                "conflicts",
+            ),
+        )
+        autoevents = get_rows_hash(
+            self.events.order_by("id", "tags__name").values_list(
+                "id",
+                "duration_minutes",
+                "demand",
+                "tags__name",
+            ),
+        )
+        speakers = Speaker.objects.filter(events__in=self.events)
+        constraints = get_rows_hash(
+            [autoslots, autoevents],
+            [(constraint, kwargs.get(constraint, True)) for constraint in self.CONSTRAINTS],
+            self.events.order_by("id").values_list("id", "event_type_id"),
+            Speaker.events.through.objects.filter(speaker__in=speakers)
+            .order_by("speaker_id", "event_id")
+            .values_list("speaker_id", "event_id"),
+            Speaker.event_conflicts.through.objects.filter(speaker__in=speakers)
+            .order_by("speaker_id", "event_id")
+            .values_list("speaker_id", "event_id"),
+            SpeakerAvailability.objects.filter(speaker__in=speakers, available=True)
+            .order_by("speaker_id", "when")
+            .values_list("speaker_id", "when"),
+        )
+        return {
+            "autoslots": autoslots,
+            "autoevents": autoevents,
+            "constraints": constraints,
+        }
+
+    def save_snapshot(self, hashes: dict[str, str]) -> None:
+        """Save the current autoslots and autoevents as the snapshot for this camp."""
+        AutoSchedulerSnapshot.objects.update_or_create(
+            camp=self.camp,
+            defaults={
+                "version": self.SNAPSHOT_VERSION,
+                "hashes": hashes,
+                "data": {
+                    "autoslots": serialise_autoslots(self.autoslots),
+                    "autoevents": serialise_autoevents(self.autoevents),
+                    "constraints": serialise_unavailability(self.autoevents, self.autoslots),
+                },
+            },
+        )
 
-    def build_current_autoschedule(self):
+    def build_current_autoschedule(self) -> list[resources.ScheduledItem]:
         """Build an autoschedule object based on the existing published schedule.
+
         Returns an autoschedule, which is a list of conference_scheduler.resources.ScheduledItem
         objects, one for each scheduled Event. This function is useful for creating an "original
         schedule" to base a new similar schedule off of.
@@ -261,140 +700,279 @@ class AutoScheduler:
         # schedule can still be used as a basis for creating a new similar schedule.
         return autoschedule
 
-    def calculate_autoschedule(self, original_schedule=None):
-        """Calculate autoschedule based on self.autoevents and self.autoslots,
-        optionally using original_schedule to minimise changes.
+    def calculate_autoschedule(
+        self,
+        original_schedule: list[resources.ScheduledItem] | None = None,
+        time_limit: int | None = None,
+        *,
+        decompose: bool = False,
+        processes: int | None = None,
+    ) -> list[resources.ScheduledItem]:
+        """Calculate autoschedule based on self.autoevents and self.autoslots.
+
+        If original_schedule is given the schedule is calculated to minimise changes from it.
+
+        If time_limit is given the solver is stopped after that many seconds and
+        the best schedule found so far is returned.
+
+        With decompose=True the problem is split into independent sub-problems which
+        are solved in parallel in up to `processes` worker processes (default: one per CPU).
         """
-        kwargs = {}
-        kwargs["events"] = self.autoevents
-        kwargs["slots"] = self.autoslots
-
-        # include another schedule in the calculation?
-        if original_schedule:
-            kwargs["original_schedule"] = original_schedule
-            kwargs["objective_function"] = objective_functions.number_of_changes
-        else:
-            # otherwise use the capacity demand difference thing
-            kwargs["objective_function"] = objective_functions.efficiency_capacity_demand_difference
+        if decompose:
+            return self.calculate_decomposed_autoschedule(
+                original_schedule=original_schedule,
+                time_limit=time_limit,
+                processes=processes,
+            )
+
         # calculate the new schedule
-        return scheduler.schedule(**kwargs)
+        solution = calculate_solution(
+            self.autoevents,
+            self.autoslots,
+            original_schedule=original_schedule,
+            time_limit=time_limit,
+        )
+        return converter.solution_to_schedule(solution, self.autoevents, self.autoslots)
+
+    def calculate_decomposed_autoschedule(
+        self,
+        original_schedule: list[resources.ScheduledItem] | None = None,
+        time_limit: int | None = None,
+        processes: int | None = None,
+    ) -> list[resources.ScheduledItem]:
+        """Calculate autoschedule by solving independent sub-problems in parallel.
+
+        The problem is split with get_subproblems(), each sub-problem is solved in a
+        separate process, and the solutions are merged into one autoschedule.
 
-    def calculate_similar_autoschedule(self, original_schedule=None):
-        """Convenience method for creating similar schedules. If original_schedule
-        is omitted the new schedule is based on the current schedule instead.
+        The time_limit applies to each sub-problem, and since they run in parallel
+        it is still roughly the limit for the whole calculation.
+        """
+        subproblems = []
+        for event_indexes, slot_indexes in get_subproblems(self.autoevents, self.autoslots):
+            autoevents = [self.autoevents[i] for i in event_indexes]
+            autoslots = [self.autoslots[i] for i in slot_indexes]
+            original = None
+            if original_schedule:
+                # only the part of the original schedule for this sub-problem. If nothing
+                # is left every solution has the same number of changes, so the default
+                # objective function is used instead.
+                names = {autoevent.name for autoevent in autoevents}
+                slots = set(autoslots)
+                original = [item for item in original_schedule if item.event.name in names and item.slot in slots]
+            subproblems.append((event_indexes, slot_indexes, (autoevents, autoslots, original, time_limit)))
+        logger.debug(f"Split AutoScheduler problem into {len(subproblems)} sub-problems")
+
+        if len(subproblems) > 1:
+            # fork so the workers inherit the loaded modules and Django setup
+            with ProcessPoolExecutor(
+                max_workers=min(processes or multiprocessing.cpu_count(), len(subproblems)),
+                mp_context=multiprocessing.get_context("fork"),
+            ) as executor:
+                futures = [executor.submit(calculate_solution, *args) for _, _, args in subproblems]
+                solutions = [future.result() for future in futures]
+        else:
+            solutions = [calculate_solution(*args) for _, _, args in subproblems]
+
+        # merge the solutions, mapping the sub-problem indexes back to our own autoevents and autoslots
+        autoschedule = []
+        for (event_indexes, slot_indexes, _), solution in zip(subproblems, solutions, strict=True):
+            for event, slot in solution:
+                autoschedule.append(
+                    resources.ScheduledItem(
+                        event=self.autoevents[event_indexes[event]],
+                        slot=self.autoslots[slot_indexes[slot]],
+                    ),
+                )
+        return autoschedule
+
+    def calculate_similar_autoschedule(
+        self,
+        original_schedule: list[resources.ScheduledItem] | None = None,
+        time_limit: int | None = None,
+        *,
+        decompose: bool = False,
+        processes: int | None = None,
+    ) -> tuple[list[resources.ScheduledItem], dict]:
+        """Convenience method for creating similar schedules.
+
+        If original_schedule is omitted the new schedule is based on the current schedule instead.
         """
         if not original_schedule:
             # we do not have an original_schedule, use current EventInstances
             original_schedule = self.build_current_autoschedule()
 
         # calculate and return
-        autoschedule = self.calculate_autoschedule(original_schedule=original_schedule)
+        autoschedule = self.calculate_autoschedule(
+            original_schedule=original_schedule,
+            time_limit=time_limit,
+            decompose=decompose,
+            processes=processes,
+        )
         diff = self.diff(original_schedule, autoschedule)
         return autoschedule, diff
 
-    def apply(self, autoschedule):
-        """Apply an autoschedule by creating EventInstance objects to match it."""
-        # "The Clean Slate protocol sir?" - delete any existing autoscheduled Events
+    def load_autoschedule(self, data: list[dict], input_hash: str | None = None) -> list[resources.ScheduledItem]:
+        """Return an autoschedule from the output of serialise_autoschedule().
+
+        The autoschedule uses the autoevents and autoslots of this AutoScheduler.
+
+        Raises ValueError if the data changed since the schedule was calculated, which
+        is when input_hash (the input_hash of the AutoScheduler which calculated the
+        schedule) is different from ours, or when the schedule contains an Event or a
+        slot which this AutoScheduler does not have.
+        """
+        if input_hash and input_hash != self.input_hash:
+            raise ValueError("The Events, EventSlots or Speakers changed since the schedule was calculated")
+        autoevents = {autoevent.name: autoevent for autoevent in self.autoevents}
+        autoslots = {(slot.session, slot.starts_at): slot for slot in self.autoslots}
+        autoschedule = []
+        for item in data:
+            key = (item["session"], datetime.fromisoformat(item["starts_at"]))
+            if item["event"] not in autoevents or key not in autoslots:
+                raise ValueError("The schedule does not match the current Events and EventSlots")
+            autoschedule.append(
+                resources.ScheduledItem(
+                    event=autoevents[item["event"]],
+                    slot=autoslots[key],
+                ),
+            )
+        return autoschedule
+
+    def apply(self, autoschedule: list[resources.ScheduledItem]) -> tuple[int, int]:
+        """Apply an autoschedule by scheduling Events in EventSlots to match it.
+
+        The EventSlots and Events are loaded upfront and the changes are written with
+        bulk_update() in a single transaction, so the number of queries does not grow
+        with the size of the schedule. The EventSlots are not validated one by one,
+        check the schedule with is_valid() before applying it.
+        """
+        if self.camp.read_only:
+            raise CampReadOnlyModeError(f"The camp {self.camp} is in read only mode.")
+
+        # get all autoscheduled EventSlots, and the EventSlots in the sessions used by the schedule
+        slots = {
+            (slot.event_session_id, slot.when.lower, slot.when.upper): slot
+            for slot in self.camp.event_slots.filter(
+                Q(autoscheduled=True) | Q(event_session_id__in={item.slot.session for item in autoschedule}),
+            )
+        }
+        events = (
+            self.camp.events.select_related("proposal__user")
+            .prefetch_related("speakers")
+            .in_bulk({item.event.name for item in autoschedule})
+        )
+
+        # "The Clean Slate protocol sir?" - unschedule any existing autoscheduled Events
         # TODO: investigate how this affects the FRAB XML export (for which we added a UUID on
         # Slot objects). Make sure "favourite" functionality or bookmarks or w/e in
         # FRAB clients still work after a schedule "re"apply. We might need a smaller hammer here.
-        deleted = self.camp.event_slots.filter(
-            # get all autoscheduled EventSlots
-            autoscheduled=True,
-        ).update(
-            # clear the Event
-            event=None,
-            # and autoscheduled status
-            autoscheduled=None,
-        )
-
-        # loop and schedule events
-        scheduled = 0
+        previous = {}
+        updated = {}
+        for slot in slots.values():
+            if slot.autoscheduled:
+                previous[slot.pk] = slot.event_id
+                slot.event = None
+                slot.autoscheduled = None
+                updated[slot.pk] = slot
+
+        # schedule events, remembering the slots where the Event changed for the emails
+        changed = []
         for item in autoschedule:
             # each item is an instance of conference_scheduler.resources.ScheduledItem
-            event = self.camp.events.get(id=item.event.name)
-            slot = self.camp.event_slots.get(
-                event_session_id=item.slot.session,
-                when=DateTimeTZRange(
-                    item.slot.starts_at,
-                    item.slot.starts_at + timedelta(minutes=item.slot.duration),
-                    "[)",  # remember to use the correct bounds when comparing
-                ),
+            key = (
+                item.slot.session,
+                item.slot.starts_at,
+                item.slot.starts_at + timedelta(minutes=item.slot.duration),
             )
-            slot.event = event
+            if key not in slots or item.event.name not in events:
+                raise ValueError("The schedule does not match the current Events and EventSlots")
+            slot = slots[key]
+            slot.event = events[item.event.name]
             slot.autoscheduled = True
-            slot.save()
-            add_event_scheduled_email(slot)
+            updated[slot.pk] = slot
+            if previous.get(slot.pk) != slot.event_id:
+                changed.append(slot)
 
-            scheduled += 1
+        with transaction.atomic():
+            EventSlot.objects.bulk_update(updated.values(), ["event", "autoscheduled"])
+            add_events_scheduled_email(self.camp, changed)
+            # bulk_update() sends no signals, tell schedule clients to fetch the new schedule
+            transaction.on_commit(lambda: publish_schedule_resync(self.camp))
 
         # return the numbers
-        return deleted, scheduled
+        return len(previous), len(autoschedule)
 
-    def diff(self, original_schedule, new_schedule):
-        """This method returns a dict of Event differences and Slot differences between
-        the two schedules.
-        """
+    def diff(
+        self,
+        original_schedule: list[resources.ScheduledItem],
+        new_schedule: list[resources.ScheduledItem],
+    ) -> dict:
+        """Return a dict of Event differences and Slot differences between the two schedules."""
         slot_diff = scheduler.slot_schedule_difference(
             original_schedule,
             new_schedule,
         )
+        event_diff = scheduler.event_schedule_difference(
+            original_schedule,
+            new_schedule,
+        )
+
+        # get all Events and EventLocations in the diffs upfront,
+        # Events missing here have been deleted and are shown by id
+        event_ids = {item.event.name for item in event_diff}
+        for item in slot_diff:
+            event_ids.update(event.name for event in (item.old_event, item.new_event) if event)
+        locations = {item.slot.venue for item in slot_diff}
+        for item in event_diff:
+            locations.update(slot.venue for slot in (item.old_slot, item.new_slot) if slot)
+        events = self.camp.events.in_bulk(event_ids)
+        locations = self.camp.event_locations.in_bulk(locations)
 
         slot_output = []
         for item in slot_diff:
             slot_output.append(
                 {
-                    "event_location": self.camp.event_locations.get(pk=item.slot.venue),
+                    "event_location": locations[item.slot.venue],
                     "starttime": item.slot.starts_at,
                     "old": {},
                     "new": {},
                 },
             )
             if item.old_event:
-                try:
-                    old_event = self.camp.events.get(pk=item.old_event.name)
-                except self.camp.events.DoesNotExist:
-                    old_event = item.old_event.name
-                slot_output[-1]["old"]["event"] = old_event
+                slot_output[-1]["old"]["event"] = events.get(item.old_event.name, item.old_event.name)
             if item.new_event:
-                try:
-                    new_event = self.camp.events.get(pk=item.new_event.name)
-                except self.camp.events.DoesNotExist:
-                    new_event = item.old_event.name
-                slot_output[-1]["new"]["event"] = new_event
+                slot_output[-1]["new"]["event"] = events.get(item.new_event.name, item.new_event.name)
 
         # then get a list of differences per event
-        event_diff = scheduler.event_schedule_difference(
-            original_schedule,
-            new_schedule,
-        )
         event_output = []
         # loop over the differences and build the dict
         for item in event_diff:
-            try:
-                event = self.camp.events.get(pk=item.event.name)
-            except self.camp.events.DoesNotExist:
-                event = item.event.name
             event_output.append(
                 {
-                    "event": event,
+                    "event": events.get(item.event.name, item.event.name),
                     "old": {},
                     "new": {},
                 },
             )
             # do we have an old slot for this event?
             if item.old_slot:
-                event_output[-1]["old"]["event_location"] = self.camp.event_locations.get(id=item.old_slot.venue)
+                event_output[-1]["old"]["event_location"] = locations[item.old_slot.venue]
                 event_output[-1]["old"]["starttime"] = item.old_slot.starts_at
             # do we have a new slot for this event?
             if item.new_slot:
-                event_output[-1]["new"]["event_location"] = self.camp.event_locations.get(id=item.new_slot.venue)
+                event_output[-1]["new"]["event_location"] = locations[item.new_slot.venue]
                 event_output[-1]["new"]["starttime"] = item.new_slot.starts_at
 
         # all good
         return {"event_diffs": event_output, "slot_diffs": slot_output}
 
-    def is_valid(self, autoschedule, return_violations=False):
+    def is_valid(
+        self,
+        autoschedule: list[resources.ScheduledItem],
+        *,
+        return_violations: bool = False,
+    ) -> bool | tuple[bool, list]:
         """Check if a schedule is valid, optionally returning a list of violations if invalid."""
         valid = is_valid_schedule(
             autoschedule,
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .autoscheduler import AutoScheduler
+from .autoscheduler import serialise_autoschedule
+from .models import AutoScheduleJob
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def claim_job():
+    """Claim the oldest pending AutoScheduleJob by marking it as running, or return None.
+
+    The row is locked with SKIP LOCKED so multiple workers never claim the same job.
+    Jobs which have been running for longer than AUTOSCHEDULE_JOB_TIMEOUT seconds
+    belong to a worker which crashed or was killed, so they are claimed again.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.AUTOSCHEDULE_JOB_TIMEOUT)
+    with transaction.atomic():
+        job = (
+            AutoScheduleJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=AutoScheduleJob.STATUS_PENDING) | Q(status=AutoScheduleJob.STATUS_RUNNING, started__lt=stale),
+            )
+            .order_by("created")
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == AutoScheduleJob.STATUS_RUNNING:
+            logger.warning(f"Reclaiming {job} which was started at {job.started}")
+        job.status = AutoScheduleJob.STATUS_RUNNING
+        job.started = timezone.now()
+        job.save(update_fields=["status", "started", "updated"])
+    return job
+
+
+def save_job(job, **fields) -> bool:
+    """Save the fields of a job we claimed, returning False if it was claimed again by another worker.
+
+    The started timestamp identifies our claim, so a worker which comes back after its job
+    was reclaimed does not overwrite the result of the worker which reclaimed it.
+    """
+    fields["updated"] = timezone.now()
+    return bool(AutoScheduleJob.objects.filter(pk=job.pk, started=job.started).update(**fields))
+
+
+def run_job(job) -> None:
+    """Build the AutoScheduler problem, calculate the schedule, and save the result in the job."""
+    job.set_progress("Building AutoScheduler problem")
+    autoscheduler = AutoScheduler(camp=job.camp, **job.constraints)
+
+    limit = f" (time limit {job.time_limit} seconds)" if job.time_limit else ""
+    job.set_progress(
+        f"Calculating {job.schedule} schedule for {len(autoscheduler.autoevents)} Events "
+        f"in {len(autoscheduler.autoslots)} Slots{limit}",
+    )
+    if job.schedule == "similar":
+        autoschedule = autoscheduler.calculate_autoschedule(
+            original_schedule=autoscheduler.build_current_autoschedule(),
+            time_limit=job.time_limit,
+            decompose=job.decompose,
+        )
+    else:
+        autoschedule = autoscheduler.calculate_autoschedule(
+            time_limit=job.time_limit,
+            decompose=job.decompose,
+        )
+
+    job.set_progress("Validating schedule")
+    valid, violations = autoscheduler.is_valid(autoschedule, return_violations=True)
+
+    if not save_job(
+        job,
+        result={
+            "schedule": serialise_autoschedule(autoschedule),
+            "input_hash": autoscheduler.input_hash,
+            "valid": valid,
+            "violations": list(violations),
+        },
+        status=AutoScheduleJob.STATUS_FINISHED,
+        finished=timezone.now(),
+        progress=f"Done, {len(autoschedule)} Events scheduled",
+    ):
+        logger.warning(f"Not saving the result of {job}, it was claimed by another worker")
+
+
+def do_work() -> None:
+    """The autoschedule worker runs pending AutoScheduleJobs, so the LP solver
+    does not run in the request path of the backoffice views.
+    """
+    while job := claim_job():
+        logger.info(f"Running {job}")
+        try:
+            run_job(job)
+        except Exception as E:
+            # ValueError is raised by the scheduler when no valid solution is found
+            logger.exception(f"Unable to calculate schedule for {job}")
+            save_job(
+                job,
+                status=AutoScheduleJob.STATUS_FAILED,
+                finished=timezone.now(),
+                error=str(E),
+            )
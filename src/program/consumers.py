@@ -4,17 +4,22 @@ from channels.generic.websocket import JsonWebsocketConsumer
 
 from camps.models import Camp
 
-from .models import Event
 from .models import EventInstance
-from .models import EventLocation
-from .models import EventTrack
-from .models import EventType
 from .models import Favorite
-from .models import Speaker
+from .schedule_snapshot import SCHEDULE_GROUP
+from .schedule_snapshot import get_schedule_snapshot
 
 
 class ScheduleConsumer(JsonWebsocketConsumer):
-    groups = ["schedule_users"]
+    """Send the schedule document on "init", followed by patches when the program changes.
+
+    Each patch has the schedule version it creates. Clients apply patches in order, and
+    send "init" again to get the whole document if they see a gap in the versions or
+    receive a "resync" patch.
+    """
+
+    groups = [SCHEDULE_GROUP]
+    camp_slug = None
 
     def receive(self, text_data, **kwargs) -> None:
         user = self.scope["user"]
@@ -26,45 +31,20 @@ class ScheduleConsumer(JsonWebsocketConsumer):
             camp_slug = content.get("camp_slug")
             try:
                 camp = Camp.objects.get(slug=camp_slug)
-                days = [
-                    {
-                        "repr": day.lower.strftime("%A %Y-%m-%d"),
-                        "iso": day.lower.strftime("%Y-%m-%d"),
-                        "day_name": day.lower.strftime("%A"),
+                # only forward patches for this camp from now on
+                self.camp_slug = camp.slug
+                # the schedule is the same for everyone, send the prebuilt document
+                self.send_json(get_schedule_snapshot(camp))
+                if user.is_authenticated:
+                    # send favorites seperately as a list of EventInstance ids
+                    data = {
+                        "action": "favorites",
+                        "event_instance_ids": list(
+                            user.favorites.filter(
+                                event_instance__event__track__camp=camp,
+                            ).values_list("event_instance_id", flat=True),
+                        ),
                     }
-                    for day in camp.get_days("camp")
-                ]
-
-                events_query_set = Event.objects.filter(track__camp=camp)
-                events = [x.serialize() for x in events_query_set]
-
-                event_instances_query_set = EventInstance.objects.filter(
-                    event__track__camp=camp,
-                )
-                event_instances = [x.serialize(user=user) for x in event_instances_query_set]
-
-                event_locations_query_set = EventLocation.objects.filter(camp=camp)
-                event_locations = [x.serialize() for x in event_locations_query_set]
-
-                event_types_query_set = EventType.objects.filter()
-                event_types = [x.serialize() for x in event_types_query_set]
-
-                event_tracks_query_set = EventTrack.objects.filter(camp=camp)
-                event_tracks = [x.serialize() for x in event_tracks_query_set]
-
-                speakers_query_set = Speaker.objects.filter(camp=camp)
-                speakers = [x.serialize() for x in speakers_query_set]
-
-                data = {
-                    "action": "init",
-                    "events": events,
-                    "event_instances": event_instances,
-                    "event_locations": event_locations,
-                    "event_types": event_types,
-                    "event_tracks": event_tracks,
-                    "speakers": speakers,
-                    "days": days,
-                }
             except Camp.DoesNotExist:
                 pass
 
@@ -89,5 +69,10 @@ class ScheduleConsumer(JsonWebsocketConsumer):
         if data:
             self.send_json(data)
 
+    def schedule_patch(self, event) -> None:
+        """Forward a patch published by publish_schedule_patch() to the client."""
+        if event["patch"]["camp_slug"] == self.camp_slug:
+            self.send_json(event["patch"])
+
     def disconnect(self, message, **kwargs) -> None:
         pass
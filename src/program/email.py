@@ -195,3 +195,47 @@ def add_event_scheduled_email(slot) -> bool | None:
             hold=True,
         )
     return None
+
+
+def add_events_scheduled_email(camp, slots) -> bool | None:
+    """Queue one email per recipient listing all their newly scheduled events.
+
+    Used when applying a schedule, where a speaker can get many events scheduled at
+    once. The slots must have event, event speakers and event proposal user loaded.
+    """
+    # build a list of slots per unique recipient
+    recipient_slots = {}
+    for slot in slots:
+        # add all speaker emails
+        recipients = {speaker.email for speaker in slot.event.speakers.all()}
+        # also add the submitting users email
+        if slot.event.proposal:
+            recipients.add(slot.event.proposal.user.email)
+        for rcpt in recipients:
+            recipient_slots.setdefault(rcpt, []).append(slot)
+
+    if not recipient_slots:
+        return None
+
+    try:
+        content_team = Team.objects.get(camp=camp, name="Content")
+    except ObjectDoesNotExist as e:
+        logger.info(f"There is no team with name Content: {e}")
+        return False
+
+    # loop over unique recipients and send an email to each
+    for rcpt, rcpt_slots in recipient_slots.items():
+        if len(rcpt_slots) == 1:
+            subject = f"Your {camp.title} event '{rcpt_slots[0].event.title}' has been scheduled!"
+        else:
+            subject = f"Your {camp.title} events have been scheduled!"
+        add_outgoing_email(
+            responsible_team=content_team,
+            text_template="emails/events_scheduled.txt",
+            html_template="emails/events_scheduled.html",
+            to_recipients=rcpt,
+            formatdict={"camp": camp, "slots": sorted(rcpt_slots, key=lambda slot: slot.when.lower)},
+            subject=subject,
+            hold=True,
+        )
+    return None
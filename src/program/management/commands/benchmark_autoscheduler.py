@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from conference_scheduler import resources
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from camps.models import Camp
+from program.autoscheduler import AutoScheduler
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.db.models import QuerySet
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def legacy_get_autoevents(scheduler: AutoScheduler, events: QuerySet) -> tuple[list, dict]:
+    """Build the autoevents like AutoScheduler.get_autoevents() did before the rewrite.
+
+    The rewrite uses bulk queries and an AutoSlotIndex, this is only kept here for
+    comparison. The range checks compare bounds, psycopg2 ranges have no & or in.
+    """
+    autoevents = []
+    autoeventindex = {}
+    eventindex = {}
+    for event in events:
+        autoevents.append(
+            resources.Event(
+                name=event.id,
+                duration=event.duration_minutes,
+                tags=event.tags.names(),
+                demand=event.demand,
+            ),
+        )
+        autoeventindex[autoevents.index(autoevents[-1])] = event
+        eventindex[event] = autoevents.index(autoevents[-1])
+
+    for autoevent in autoevents:
+        event = autoeventindex[autoevents.index(autoevent)]
+        for et in scheduler.event_types.all().exclude(pk=event.event_type.pk):
+            if et in scheduler.event_type_slots:
+                autoevent.add_unavailability(*scheduler.event_type_slots[et])
+
+        for speaker in event.speakers.all():
+            conflict_ids = speaker.events.exclude(id=event.id).values_list(
+                "id",
+                flat=True,
+            )
+            for conflictevent in autoevents:
+                if conflictevent.name in conflict_ids and autoevents.index(conflictevent) > autoevents.index(
+                    autoevent,
+                ):
+                    autoevent.add_unavailability(conflictevent)
+
+            for conflictevent in speaker.event_conflicts.filter(
+                pk__in=events.values_list("pk", flat=True),
+            ):
+                if eventindex[conflictevent] > autoevents.index(autoevent):
+                    autoevent.add_unavailability(
+                        autoevents[eventindex[conflictevent]],
+                    )
+
+            for conflictevent in speaker.event_conflicts.filter(
+                event_slots__isnull=False,
+            ).exclude(pk__in=events.values_list("pk", flat=True)):
+                for conflictslot in conflictevent.event_slots.all():
+                    for slot in scheduler.autoslots:
+                        slot_end = slot.starts_at + timedelta(minutes=slot.duration)
+                        if conflictslot.when.lower < slot_end and slot.starts_at < conflictslot.when.upper:
+                            autoevent.add_unavailability(slot)
+
+            available = []
+            for availability in speaker.availabilities.filter(
+                available=True,
+            ).values_list("when", flat=True):
+                for slot in scheduler.autoslots:
+                    slot_end = slot.starts_at + timedelta(minutes=slot.duration)
+                    if availability.lower <= slot.starts_at and slot_end <= availability.upper:
+                        available.append(scheduler.autoslots.index(slot))
+            autoevent.add_unavailability(
+                *[s for s in scheduler.autoslots if scheduler.autoslots.index(s) not in available],
+            )
+
+    return autoevents, autoeventindex
+
+
+def unavailability_sets(autoevents: list) -> list[set]:
+    """Return a list with a set of unavailable slots and Event ids for each autoevent.
+
+    Order and duplicates are ignored.
+    """
+    return [
+        {item.name if isinstance(item, resources.Event) else item for item in autoevent.unavailability}
+        for autoevent in autoevents
+    ]
+
+
+class Command(BaseCommand):
+    args = "none"
+    help = (
+        "Benchmark the AutoScheduler constraint builder against the legacy one. "
+        "Run it against a camp in a bootstrapped devsite."
+    )
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "camp_slug",
+            type=str,
+            help="The slug of the camp to benchmark, like bornhack-2025",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=3,
+            help="The number of times to run each builder. Default: 3",
+        )
+        parser.add_argument(
+            "--skip-legacy",
+            action="store_true",
+            help="Only benchmark the current builder. Useful for big camps where the legacy builder takes forever.",
+        )
+
+    def output(self, message: str) -> None:
+        self.stdout.write(
+            "{}: {}".format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"), message),
+        )
+
+    def run_builder(self, name: str, builder: Callable, rounds: int) -> list:
+        """Run a builder a number of times and output timing and query count."""
+        durations = []
+        for _ in range(rounds):
+            with CaptureQueriesContext(connection) as queries:
+                start = perf_counter()
+                autoevents, _ = builder()
+                durations.append(perf_counter() - start)
+        self.output(
+            f"{name}: best {min(durations):.3f}s, worst {max(durations):.3f}s, {len(queries)} queries",
+        )
+        return autoevents
+
+    def handle(self, *args, **options) -> None:
+        try:
+            camp = Camp.objects.get(slug=options["camp_slug"])
+        except Camp.DoesNotExist as e:
+            raise CommandError(f"Camp {options['camp_slug']} not found") from e
+
+        start = perf_counter()
+        scheduler = AutoScheduler(camp=camp, use_snapshot=False)
+        self.output(
+            f"Initialised AutoScheduler in {perf_counter() - start:.3f}s: "
+            f"{len(scheduler.autoevents)} Events, {len(scheduler.autoslots)} Slots",
+        )
+
+        autoevents = self.run_builder(
+            "Current builder",
+            lambda: scheduler.get_autoevents(scheduler.events),
+            options["rounds"],
+        )
+        if options["skip_legacy"]:
+            return
+
+        legacy_autoevents = self.run_builder(
+            "Legacy builder",
+            lambda: legacy_get_autoevents(scheduler, scheduler.events),
+            options["rounds"],
+        )
+        if unavailability_sets(autoevents) == unavailability_sets(legacy_autoevents):
+            self.output(self.style.SUCCESS("Both builders produced the same constraints"))
+        else:
+            self.output(self.style.ERROR("The builders produced different constraints!"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.16 on 2026-10-17 10:12
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camps', '0041_alter_camp_options'),
+        ('program', '0107_alter_url_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoSchedulerSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('version', models.PositiveIntegerField(help_text='The snapshot format version. Snapshots with an old version are ignored.')),
+                ('hashes', models.JSONField(default=dict, help_text='The hash of the input rows for each part of the snapshot')),
+                ('data', models.JSONField(default=dict, help_text='The serialised autoslots, autoevents and constraints')),
+                ('camp', models.OneToOneField(help_text='The Camp this snapshot belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='autoscheduler_snapshot', to='camps.camp')),
+            ],
+            options={
+                'ordering': ['-created'],
+                'abstract': False,
+            },
+            bases=(django_prometheus.models.ExportModelOperationsMixin('autoscheduler_snapshot'), models.Model),
+        ),
+    ]
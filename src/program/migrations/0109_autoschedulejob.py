@@ -0,0 +1,42 @@
+# Generated by Django 5.2.16 on 2026-10-17 11:02
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camps', '0041_alter_camp_options'),
+        ('program', '0108_autoschedulersnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoScheduleJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('schedule', models.CharField(choices=[('similar', 'Similar schedule (as similar to the current schedule as possible)'), ('new', 'New schedule (without considering the current schedule)')], help_text='The type of schedule to calculate', max_length=10)),
+                ('constraints', models.JSONField(blank=True, default=dict, help_text='The constraints to enable or disable, passed to the AutoScheduler')),
+                ('time_limit', models.PositiveIntegerField(blank=True, help_text='Stop the solver after this many seconds and use the best schedule found so far. Leave blank for no limit.', null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], db_index=True, default='pending', help_text='The status of this job', max_length=10)),
+                ('progress', models.CharField(blank=True, help_text='The latest progress message from the worker', max_length=255)),
+                ('started', models.DateTimeField(blank=True, help_text='When the worker started this job', null=True)),
+                ('finished', models.DateTimeField(blank=True, help_text='When the worker finished this job', null=True)),
+                ('result', models.JSONField(blank=True, help_text='The serialised schedule, validity and violations', null=True)),
+                ('error', models.TextField(blank=True, help_text='The error message if the job failed')),
+                ('camp', models.ForeignKey(help_text='The Camp this job calculates a schedule for', on_delete=django.db.models.deletion.PROTECT, related_name='autoschedule_jobs', to='camps.camp')),
+                ('user', models.ForeignKey(blank=True, help_text='The User who created this job', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'abstract': False,
+            },
+            bases=(django_prometheus.models.ExportModelOperationsMixin('autoschedule_job'), models.Model),
+        ),
+    ]
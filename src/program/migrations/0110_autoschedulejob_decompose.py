@@ -0,0 +1,18 @@
+# Generated by Django 5.2.16 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('program', '0109_autoschedulejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autoschedulejob',
+            name='decompose',
+            field=models.BooleanField(default=True, help_text='Split the problem into independent sub-problems (roughly one per EventType) and solve them in parallel'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.16 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('program', '0110_autoschedulejob_decompose'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='autoschedulejob',
+            name='decompose',
+            field=models.BooleanField(default=True, help_text='Split the problem into independent sub-problems (roughly one per EventType) and solve them in parallel. The result is equivalent to solving it in one go when there is no original schedule, otherwise it may differ'),
+        ),
+    ]
@@ -21,6 +21,7 @@ from django.db.models import Q
 from django.urls import reverse
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
 from django_prometheus.models import ExportModelOperationsMixin
 from psycopg2.extras import DateTimeTZRange
@@ -37,6 +38,7 @@ from .email import add_event_proposal_accepted_email
 from .email import add_event_proposal_rejected_email
 from .email import add_speaker_proposal_accepted_email
 from .email import add_speaker_proposal_rejected_email
+from .utils import EventSlotAvailability
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
@@ -942,58 +944,44 @@ class EventSession(ExportModelOperationsMixin("event_session"), CampRelatedModel
         """Just return a timedelta of the lenght of this Session."""
         return self.when.upper - self.when.lower
 
+    @cached_property
+    def slot_availability(self):
+        """The EventSlotAvailability for the camp. Views showing many EventSessions can
+        set this to a shared instance to avoid loading it once per EventSession.
+        """
+        return EventSlotAvailability(self.camp)
+
     @property
     def free_time(self):
         """Returns a timedelta of the free time in this Session."""
         return self.duration - timedelta(
-            minutes=self.event_duration_minutes * self.get_unavailable_slots().count(),
+            minutes=self.event_duration_minutes * self.slot_availability.get_unavailable_slot_count(self),
         )
 
     def get_available_slots(self, count_autoscheduled_as_free=False, bounds="()"):
         """Return a queryset of slots that have nothing scheduled, remember to consider
-        conflicting locations too.
+        conflicting locations too. The work is done by self.slot_availability.
         """
-        # do we want to count slots with autoscheduled Events as free or not?
-        if count_autoscheduled_as_free:
-            # a slot is available if nothing is scheduled, or if the event is autoscheduled
-            availablefilter = Q(event__isnull=True) | Q(autoscheduled=True)
-            # a slot is busy if something is manually scheduled
-            busyfilter = Q(autoscheduled=False)
-        else:
-            # a slot is available if nothing is scheduled
-            availablefilter = Q(event__isnull=True)
-            # a slot is busy if something is scheduled
-            busyfilter = Q(event__isnull=False)
-
-        # get the times of all busy slots in the same or conflicting
-        # locations which overlap with this session
-        conflict_slot_times = self.camp.event_slots.filter(
-            # get slots at the same or a conflicting location
-            Q(event_session__event_location__in=self.event_location.conflicts.all())
-            | Q(event_session__event_location=self.event_location),
-            # which have something scheduled in them
-            busyfilter,
-            # at the same time as this session
-            when__overlap=self.when,
-        ).values_list("when", flat=True)
-
-        # build the excludefilter so we exclude any slots that overlap with any
-        # of our conflict_slot_times
-        excludefilter = Q()
-        for slot in conflict_slot_times:
-            # slot is a DateTimeTZRange with bounds "[)"
-            excludefilter |= Q(when__overlap=slot)
-
-        # do the thing
-        return self.event_slots.filter(availablefilter).exclude(excludefilter)
+        return self.event_slots.filter(
+            id__in=[
+                slot.id
+                for slot in self.slot_availability.get_available_slots(
+                    self,
+                    count_autoscheduled_as_free=count_autoscheduled_as_free,
+                )
+            ],
+        )
 
     def get_unavailable_slots(self, count_autoscheduled_as_free=False, bounds="[)"):
-        """Return a list of slots that are not available for some reason."""
+        """Return a queryset of slots that are not available for some reason."""
         return self.event_slots.exclude(
-            id__in=self.get_available_slots(
-                count_autoscheduled_as_free=count_autoscheduled_as_free,
-                bounds=bounds,
-            ).values_list("id", flat=True),
+            id__in=[
+                slot.id
+                for slot in self.slot_availability.get_available_slots(
+                    self,
+                    count_autoscheduled_as_free=count_autoscheduled_as_free,
+                )
+            ],
         )
 
     def get_slot_times(self, bounds="[)"):
@@ -1096,6 +1084,13 @@ class EventSlot(ExportModelOperationsMixin("event_slot"), CampRelatedModel):
 
     camp_filter = "event_session__camp"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the Event in the database, so signal handlers can tell when a slot is unscheduled."""
+        instance = super().from_db(db, field_names, values)
+        instance.saved_event_id = instance.__dict__.get("event_id")
+        return instance
+
     def __str__(self) -> str:
         return f"{self.when} ({self.event_session.event_location.name}, {self.event_session.event_type})"
 
@@ -1183,13 +1178,28 @@ class EventSlot(ExportModelOperationsMixin("event_slot"), CampRelatedModel):
     def duration_minutes(self):
         return int(self.duration.total_seconds() // 60)
 
-    def get_ics_event(self):
+    def serialize(self):
+        return {
+            "id": self.id,
+            "uuid": str(self.uuid),
+            "event_slug": self.event.slug if self.event else None,
+            "event_type": self.event_type.slug,
+            "location": self.event_location.slug,
+            "from": self.when.lower.isoformat(),
+            "to": self.when.upper.isoformat(),
+        }
+
+    def get_ics_event(self, domain=None):
+        """Return an icalendar.Event for this EventSlot. Pass domain to avoid looking up
+        the current Site, and prefetch event__speakers when calling this for many slots.
+        """
         if not self.event:
             return False
         ievent = icalendar.Event()
         ievent["summary"] = self.event.title
-        domain = Site.objects.get_current().domain
-        speakers = ", ".join(self.event.speakers.all().values_list("name", flat=True))
+        if domain is None:
+            domain = Site.objects.get_current().domain
+        speakers = ", ".join(speaker.name for speaker in self.event.speakers.all())
         recorded = "Yes" if self.event.video_recording else "No"
         streamed = "Yes" if self.event.video_streaming else "No"
         ievent["description"] = (
@@ -1666,6 +1676,165 @@ class Favorite(ExportModelOperationsMixin("favorite"), models.Model):
         unique_together = ["user", "event_instance"]
 
 
+class AutoSchedulerSnapshot(
+    ExportModelOperationsMixin("autoscheduler_snapshot"),
+    CreatedUpdatedModel,
+):
+    """A serialised AutoScheduler problem for a Camp.
+
+    The snapshot is split in parts, each saved with a hash of the database rows it was
+    built from. The AutoScheduler reuses the parts where the hash still matches and
+    only rebuilds the rest. See program.autoscheduler for details.
+    """
+
+    camp = models.OneToOneField(
+        "camps.Camp",
+        related_name="autoscheduler_snapshot",
+        on_delete=models.CASCADE,
+        help_text="The Camp this snapshot belongs to",
+    )
+
+    version = models.PositiveIntegerField(
+        help_text="The snapshot format version. Snapshots with an old version are ignored.",
+    )
+
+    hashes = models.JSONField(
+        default=dict,
+        help_text="The hash of the input rows for each part of the snapshot",
+    )
+
+    data = models.JSONField(
+        default=dict,
+        help_text="The serialised autoslots, autoevents and constraints",
+    )
+
+    def __str__(self) -> str:
+        return f"AutoScheduler snapshot for {self.camp} (version {self.version})"
+
+
+class AutoScheduleJob(ExportModelOperationsMixin("autoschedule_job"), CampRelatedModel):
+    """An AutoScheduler calculation to be run in the background by program.autoscheduleworker.
+
+    The worker saves status and progress as it goes, and the resulting schedule is saved
+    in serialised form so it can be reviewed and applied from the backoffice later.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_FINISHED = "finished"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_FINISHED, "Finished"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    SCHEDULE_CHOICES = [
+        ("similar", "Similar schedule (as similar to the current schedule as possible)"),
+        ("new", "New schedule (without considering the current schedule)"),
+    ]
+
+    camp = models.ForeignKey(
+        "camps.Camp",
+        related_name="autoschedule_jobs",
+        on_delete=models.PROTECT,
+        help_text="The Camp this job calculates a schedule for",
+    )
+
+    user = models.ForeignKey(
+        "auth.User",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text="The User who created this job",
+    )
+
+    schedule = models.CharField(
+        max_length=10,
+        choices=SCHEDULE_CHOICES,
+        help_text="The type of schedule to calculate",
+    )
+
+    constraints = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="The constraints to enable or disable, passed to the AutoScheduler",
+    )
+
+    time_limit = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Stop the solver after this many seconds and use the best schedule found so far. Leave blank for no limit.",
+    )
+
+    decompose = models.BooleanField(
+        default=True,
+        help_text=(
+            "Split the problem into independent sub-problems (roughly one per EventType) and solve them in "
+            "parallel. The result is equivalent to solving it in one go when there is no original schedule, "
+            "otherwise it may differ"
+        ),
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True,
+        help_text="The status of this job",
+    )
+
+    progress = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="The latest progress message from the worker",
+    )
+
+    started = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the worker started this job",
+    )
+
+    finished = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the worker finished this job",
+    )
+
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="The serialised schedule, validity and violations",
+    )
+
+    error = models.TextField(
+        blank=True,
+        help_text="The error message if the job failed",
+    )
+
+    def __str__(self) -> str:
+        return f"AutoScheduleJob #{self.pk} for {self.camp} ({self.status})"
+
+    def get_absolute_url(self):
+        return reverse(
+            "backoffice:autoschedule_job_detail",
+            kwargs={"camp_slug": self.camp.slug, "pk": self.pk},
+        )
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in (self.STATUS_FINISHED, self.STATUS_FAILED)
+
+    def set_progress(self, message) -> None:
+        """Save a progress message so it can be seen in the backoffice while the job runs."""
+        logger.info(f"{self}: {message}")
+        self.progress = message
+        self.save(update_fields=["progress", "updated"])
+
+
 ###############################################################################
 
 
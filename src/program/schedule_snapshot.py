@@ -0,0 +1,195 @@
+"""Precomputed and versioned schedule documents for the ScheduleConsumer.
+
+The document sent to websocket clients on "init" only changes when the program
+changes, so it is built once per camp and version, and stored in the "schedule"
+cache where all processes can see it. The version is bumped by signal handlers
+when program models are saved or deleted.
+
+Every version bump is also published to the ScheduleConsumer group as a small
+patch with the new version and the changes made in one transaction, so connected
+clients can apply them and only need to request the full document again if they
+miss a version.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import TYPE_CHECKING
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import caches
+
+from .models import Event
+from .models import EventInstance
+from .models import EventLocation
+from .models import EventSlot
+from .models import EventTrack
+from .models import EventType
+from .models import Speaker
+
+if TYPE_CHECKING:
+    from django.db.models import Model
+
+    from camps.models import Camp
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+# how long to keep schedule documents, new versions are built as needed
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# the channel layer group of the ScheduleConsumer
+SCHEDULE_GROUP = "schedule_users"
+
+# the document key and the field identifying objects in it, per model
+PATCH_KEYS = {
+    "Event": ("events", "slug"),
+    "EventInstance": ("event_instances", "id"),
+    "EventLocation": ("event_locations", "slug"),
+    "EventSlot": ("event_slots", "id"),
+    "EventTrack": ("event_tracks", "slug"),
+    "EventType": ("event_types", "slug"),
+    "Speaker": ("speakers", "slug"),
+}
+
+
+class ScheduleStore:
+    """A minimal key/value store on top of the "schedule" cache.
+
+    The cache must be shared by all processes (like Redis) when running more than
+    one, see SCHEDULE_CACHE in environment_settings.py.
+    """
+
+    def __init__(self) -> None:
+        """Get the schedule cache and the channel layer used for publishing patches."""
+        self.cache = caches["schedule"]
+        self.layer = get_channel_layer()
+
+    def _key(self, key: str) -> str:
+        return f"schedule:{key}"
+
+    def get(self, key: str) -> object | None:
+        """Return the value for key or None."""
+        return self.cache.get(self._key(key))
+
+    def add(self, key: str, value: object, timeout: int | None = SNAPSHOT_TIMEOUT) -> bool:
+        """Set the value for key if it is not set already. Returns True if it was set."""
+        return self.cache.add(self._key(key), value, timeout)
+
+    def incr(self, key: str) -> int:
+        """Increment the integer value for key, starting from 0, and return the new value."""
+        key = self._key(key)
+        self.cache.add(key, 0, None)
+        return self.cache.incr(key)
+
+
+def get_schedule_version(camp_id: int, store: ScheduleStore | None = None) -> int:
+    """Return the current schedule version for the camp."""
+    store = store or ScheduleStore()
+    return int(store.get(f"version:{camp_id}") or 0)
+
+
+def bump_schedule_version(camp_id: int, store: ScheduleStore | None = None) -> int:
+    """Bump the schedule version for the camp so the document is rebuilt on next use."""
+    store = store or ScheduleStore()
+    return store.incr(f"version:{camp_id}")
+
+
+def build_schedule_snapshot(camp: Camp) -> dict:
+    """Build the schedule document for the camp with a fixed number of queries."""
+    days = [
+        {
+            "repr": day.lower.strftime("%A %Y-%m-%d"),
+            "iso": day.lower.strftime("%Y-%m-%d"),
+            "day_name": day.lower.strftime("%A"),
+        }
+        for day in camp.get_days("camp")
+    ]
+    events = Event.objects.filter(track__camp=camp).select_related("event_type").prefetch_related("speakers")
+    event_instances = EventInstance.objects.filter(event__track__camp=camp).select_related(
+        "event__event_type",
+        "event__track__camp",
+        "location",
+    )
+    event_slots = EventSlot.objects.filter(
+        event_session__camp=camp,
+        event__isnull=False,
+    ).select_related("event", "event_session__event_type", "event_session__event_location")
+    return {
+        "action": "init",
+        "events": [event.serialize() for event in events],
+        "event_instances": [event_instance.serialize() for event_instance in event_instances],
+        "event_slots": [event_slot.serialize() for event_slot in event_slots],
+        "event_locations": [location.serialize() for location in EventLocation.objects.filter(camp=camp)],
+        "event_types": [event_type.serialize() for event_type in EventType.objects.all()],
+        "event_tracks": [track.serialize() for track in EventTrack.objects.filter(camp=camp)],
+        "speakers": [speaker.serialize() for speaker in Speaker.objects.filter(camp=camp)],
+        "days": days,
+    }
+
+
+def get_schedule_snapshot(camp: Camp) -> dict:
+    """Return the schedule document for the current version, building it if needed.
+
+    Processes never wait for each other, if a rush of clients connect right after a
+    change before the document is stored, each process builds it. The first one to
+    finish stores it for everyone else.
+    """
+    store = ScheduleStore()
+    version = get_schedule_version(camp.pk, store=store)
+    key = f"snapshot:{camp.pk}:{version}"
+
+    document = store.get(key)
+    if document:
+        return json.loads(document)
+
+    data = build_schedule_snapshot(camp)
+    data["version"] = version
+    store.add(key, json.dumps(data))
+    logger.debug(f"Built schedule snapshot version {version} for {camp}")
+    return data
+
+
+def get_schedule_patch(instance: Model, *, deleted: bool = False) -> dict:
+    """Return a change to the schedule document describing a saved or deleted object.
+
+    The change has the document key (like "events"), the field and value identifying
+    the object, and the serialised object for saves. The changes of a transaction are
+    published together in one patch, see program.signal_handlers.ScheduleChanges.
+    """
+    collection, field = PATCH_KEYS[instance.__class__.__name__]
+    data = None if deleted else instance.serialize()
+    return {
+        "collection": collection,
+        "op": "delete" if deleted else "save",
+        "field": field,
+        "value": getattr(instance, field),
+        "object": data,
+    }
+
+
+def publish_schedule_patch(camp: Camp, patch: dict) -> int:
+    """Bump the schedule version for the camp and publish the patch.
+
+    The patch is sent with the new version to the ScheduleConsumer group. Returns the new version.
+    """
+    store = ScheduleStore()
+    version = bump_schedule_version(camp.pk, store=store)
+    if store.layer:
+        async_to_sync(store.layer.group_send)(
+            SCHEDULE_GROUP,
+            {
+                "type": "schedule.patch",
+                "patch": {**patch, "camp_slug": camp.slug, "version": version},
+            },
+        )
+    return version
+
+
+def publish_schedule_resync(camp: Camp) -> int:
+    """Bump the schedule version for the camp and tell clients to fetch the whole document again.
+
+    Used after bulk changes which do not send model signals.
+    """
+    return publish_schedule_patch(camp, {"action": "resync"})
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import logging
+import threading
 
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_delete
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
@@ -39,3 +42,115 @@ def check_speaker_event_camp_consistency(sender, instance, **kwargs) -> None:
 def event_session_post_save(sender, instance, created, **kwargs) -> None:
     """Make sure we have the number of EventSlots we need to have, adjust if not."""
     instance.fixup_event_slots()
+
+
+class ScheduleChanges:
+    """The schedule changes made in one transaction, published when it commits.
+
+    Each camp gets a single version bump and patch with all of its changes, and an
+    object saved more than once is only serialised once, in its final state.
+    """
+
+    def __init__(self) -> None:
+        self.camps = {}
+
+    def is_pending(self) -> bool:
+        """Return True if the changes are published when the current transaction commits."""
+        return any(func == self.publish for _, func, _ in transaction.get_connection().run_on_commit)
+
+    def add(self, camps, instance, deleted=False) -> None:
+        """Add a saved or deleted object for each of the camps."""
+        from .schedule_snapshot import PATCH_KEYS
+        from .schedule_snapshot import get_schedule_patch
+
+        collection, field = PATCH_KEYS[instance.__class__.__name__]
+        key = (collection, getattr(instance, field))
+        # deleted objects lose their pk, so patches for deletes are built right away
+        change = get_schedule_patch(instance, deleted=True) if deleted else instance
+        for camp in camps:
+            self.camps.setdefault(camp, {})[key] = change
+
+    def publish(self) -> None:
+        """Publish a patch with the changes for each camp."""
+        from .schedule_snapshot import get_schedule_patch
+        from .schedule_snapshot import publish_schedule_patch
+
+        for camp, changes in self.camps.items():
+            patches = [
+                change if isinstance(change, dict) else get_schedule_patch(change) for change in changes.values()
+            ]
+            publish_schedule_patch(camp, {"action": "patch", "changes": patches})
+
+
+# the ScheduleChanges of the current transaction, per thread
+schedule_changes = threading.local()
+
+
+def add_schedule_change(camps, instance, deleted=False) -> None:
+    """Add a change to the ScheduleChanges of the current transaction."""
+    changes = getattr(schedule_changes, "pending", None)
+    if changes is not None and changes.is_pending():
+        changes.add(camps, instance, deleted=deleted)
+        return
+    # the first change in this transaction (or the previous one was rolled back)
+    changes = schedule_changes.pending = ScheduleChanges()
+    changes.add(camps, instance, deleted=deleted)
+    # wait for the transaction so clients never see changes which are rolled back
+    transaction.on_commit(changes.publish, robust=True)
+
+
+def publish_schedule_change(sender, instance, **kwargs) -> None:
+    """Publish a patch to ScheduleConsumer clients and bump the schedule version when
+    a program object in the schedule document is saved or deleted.
+
+    EventTypes are shared between camps so they are published to all camps. Unscheduling
+    an EventSlot removes it from the document, and EventSlots without an Event are not
+    published at all.
+    """
+    from camps.models import Camp
+    from program.models import EventSlot
+    from program.models import EventType
+
+    if kwargs.get("raw"):
+        # objects loaded from fixtures
+        return
+
+    deleted = kwargs["signal"] is post_delete
+    if isinstance(instance, EventSlot):
+        was_scheduled = getattr(instance, "saved_event_id", None) is not None
+        instance.saved_event_id = None if deleted else instance.event_id
+        if not instance.event_id:
+            if not was_scheduled:
+                # EventSlots without an Event are not in the schedule document
+                return
+            # the EventSlot was unscheduled, remove it from the schedule document
+            deleted = True
+
+    if isinstance(instance, EventType):
+        camps = list(Camp.objects.all())
+    elif instance.camp:
+        camps = [instance.camp]
+    else:
+        return
+    add_schedule_change(camps, instance, deleted=deleted)
+
+
+def publish_speakers_change(sender, instance, action, pk_set, **kwargs) -> None:
+    """Publish the Events when their speakers change, since they list the speaker slugs."""
+    from program.models import Event
+
+    if isinstance(instance, Event):
+        if action.startswith("post_"):
+            add_schedule_change([instance.camp], instance)
+        return
+
+    if action == "pre_clear":
+        # post_clear has no pk_set, so remember the Events of the Speaker before they are removed
+        instance.cleared_event_ids = list(instance.events.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set = instance.cleared_event_ids
+    elif not action.startswith("post_"):
+        return
+    for event in Event.objects.filter(pk__in=pk_set):
+        add_schedule_change([instance.camp], event)
@@ -1,7 +1,34 @@
+import json
+from datetime import UTC
+from datetime import datetime
+from datetime import timedelta
+from unittest import mock
+
+from conference_scheduler import resources
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
-from utils.tests import BornhackTestBase
+from program.autoscheduler import AutoSlotIndex
+from program.autoscheduler import add_serialised_unavailability
+from program.autoscheduler import deserialise_autoevents
+from program.autoscheduler import deserialise_autoslots
+from program.autoscheduler import get_subproblems
+from program.autoscheduler import serialise_autoevents
+from program.autoscheduler import serialise_autoslots
+from program.autoscheduler import serialise_unavailability
+from program.autoscheduleworker import claim_job
+from program.autoscheduleworker import save_job
+from program.models import AutoScheduleJob
 from program.models import Event
+from program.models import Speaker
+from program.signal_handlers import schedule_changes
+from program.utils import merge_periods
+from program.utils import periods_overlap
+from utils.tests import BornhackTestBase
+
 
 class TestFeedbackCreateView(BornhackTestBase):
     """Test FeedbackCreateView"""
@@ -23,3 +50,219 @@ class TestFeedbackCreateView(BornhackTestBase):
 
         self.assertRedirects(response, expected)
 
+
+class TestICSView(BornhackTestBase):
+    """Test the iCalendar feed."""
+
+    def test_not_modified_without_querying_slots(self) -> None:
+        """A client with the current ETag gets a 304 without the EventSlots being queried."""
+        url = reverse("program:ics_view", kwargs={"camp_slug": self.camp.slug})
+        response = self.client.get(url, {"type": "talk"})
+        assert response.status_code == 200
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"type": "talk"}, headers={"if-none-match": response["ETag"]})
+        assert response.status_code == 304
+        assert not any("program_eventslot" in query["sql"] for query in queries.captured_queries)
+
+        # other filters have another ETag
+        response = self.client.get(url, headers={"if-none-match": response["ETag"]})
+        assert response.status_code == 200
+
+
+class TestSchedulePatches(BornhackTestBase):
+    """Test the schedule patches published when the program changes."""
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        """Test setup."""
+        super().setUpTestData()
+        cls.bootstrap.create_camp_proposals(cls.camp, cls.bootstrap.event_types)
+
+    def setUp(self) -> None:
+        """Forget the changes made in setUpTestData, so each test publishes its own changes."""
+        schedule_changes.pending = None
+
+    def test_changes_are_batched_per_transaction(self) -> None:
+        """Saving objects more than once publishes one patch with one change per object."""
+        events = list(Event.objects.filter(track__camp=self.camp)[:2])
+        with (
+            mock.patch("program.schedule_snapshot.publish_schedule_patch") as publish,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            for event in events * 2:
+                event.save()
+        publish.assert_called_once()
+        camp, patch = publish.call_args.args
+        assert camp == self.camp
+        assert [change["value"] for change in patch["changes"]] == [event.slug for event in events]
+
+    def test_clear_speaker_events(self) -> None:
+        """Clearing the Events of a Speaker publishes the Events which lost the speaker."""
+        speaker = Speaker.objects.filter(camp=self.camp, events__isnull=False).first()
+        slugs = set(speaker.events.values_list("slug", flat=True))
+        with (
+            mock.patch("program.schedule_snapshot.publish_schedule_patch") as publish,
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            speaker.events.clear()
+        publish.assert_called_once()
+        _, patch = publish.call_args.args
+        assert {change["value"] for change in patch["changes"]} == slugs
+        assert all(speaker.slug not in change["object"]["speaker_slugs"] for change in patch["changes"])
+
+
+class TestAutoScheduleWorker(BornhackTestBase):
+    """Test claiming AutoScheduleJobs in the autoschedule worker."""
+
+    def test_claim_stale_running_job(self) -> None:
+        """A job left running by a crashed worker is claimed again, a job still running is not."""
+        now = timezone.now()
+        stale = AutoScheduleJob.objects.create(
+            camp=self.camp,
+            schedule="new",
+            status=AutoScheduleJob.STATUS_RUNNING,
+            started=now - timedelta(seconds=settings.AUTOSCHEDULE_JOB_TIMEOUT + 60),
+        )
+        AutoScheduleJob.objects.create(
+            camp=self.camp,
+            schedule="new",
+            status=AutoScheduleJob.STATUS_RUNNING,
+            started=now,
+        )
+        crashed = AutoScheduleJob.objects.get(pk=stale.pk)
+
+        job = claim_job()
+
+        assert job.pk == stale.pk
+        assert job.status == AutoScheduleJob.STATUS_RUNNING
+        assert job.started > crashed.started
+        assert claim_job() is None
+        # the crashed worker can not overwrite the job after it was claimed again
+        assert not save_job(crashed, status=AutoScheduleJob.STATUS_FAILED)
+        assert save_job(job, status=AutoScheduleJob.STATUS_FINISHED)
+
+
+class TestAutoSlotIndex:
+    """Test the interval index used by the AutoScheduler constraint builder."""
+
+    def setup_method(self) -> None:
+        """Create some autoslots, deliberately not sorted by start time."""
+        start = datetime(2025, 7, 20, 10, 0, tzinfo=UTC)
+        self.autoslots = [
+            resources.Slot(venue=1, starts_at=start + timedelta(hours=2), duration=60, capacity=10, session=1),
+            resources.Slot(venue=1, starts_at=start, duration=60, capacity=10, session=1),
+            resources.Slot(venue=2, starts_at=start, duration=360, capacity=10, session=2),
+            resources.Slot(venue=1, starts_at=start + timedelta(hours=1), duration=60, capacity=10, session=1),
+        ]
+        self.index = AutoSlotIndex(self.autoslots)
+        self.start = start
+
+    def test_overlapping(self):
+        """Slots overlapping a period are found, including long slots starting earlier."""
+        result = self.index.overlapping(self.start + timedelta(hours=1, minutes=30), self.start + timedelta(hours=2))
+        assert sorted(result) == [2, 3]
+
+    def test_overlapping_adjacent_is_not_overlap(self):
+        """A slot ending when the period starts does not overlap it."""
+        result = self.index.overlapping(self.start + timedelta(hours=6), self.start + timedelta(hours=7))
+        assert result == []
+
+    def test_contained_in(self):
+        """Only slots starting and ending within the period are returned."""
+        result = self.index.contained_in(self.start, self.start + timedelta(hours=2))
+        assert sorted(result) == [1, 3]
+
+
+class TestAutoSchedulerSnapshotSerialisation:
+    """Test serialisation of the AutoScheduler problem for snapshots."""
+
+    def test_roundtrip(self):
+        """Autoslots, autoevents and unavailability survive a roundtrip through JSON."""
+        start = datetime(2025, 7, 20, 10, 0, tzinfo=UTC)
+        autoslots = [
+            resources.Slot(venue=1, starts_at=start, duration=60, capacity=10, session=1),
+            resources.Slot(venue=1, starts_at=start + timedelta(hours=1), duration=60, capacity=10, session=1),
+        ]
+        autoevents = [
+            resources.Event(name=1, duration=60, demand=5, tags=["foo"]),
+            resources.Event(name=2, duration=60, demand=0),
+        ]
+        autoevents[0].add_unavailability(autoslots[1], autoevents[1])
+
+        data = json.loads(
+            json.dumps(
+                {
+                    "autoslots": serialise_autoslots(autoslots),
+                    "autoevents": serialise_autoevents(autoevents),
+                    "constraints": serialise_unavailability(autoevents, autoslots),
+                },
+            ),
+        )
+        new_autoslots = deserialise_autoslots(data["autoslots"])
+        new_autoevents = deserialise_autoevents(data["autoevents"])
+        add_serialised_unavailability(new_autoevents, new_autoslots, data["constraints"])
+
+        assert new_autoslots == autoslots
+        assert new_autoevents == autoevents
+
+
+class TestGetSubproblems:
+    """Test splitting the AutoScheduler problem into independent sub-problems."""
+
+    def setup_method(self) -> None:
+        """Create talk slots (session 1) and workshop slots (session 2), and an autoevent for each."""
+        start = datetime(2025, 7, 20, 10, 0, tzinfo=UTC)
+        self.autoslots = [
+            resources.Slot(venue=1, starts_at=start, duration=60, capacity=10, session=1),
+            resources.Slot(venue=2, starts_at=start, duration=120, capacity=10, session=2),
+            resources.Slot(venue=1, starts_at=start + timedelta(hours=1), duration=60, capacity=10, session=1),
+        ]
+        self.talk = resources.Event(name=1, duration=60, demand=0, unavailability=[self.autoslots[1]])
+        self.workshop = resources.Event(
+            name=2,
+            duration=120,
+            demand=0,
+            unavailability=[self.autoslots[0], self.autoslots[2]],
+        )
+
+    def test_independent_event_types(self):
+        """Events which can never share a slot are in separate sub-problems."""
+        subproblems = get_subproblems([self.talk, self.workshop], self.autoslots)
+        assert sorted(subproblems) == [([0], [0, 2]), ([1], [1])]
+
+    def test_speaker_conflict_joins_subproblems(self):
+        """A speaker conflict between the events puts them in the same sub-problem."""
+        self.talk.add_unavailability(self.workshop)
+        subproblems = get_subproblems([self.talk, self.workshop], self.autoslots)
+        assert subproblems == [([0, 1], [0, 1, 2])]
+
+    def test_shared_tag_joins_subproblems(self):
+        """Events sharing a tag can not be scheduled at the same time, so they are in the same sub-problem."""
+        self.talk.add_tags("crypto")
+        self.workshop.add_tags("crypto")
+        subproblems = get_subproblems([self.talk, self.workshop], self.autoslots)
+        assert subproblems == [([0, 1], [0, 1, 2])]
+
+
+class TestMergedPeriods:
+    """Test the merged busy periods used by EventSlotAvailability."""
+
+    def test_merge_and_overlap(self):
+        """Overlapping and adjacent periods are merged, and "[)" bounds are respected."""
+        start = datetime(2025, 7, 20, 10, 0, tzinfo=UTC)
+        hour = timedelta(hours=1)
+        merged = merge_periods(
+            [
+                (start + 4 * hour, start + 5 * hour),
+                (start, start + hour),
+                (start + hour, start + 2 * hour),
+                (start + 90 * timedelta(minutes=1), start + 3 * hour),
+            ],
+        )
+        assert merged == ([start, start + 4 * hour], [start + 3 * hour, start + 5 * hour])
+        assert periods_overlap(merged, start + 2 * hour, start + 4 * hour)
+        assert not periods_overlap(merged, start + 3 * hour, start + 4 * hour)
+        assert not periods_overlap(merged, start - hour, start)
+        assert not periods_overlap(merged, start + 5 * hour, start + 6 * hour)
+        assert not periods_overlap(([], []), start, start + hour)
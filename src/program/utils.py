@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import datetime
 import logging
+from bisect import bisect_right
+from collections import Counter
 from collections import OrderedDict
+from collections import defaultdict
 from datetime import timedelta
 
 from django.apps import apps
@@ -306,3 +309,109 @@ def get_tzrange_days(tzranges):
     days = list(days)
     days.sort()
     return days
+
+
+def merge_periods(periods):
+    """Merge a list of (lower, upper) periods into sorted non-overlapping periods.
+
+    Returns a tuple of a list of lower bounds and a list of upper bounds, both sorted,
+    which is what periods_overlap() needs to do a binary search.
+    """
+    lowers = []
+    uppers = []
+    for lower, upper in sorted(periods):
+        if uppers and lower <= uppers[-1]:
+            # this period overlaps or touches the previous one, extend it
+            uppers[-1] = max(uppers[-1], upper)
+        else:
+            lowers.append(lower)
+            uppers.append(upper)
+    return lowers, uppers
+
+
+def periods_overlap(merged_periods, lower, upper) -> bool:
+    """Return True if the "[)" period from lower to upper overlaps any of the merged_periods."""
+    lowers, uppers = merged_periods
+    # the first merged period ending after our period starts
+    index = bisect_right(uppers, lower)
+    return index < len(lowers) and lowers[index] < upper
+
+
+class EventSlotAvailability:
+    """Camp-wide EventSlot availability.
+
+    An EventSlot is available if nothing is scheduled in it, and nothing is scheduled
+    at the same time in the same or a conflicting EventLocation.
+
+    All EventSlots for the camp and the EventLocation conflicts are loaded in two queries.
+    The busy EventSlots are merged into sorted non-overlapping periods per location, and
+    each EventSlot is checked against the periods for its location and the conflicting
+    locations with a binary search. The result is cached per count_autoscheduled_as_free
+    value, so one instance can answer for all EventSessions in the camp.
+    """
+
+    def __init__(self, camp) -> None:
+        """Load the EventSlots and EventLocation conflicts for the camp."""
+        EventLocation = apps.get_model("program", "EventLocation")
+        self.event_slots = list(
+            camp.event_slots.select_related("event_session__event_location").order_by("when"),
+        )
+
+        # the number of EventSlots per EventSession
+        self.session_slot_counts = Counter(slot.event_session_id for slot in self.event_slots)
+
+        # the ids of the location itself and the conflicting locations, per location
+        self.location_groups = defaultdict(set)
+        for slot in self.event_slots:
+            location_id = slot.event_session.event_location_id
+            self.location_groups[location_id].add(location_id)
+        for from_id, to_id in EventLocation.conflicts.through.objects.filter(
+            from_eventlocation__camp=camp,
+        ).values_list("from_eventlocation_id", "to_eventlocation_id"):
+            self.location_groups[from_id].add(to_id)
+
+        self._available = {}
+
+    def get_available_slots_by_session(self, count_autoscheduled_as_free=False):
+        """Return a dict with a list of available EventSlots per EventSession id."""
+        if count_autoscheduled_as_free in self._available:
+            return self._available[count_autoscheduled_as_free]
+
+        # get the periods where something is scheduled, per location
+        busy = defaultdict(list)
+        for slot in self.event_slots:
+            if count_autoscheduled_as_free:
+                # a slot is busy if something is manually scheduled
+                slot_busy = slot.autoscheduled is False
+            else:
+                # a slot is busy if something is scheduled
+                slot_busy = slot.event_id is not None
+            if slot_busy:
+                busy[slot.event_session.event_location_id].append((slot.when.lower, slot.when.upper))
+
+        merged = {}
+        available = defaultdict(list)
+        for slot in self.event_slots:
+            if slot.event_id is not None and not (count_autoscheduled_as_free and slot.autoscheduled):
+                # something is scheduled in this slot
+                continue
+            location_id = slot.event_session.event_location_id
+            if location_id not in merged:
+                # merge the busy periods for this location and the conflicting locations
+                merged[location_id] = merge_periods(
+                    period for group_id in self.location_groups[location_id] for period in busy[group_id]
+                )
+            if not periods_overlap(merged[location_id], slot.when.lower, slot.when.upper):
+                available[slot.event_session_id].append(slot)
+
+        self._available[count_autoscheduled_as_free] = available
+        return available
+
+    def get_available_slots(self, event_session, count_autoscheduled_as_free=False):
+        """Return a list of available EventSlots in the EventSession, ordered by time."""
+        return self.get_available_slots_by_session(count_autoscheduled_as_free)[event_session.id]
+
+    def get_unavailable_slot_count(self, event_session, count_autoscheduled_as_free=False):
+        """Return the number of EventSlots in the EventSession which are not available."""
+        available = self.get_available_slots(event_session, count_autoscheduled_as_free)
+        return self.session_slot_counts[event_session.id] - len(available)
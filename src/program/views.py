@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import logging
 from collections import OrderedDict
+from collections import defaultdict
+from pathlib import Path
 
 import icalendar
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseServerError
@@ -16,7 +23,10 @@ from django.template import Context
 from django.template import Engine
 from django.urls import reverse
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.cache import quote_etag
 from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.views.generic import DetailView
 from django.views.generic import ListView
 from django.views.generic import TemplateView
@@ -49,6 +59,7 @@ from .mixins import EventFeedbackViewMixin
 from .mixins import EventViewMixin
 from .mixins import UrlViewMixin
 from .multiform import MultiModelForm
+from .schedule_snapshot import get_schedule_version
 from .utils import get_speaker_availability_form_matrix
 from .utils import save_speaker_availability
 
@@ -60,7 +71,41 @@ logger = logging.getLogger(f"bornhack.{__name__}")
 
 
 class ICSView(CampViewMixin, View):
+    """Return the schedule as an iCalendar feed, optionally filtered by type, location and video.
+
+    The VEVENT for each EventSlot is cached by uuid and schedule version, so the feed
+    for any combination of filters is put together by concatenating cached fragments.
+    The ETag and Last-Modified headers let polling calendar clients get a 304, which
+    is answered from the schedule version and the cache without querying the EventSlots.
+    """
+
     def get(self, request, *args, **kwargs):
+        # the feed only changes when the schedule version does, so the validators are
+        # based on the version and the filters, and Last-Modified is cached per version
+        version = get_schedule_version(self.camp.pk)
+        filters = ":".join(request.GET.get(key, "") for key in ("type", "location", "video"))
+        etag = quote_etag(hashlib.sha256(f"{version}:{filters}".encode()).hexdigest())
+        last_modified_key = f"ics-last-modified:{self.camp.pk}:{etag}"
+        last_modified = cache.get(last_modified_key)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            # the uuid changes when the event, location or start time of a slot changes,
+            # and the schedule version when anything else in the program changes
+            slots = {f"ics-vevent:{version}:{slot.uuid}": slot for slot in self.get_event_slots(request)}
+            updated = max((slot.event.updated for slot in slots.values()), default=None)
+            last_modified = int(updated.timestamp()) if updated else None
+            cache.set(last_modified_key, last_modified, settings.SCHEDULE_EXPORT_CACHE_TIMEOUT)
+            response = HttpResponse(self.get_ical(slots))
+            response["Content-Type"] = "text/calendar"
+            response["Content-Disposition"] = f"inline; filename={self.camp.slug}.ics"
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def get_event_slots(self, request):
+        """Return the scheduled EventSlots matching the type, location and video filters."""
         query_kwargs = {}
         # Type query
         type_query = request.GET.get("type", None)
@@ -74,7 +119,7 @@ class ICSView(CampViewMixin, View):
         location_query = request.GET.get("location", None)
         if location_query:
             location_slugs = location_query.split(",")
-            query_kwargs["location__in"] = models.EventLocation.objects.filter(
+            query_kwargs["event_session__event_location__in"] = models.EventLocation.objects.filter(
                 slug__in=location_slugs,
                 camp=self.camp,
             )
@@ -93,23 +138,34 @@ class ICSView(CampViewMixin, View):
             if "not-to-be-recorded" in video_states:
                 query_kwargs.pop("event__video_recording", None)
 
-        event_slots = models.EventSlot.objects.filter(
-            event__track__camp=self.camp,
-            **query_kwargs,
-        ).prefetch_related("event", "event_session__event_location")
+        return (
+            models.EventSlot.objects.filter(
+                event__track__camp=self.camp,
+                **query_kwargs,
+            )
+            .select_related("event__track__camp", "event_session__event_location")
+            .prefetch_related("event__speakers")
+        )
+
+    def get_ical(self, slots):
+        """Put the calendar together from cached VEVENT fragments, rendering the missing ones."""
+        fragments = cache.get_many(slots.keys())
+        domain = Site.objects.get_current().domain
+        missing = {
+            key: slot.get_ics_event(domain=domain).to_ical() for key, slot in slots.items() if key not in fragments
+        }
+        cache.set_many(missing, settings.SCHEDULE_EXPORT_CACHE_TIMEOUT)
+        fragments.update(missing)
 
         cal = icalendar.Calendar()
         cal.add("prodid", "-//BornHack Website iCal Generator//bornhack.dk//")
         cal.add("version", "2.0")
         cal.add("NAME", self.camp.title)
         cal.add("X-WR-CALNAME", self.camp.title)
-        for slot in event_slots:
-            cal.add_component(slot.get_ics_event())
-
-        response = HttpResponse(cal.to_ical())
-        response["Content-Type"] = "text/calendar"
-        response["Content-Disposition"] = f"inline; filename={self.camp.slug}.ics"
-        return response
+        # insert the events before the end of the calendar
+        footer = b"END:VCALENDAR\r\n"
+        header = cal.to_ical().removesuffix(footer)
+        return b"".join([header, *(fragments[key] for key in slots), footer])
 
 
 ###################################################################
@@ -985,43 +1041,79 @@ class CallForParticipationView(CampViewMixin, TemplateView):
     template_name = "call_for_participation.html"
 
 
+@functools.cache
+def get_frab_xml_schema():
+    """Parse and compile the Frab XSD once per process."""
+    return etree.XMLSchema(file=str(Path(__file__).resolve().parent / "xsd" / "schedule.xml.xsd"))
+
+
 class FrabXmlView(CampViewMixin, View):
     """This view returns an XML schedule in Frab format
     XSD is from https://raw.githubusercontent.com/wiki/frab/frab/images/schedule.xsd.
+
+    The XML is cached per camp and schedule version (bumped when the program changes),
+    and the ETag lets polling clients get a 304 when nothing changed.
     """
 
     def get(self, *args, **kwargs):
+        cache_key = f"frab-xml:{self.camp.pk}:{get_schedule_version(self.camp.pk)}:{self.request.get_host()}"
+        cached = cache.get(cache_key)
+        if cached is None:
+            xml = self.get_xml()
+            if xml is None:
+                return HttpResponseServerError()
+            cached = (xml, quote_etag(hashlib.sha256(xml).hexdigest()))
+            cache.set(cache_key, cached, settings.SCHEDULE_EXPORT_CACHE_TIMEOUT)
+        xml, etag = cached
+
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = HttpResponse(xml, content_type="application/xml")
+        response["ETag"] = etag
+        return response
+
+    def get_xml(self):
+        """Build and validate the XML, returns None if the XML is invalid."""
         # get all EventSlots with something scheduled
         qs = (
             models.EventSlot.objects.filter(event__track__camp=self.camp)
+            .select_related(
+                "event__track__camp",
+                "event__event_type",
+                "event_session__event_location",
+            )
             .prefetch_related(
-                "event__urls",
+                "event__urls__url_type",
                 "event__speakers",
-                "event_session__event_location",
             )
             .order_by("when", "event_session__event_location")
         )
+        camp_days = self.camp.get_days("camp")
+        days = camp_days[:-1]
+
+        # group the slots by day and location in one pass
+        locations = {}
+        day_slots = [defaultdict(list) for day in days]
+        for slot in qs:
+            location = slot.event_session.event_location
+            locations[location.id] = location
+            for index, day in enumerate(days):
+                if day.lower <= slot.when.lower and slot.when.upper <= day.upper:
+                    day_slots[index][location.id].append(slot)
+                    break
+        locations = [locations[location_id] for location_id in sorted(locations)]
+
         E = objectify.ElementMaker(annotate=False)
-        days = ()
-        i = 0
+        xmldays = ()
         # loop over days
-        for day in self.camp.get_days("camp")[:-1]:
-            i += 1
+        for i, day in enumerate(days, start=1):
             # build a tuple of locations
-            locations = ()
+            xmllocations = ()
             # loop over locations
-            for location in models.EventLocation.objects.filter(
-                id__in=qs.filter(event__isnull=False).values_list(
-                    "event_session__event_location_id",
-                    flat=True,
-                ),
-            ):
+            for location in locations:
                 # build a tuple of scheduled events at this location
                 instances = ()
-                for slot in qs.filter(
-                    when__contained_by=day,
-                    event_session__event_location=location,
-                ):
+                for slot in day_slots[i - 1][location.id]:
                     # build a tuple of speakers for this event
                     speakers = ()
                     for speaker in slot.event.speakers.all():
@@ -1069,12 +1161,12 @@ class FrabXmlView(CampViewMixin, View):
                         ),
                     )
                 # add the events for this location on this day to the locations tuple
-                locations += (E.room(*instances, name=location.name),)
+                xmllocations += (E.room(*instances, name=location.name),)
 
             # add this day to the days tuple
-            days += (
+            xmldays += (
                 E.day(
-                    *locations,
+                    *xmllocations,
                     index=str(i),
                     date=str(day.lower.date()),
                     start=day.lower.isoformat(),
@@ -1090,26 +1182,23 @@ class FrabXmlView(CampViewMixin, View):
                 E.acronym(str(self.camp.year)),
                 E.start(self.camp.camp.lower.date().isoformat()),
                 E.end(self.camp.camp.upper.date().isoformat()),
-                E.days(len(self.camp.get_days("camp"))),
+                E.days(len(camp_days)),
                 E.timeslot_duration("00:30"),
                 E.base_url(self.request.build_absolute_uri("/")),
             ),
-            *days,
+            *xmldays,
         )
         xml = etree.tostring(xml, pretty_print=True, xml_declaration=True)
 
         # let's play nice - validate the XML before returning it
-        schema = etree.XMLSchema(file="program/xsd/schedule.xml.xsd")
-        parser = objectify.makeparser(schema=schema)
+        parser = objectify.makeparser(schema=get_frab_xml_schema())
         try:
             objectify.fromstring(xml, parser)
         except etree.XMLSyntaxError:
             # we are generating invalid XML
             logger.exception("Something went sideways when validating frab xml :(")
-            return HttpResponseServerError()
-        response = HttpResponse(content_type="application/xml")
-        response.write(xml)
-        return response
+            return None
+        return xml
 
 
 ###################################################################
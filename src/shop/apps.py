@@ -3,9 +3,18 @@ from __future__ import annotations
 import logging
 
 from django.apps import AppConfig
+from django.db.models.signals import pre_delete
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
 class ShopConfig(AppConfig):
     name = "shop"
+
+    def ready(self) -> None:
+        from .signal_handlers import opr_pre_delete
+        from .signal_handlers import rpr_pre_delete
+
+        # keep Product.stock_reserved correct when OPRs and RPRs are deleted, also by queryset deletes
+        pre_delete.connect(opr_pre_delete, sender="shop.OrderProductRelation", dispatch_uid="opr_pre_delete_signal")
+        pre_delete.connect(rpr_pre_delete, sender="shop.RefundProductRelation", dispatch_uid="rpr_pre_delete_signal")
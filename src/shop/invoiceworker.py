@@ -1,10 +1,18 @@
 from __future__ import annotations
 
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from time import sleep
+from typing import TYPE_CHECKING
 
 from django.conf import settings
 from django.core.files import File
+from django.db import connections
+from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 
 from shop.email import add_creditnote_email
 from shop.email import add_invoice_email
@@ -15,40 +23,188 @@ from shop.models import Order
 from shop.models import Refund
 from utils.pdf import generate_pdf_letter
 
+if TYPE_CHECKING:
+    import io
+    from collections.abc import Callable
+
+    from django.db.models import Model
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(f"bornhack.{__name__}")
 
+# how many times to try generating a PDF file before giving up until the next do_work()
+PDF_ATTEMPTS = 3
+
+# the number of seconds to wait before retrying, multiplied by the attempt number
+PDF_RETRY_DELAY = 5
+
+# a process which crashed while generating a PDF file keeps its claim this long
+PDF_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+# how long to wait before trying again after giving up generating a PDF file
+PDF_FAILURE_BACKOFF = timedelta(hours=1)
+
+
+def get_bank_formatdict() -> dict:
+    """Return the bank account details used in the proforma invoice and invoice templates."""
+    return {
+        "bank": settings.BANKACCOUNT_BANK,
+        "bank_iban": settings.BANKACCOUNT_IBAN,
+        "bank_bic": settings.BANKACCOUNT_SWIFTBIC,
+        "bank_dk_reg": settings.BANKACCOUNT_REG,
+        "bank_dk_accno": settings.BANKACCOUNT_ACCOUNT,
+    }
+
+
+def get_proforma_pdf_kwargs(order: Order) -> dict:
+    """Return the generate_pdf_letter() arguments for the proforma invoice of an order."""
+    return {
+        "filename": order.filename,
+        "template": "pdf/proforma_invoice.html",
+        "formatdict": {
+            "hostname": settings.ALLOWED_HOSTS[0],
+            "order": order,
+            **get_bank_formatdict(),
+        },
+    }
+
+
+def get_invoice_pdf_kwargs(invoice: Invoice) -> dict:
+    """Return the generate_pdf_letter() arguments for an invoice."""
+    return {
+        "filename": invoice.filename,
+        "template": "pdf/custominvoice.html" if invoice.customorder else "pdf/invoice.html",
+        "formatdict": {"invoice": invoice, **get_bank_formatdict()},
+    }
+
+
+def get_creditnote_pdf_kwargs(creditnote: CreditNote) -> dict:
+    """Return the generate_pdf_letter() arguments for a creditnote."""
+    return {
+        "filename": creditnote.filename,
+        "template": "pdf/creditnote.html",
+        "formatdict": {"creditnote": creditnote},
+    }
+
+
+# the models which need PDF files, the filter for objects which need one,
+# and the function returning the generate_pdf_letter() arguments for an object
+PDF_DOCUMENTS = [
+    (Order, {"open__isnull": True}, get_proforma_pdf_kwargs),
+    (Invoice, {}, get_invoice_pdf_kwargs),
+    (CreditNote, {}, get_creditnote_pdf_kwargs),
+]
+
+
+def render_pdf(document: Model, get_pdf_kwargs: Callable[[Model], dict]) -> io.BytesIO | None:
+    """Generate the PDF file for a document, trying up to PDF_ATTEMPTS times. Returns None on failure."""
+    for attempt in range(1, PDF_ATTEMPTS + 1):
+        try:
+            return generate_pdf_letter(**get_pdf_kwargs(document))
+        except Exception:
+            logger.exception(
+                f"Unable to generate PDF file for {document._meta.model_name} #{document.pk} "
+                f"(attempt {attempt} of {PDF_ATTEMPTS})",
+            )
+            if attempt < PDF_ATTEMPTS:
+                sleep(PDF_RETRY_DELAY * attempt)
+    return None
+
+
+def claim_document(model: type[Model], filters: dict) -> Model | None:
+    """Claim one object without a PDF file by setting pdf_claimed, or return None.
+
+    The row is only locked while claiming, locked rows are skipped, and so are objects
+    claimed by another process within PDF_CLAIM_TIMEOUT, so any number of processes can
+    do this at once without generating the same PDF twice. Objects where generating the
+    PDF failed within PDF_FAILURE_BACKOFF are skipped too.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        document = (
+            model.objects.select_for_update(skip_locked=True)
+            .filter(Q(pdf="") | Q(pdf__isnull=True), **filters)
+            .filter(Q(pdf_claimed__isnull=True) | Q(pdf_claimed__lt=now - PDF_CLAIM_TIMEOUT))
+            .filter(Q(pdf_failed__isnull=True) | Q(pdf_failed__lt=now - PDF_FAILURE_BACKOFF))
+            .order_by("pk")
+            .first()
+        )
+        if document is None:
+            return None
+        model.objects.filter(pk=document.pk).update(pdf_claimed=now)
+    document.pdf_claimed = now
+    return document
+
+
+def generate_next_pdf(model: type[Model], filters: dict, get_pdf_kwargs: Callable[[Model], dict]) -> bool:
+    """Claim one object without a PDF file and generate the file for it.
+
+    Returns False when there are no more objects to claim.
+
+    The PDF is rendered without holding any locks. Only the pdf fields are updated
+    afterwards, and only if the claim is still ours, so changes saved to the object
+    in the meantime are kept.
+    """
+    document = claim_document(model, filters)
+    if document is None:
+        return False
+    pdffile = render_pdf(document, get_pdf_kwargs)
+    if pdffile is None:
+        model.objects.filter(pk=document.pk, pdf_claimed=document.pdf_claimed).update(
+            pdf_claimed=None,
+            pdf_failed=timezone.now(),
+        )
+        return True
+    # save the file and update the object with it
+    document.pdf.save(str(document.filename), File(pdffile), save=False)
+    if not model.objects.filter(pk=document.pk, pdf_claimed=document.pdf_claimed).update(
+        pdf=document.pdf.name,
+        pdf_claimed=None,
+        pdf_failed=None,
+    ):
+        logger.warning(f"Not saving pdf for {document._meta.model_name} {document}, it was claimed again")
+        return True
+    logger.info(f"Generated pdf for {document._meta.model_name} {document}")
+    return True
+
+
+def run_pdf_stage() -> None:
+    """Generate PDF files until no unclaimed objects without one are left."""
+    for model, filters, get_pdf_kwargs in PDF_DOCUMENTS:
+        while generate_next_pdf(model, filters, get_pdf_kwargs):
+            pass
+
+
+def generate_pdfs() -> None:
+    """Generate missing PDF files for proforma invoices, invoices and creditnotes.
+
+    This uses INVOICEWORKER_PDF_PROCESSES processes.
+    """
+    processes = settings.INVOICEWORKER_PDF_PROCESSES
+    if processes <= 1:
+        run_pdf_stage()
+        return
+    # close the database connections so each forked process opens its own
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("fork"),
+    ) as executor:
+        futures = [executor.submit(run_pdf_stage) for _ in range(processes)]
+        for future in futures:
+            future.result()
+
 
 def do_work() -> None:
-    """The invoice worker creates Invoice objects for shop orders and
+    """Create invoices and creditnotes, generate their PDF files and email them.
+
+    The invoice worker creates Invoice objects for shop orders and
     for custom orders. It also generates PDF files for Invoice objects
     that have no PDF. It also emails invoices for shop orders.
     It also generates proforma invoices for all closed orders.
-    """
-    # check if we need to generate any proforma invoices for shop orders
-    for order in Order.objects.filter(
-        Q(pdf="") | Q(pdf__isnull=True),
-        open__isnull=True,
-    ):
-        # generate proforma invoice for this Order
-        pdffile = generate_pdf_letter(
-            filename=order.filename,
-            template="pdf/proforma_invoice.html",
-            formatdict={
-                "hostname": settings.ALLOWED_HOSTS[0],
-                "order": order,
-                "bank": settings.BANKACCOUNT_BANK,
-                "bank_iban": settings.BANKACCOUNT_IBAN,
-                "bank_bic": settings.BANKACCOUNT_SWIFTBIC,
-                "bank_dk_reg": settings.BANKACCOUNT_REG,
-                "bank_dk_accno": settings.BANKACCOUNT_ACCOUNT,
-            },
-        )
-        # update order object with the file
-        order.pdf.save(str(order.filename), File(pdffile))
-        order.save()
-        logger.info(f"Generated proforma invoice PDF for order {order}")
 
+    PDF files are generated by generate_pdfs() which can use a pool of processes.
+    """
     # check if we need to generate any invoices for shop orders
     for order in Order.objects.filter(paid=True, invoice__isnull=True):
         # generate invoice for this Order
@@ -73,33 +229,8 @@ def do_work() -> None:
         )
         logger.info(f"Generated CreditNote object for {refund}")
 
-    # check if we need to generate any pdf invoices
-    for invoice in Invoice.objects.filter(Q(pdf="") | Q(pdf__isnull=True)):
-        # generate the pdf
-        try:
-            template = "pdf/custominvoice.html" if invoice.customorder else "pdf/invoice.html"
-            pdffile = generate_pdf_letter(
-                filename=invoice.filename,
-                template=template,
-                formatdict={
-                    "invoice": invoice,
-                    "bank": settings.BANKACCOUNT_BANK,
-                    "bank_iban": settings.BANKACCOUNT_IBAN,
-                    "bank_bic": settings.BANKACCOUNT_SWIFTBIC,
-                    "bank_dk_reg": settings.BANKACCOUNT_REG,
-                    "bank_dk_accno": settings.BANKACCOUNT_ACCOUNT,
-                },
-            )
-            logger.info(f"Generated pdf for invoice {invoice}")
-        except Exception as E:
-            logger.exception(
-                f"Unable to generate PDF file for invoice #{invoice.pk}. Error: {E}",
-            )
-            continue
-
-        # update invoice object with the file
-        invoice.pdf.save(str(invoice.filename), File(pdffile))
-        invoice.save()
+    # generate pdf files for proforma invoices, invoices and creditnotes
+    generate_pdfs()
 
     # check if we need to send out any invoices (only for shop orders, and only where pdf has been generated)
     for invoice in Invoice.objects.filter(
@@ -119,26 +250,6 @@ def do_work() -> None:
                 f"Unable to add email for invoice {invoice.pk} to {invoice.order.user.email}",
             )
 
-    # check if we need to generate any pdf creditnotes?
-    for creditnote in CreditNote.objects.filter(Q(pdf="") | Q(pdf__isnull=True)):
-        # generate the pdf
-        try:
-            pdffile = generate_pdf_letter(
-                filename=creditnote.filename,
-                template="pdf/creditnote.html",
-                formatdict={"creditnote": creditnote},
-            )
-            logger.info(f"Generated pdf for creditnote {creditnote}")
-        except Exception as E:
-            logger.exception(
-                f"Unable to generate PDF file for creditnote #{creditnote.pk}. Error: {E}",
-            )
-            continue
-
-        # update creditnote object with the file
-        creditnote.pdf.save(creditnote.filename, File(pdffile))
-        creditnote.save()
-
     # check if we need to send out any creditnotes (only where pdf has been generated and only for creditnotes linked to a user)
     for creditnote in CreditNote.objects.filter(sent_to_customer=False).exclude(pdf="").exclude(user=None):
         # send the email
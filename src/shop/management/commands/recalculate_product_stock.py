@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import logging
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.models import Product
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+class Command(BaseCommand):
+    args = "none"
+    help = (
+        "Recalculate stock_reserved for all products from the closed orders. Only needed if "
+        "orders, OPRs or RPRs were changed with queryset update() or delete(), which bypass the counter."
+    )
+
+    def output(self, message) -> None:
+        self.stdout.write(
+            "{}: {}".format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"), message),
+        )
+
+    def handle(self, *args, **options) -> None:
+        changed = Product.objects.recalculate_stock_reserved()
+        self.output(self.style.SUCCESS(f"Fixed stock_reserved for {changed} products"))
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+from django.db.models import Case
 from django.db.models import Exists
+from django.db.models import F
+from django.db.models import IntegerField
 from django.db.models import OuterRef
 from django.db.models import QuerySet
+from django.db.models import Sum
+from django.db.models import Value
+from django.db.models import When
 from django.utils import timezone
 
 
@@ -20,6 +26,39 @@ class ProductQuerySet(QuerySet):
             has_subproducts=Exists(subproducts),
         )
 
+    def with_stock_reserved(self):
+        """Annotate the current stock_reserved so left_in_stock does not need a query per product."""
+        return self.annotate(annotated_stock_reserved=F("stock_reserved"))
+
+    def adjust_stock_reserved(self, deltas) -> None:
+        """Add the quantities in deltas, a dict of product pk to quantity, to stock_reserved in one UPDATE.
+
+        The update is done with F() expressions in the database, so concurrent adjustments do not overwrite each other.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        self.filter(pk__in=deltas).update(
+            stock_reserved=F("stock_reserved")
+            + Case(*[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()], default=Value(0)),
+        )
+
+    def recalculate_stock_reserved(self) -> int:
+        """Recalculate stock_reserved from the OPRs and RPRs of closed orders. Returns the number of changed products."""
+        from .models import OrderProductRelation
+        from .models import get_reserved_quantities
+
+        reserved = get_reserved_quantities(
+            OrderProductRelation.objects.filter(order__open=None, order__cancelled=False),
+        )
+        changed = []
+        for product in self.only("pk", "stock_reserved"):
+            if product.stock_reserved != reserved.get(product.pk, 0):
+                product.stock_reserved = reserved.get(product.pk, 0)
+                changed.append(product)
+        self.model.objects.bulk_update(changed, ["stock_reserved"])
+        return len(changed)
+
 
 class OrderQuerySet(QuerySet):
     def not_cancelled(self):
@@ -36,3 +75,20 @@ class OrderQuerySet(QuerySet):
 
     def cancelled(self):
         return self.filter(cancelled=True)
+
+    def with_total(self):
+        """Annotate annotated_total, the same as Order.total but without a query for each order."""
+        return self.annotate(
+            annotated_total=Sum(F("oprs__product__price") * F("oprs__quantity"), output_field=IntegerField()),
+        )
+
+
+class InvoiceQuerySet(QuerySet):
+    def with_order_total(self):
+        """Select the shop or custom order and annotate annotated_order_total, the total of the shop order."""
+        return self.select_related("order", "customorder").annotate(
+            annotated_order_total=Sum(
+                F("order__oprs__product__price") * F("order__oprs__quantity"),
+                output_field=IntegerField(),
+            ),
+        )
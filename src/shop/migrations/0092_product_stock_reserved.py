@@ -0,0 +1,41 @@
+# Generated by Django 5.2.16 on 2026-10-17 10:12
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.db import migrations
+from django.db import models
+
+
+def calculate_stock_reserved(apps, schema_editor) -> None:
+    Product = apps.get_model("shop", "Product")
+    OrderProductRelation = apps.get_model("shop", "OrderProductRelation")
+    RefundProductRelation = apps.get_model("shop", "RefundProductRelation")
+    reserved = defaultdict(int)
+    oprs = OrderProductRelation.objects.filter(order__open=None, order__cancelled=False)
+    for product_id, quantity in oprs.values_list("product_id", "quantity"):
+        reserved[product_id] += quantity
+    rprs = RefundProductRelation.objects.filter(opr__in=oprs).values_list("opr__product_id", "quantity")
+    for product_id, quantity in rprs:
+        reserved[product_id] -= quantity
+    for product_id, quantity in reserved.items():
+        Product.objects.filter(pk=product_id).update(stock_reserved=quantity)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0091_alter_coinifyapicallback_options_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock_reserved",
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                help_text="The quantity reserved by closed orders which are not cancelled, minus refunds. Maintained automatically, run the recalculate_product_stock command to fix it if it drifts.",
+            ),
+        ),
+        migrations.RunPython(calculate_stock_reserved, migrations.RunPython.noop),
+    ]
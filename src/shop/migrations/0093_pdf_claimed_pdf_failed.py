@@ -0,0 +1,74 @@
+# Generated by Django 5.2.16 on 2026-10-17 18:40
+from __future__ import annotations
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("shop", "0092_product_stock_reserved"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="creditnote",
+            name="pdf_claimed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker started generating the PDF file of this credit note",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="creditnote",
+            name="pdf_failed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker last gave up generating the PDF file of this credit note",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="pdf_claimed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker started generating the PDF file of this invoice",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="invoice",
+            name="pdf_failed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker last gave up generating the PDF file of this invoice",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="pdf_claimed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker started generating the PDF file of this proforma invoice",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="pdf_failed",
+            field=models.DateTimeField(
+                blank=True,
+                editable=False,
+                help_text="When the invoiceworker last gave up generating the PDF file of this proforma invoice",
+                null=True,
+            ),
+        ),
+    ]
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import logging
 import uuid
+from collections import defaultdict
 from datetime import timedelta
 from decimal import Decimal
 from enum import Enum
@@ -33,6 +34,7 @@ from utils.models import CreatedUpdatedModel
 from utils.models import UUIDModel
 from utils.slugs import unique_slugify
 
+from .managers import InvoiceQuerySet
 from .managers import OrderQuerySet
 from .managers import ProductQuerySet
 
@@ -72,6 +74,32 @@ class CustomOrder(ExportModelOperationsMixin("custom_order"), CreatedUpdatedMode
         return 0
 
 
+def get_reserved_quantities(oprs) -> dict:
+    """Return a dict of product pk to the quantity reserved by the OPRs in the oprs queryset, minus refunds."""
+    reserved = defaultdict(int)
+    for product_id, quantity in oprs.values_list("product_id", "quantity"):
+        reserved[product_id] += quantity
+    rprs = RefundProductRelation.objects.filter(opr__in=oprs).values_list("opr__product_id", "quantity")
+    for product_id, quantity in rprs:
+        reserved[product_id] -= quantity
+    return reserved
+
+
+def order_reserves_stock(order_id) -> bool:
+    """Lock the order row and return True if the order reserves stock.
+
+    Saves and deletes which change the stock reservations of an order lock its row
+    first, so they are serialised with the order being closed or cancelled. The row
+    is locked whatever its state, and the state is checked after the lock is taken.
+    Deletes are handled in shop.signal_handlers, so queryset deletes are covered too.
+    """
+    state = Order.objects.select_for_update().filter(pk=order_id).values_list("open", "cancelled").first()
+    if state is None:
+        return False
+    is_open, cancelled = state
+    return is_open is None and not cancelled
+
+
 class Order(ExportModelOperationsMixin("order"), CreatedUpdatedModel):
     class Meta:
         unique_together = ("user", "open")
@@ -143,6 +171,20 @@ class Order(ExportModelOperationsMixin("order"), CreatedUpdatedModel):
 
     pdf = models.FileField(null=True, blank=True, upload_to="proforma_invoices/")
 
+    pdf_claimed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker started generating the PDF file of this proforma invoice",
+    )
+
+    pdf_failed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker last gave up generating the PDF file of this proforma invoice",
+    )
+
     objects = OrderQuerySet.as_manager()
 
     def __str__(self) -> str:
@@ -157,6 +199,9 @@ class Order(ExportModelOperationsMixin("order"), CreatedUpdatedModel):
 
     @property
     def total(self):
+        if hasattr(self, "annotated_total"):
+            # annotated by OrderQuerySet.with_total()
+            return Decimal(self.annotated_total) if self.annotated_total is not None else False
         if self.products.all():
             return Decimal(
                 self.products.aggregate(
@@ -190,6 +235,35 @@ class Order(ExportModelOperationsMixin("order"), CreatedUpdatedModel):
     def get_absolute_url(self):
         return str(reverse_lazy("shop:order_detail", kwargs={"pk": self.pk}))
 
+    @property
+    def reserves_stock(self) -> bool:
+        """Closed orders which are not cancelled reserve their products from stock.
+
+        This means that an order has either been paid (by card or blockchain)
+        or is marked to be paid with cash or bank transfer.
+        """
+        return self.open is None and not self.cancelled
+
+    def save(self, **kwargs) -> None:
+        """Update stock_reserved of the products on the order when it starts or stops reserving stock."""
+        with transaction.atomic():
+            was_reserving = not self._state.adding and order_reserves_stock(self.pk)
+            super().save(**kwargs)
+            if self.reserves_stock == was_reserving:
+                return
+            sign = 1 if self.reserves_stock else -1
+            reserved = get_reserved_quantities(self.oprs.all())
+            Product.objects.adjust_stock_reserved({pk: sign * quantity for pk, quantity in reserved.items()})
+
+    def get_sold_out_products(self) -> list:
+        """Lock the products on this order and return the ones without enough stock left for it.
+
+        Call this in the transaction which closes the order, so two orders can not get the last item.
+        """
+        reserved = get_reserved_quantities(self.oprs.all())
+        products = Product.objects.select_for_update().filter(pk__in=reserved, stock_amount__isnull=False)
+        return [product for product in products if product.stock_amount - product.stock_reserved < reserved[product.pk]]
+
     def create_tickets(self, request=None):
         """Calls create_tickets() on each OPR and returns a list of all created tickets."""
         tickets = []
@@ -409,6 +483,17 @@ class RefundProductRelation(CreatedUpdatedModel):
                 "The quantity of this RPR cannot be greater than the quantity in the OPR",
             )
 
+    def save(self, **kwargs) -> None:
+        """Refunded products are no longer reserved, so give them back to stock."""
+        with transaction.atomic():
+            reserving = order_reserves_stock(self.opr.order_id)
+            old_quantity = 0
+            if reserving and not self._state.adding:
+                old_quantity = RefundProductRelation.objects.get(pk=self.pk).quantity
+            super().save(**kwargs)
+            if reserving:
+                Product.objects.adjust_stock_reserved({self.opr.product_id: old_quantity - self.quantity})
+
 
 # ########## PRODUCTS ################################################
 
@@ -523,6 +608,12 @@ class Product(ExportModelOperationsMixin("product"), CreatedUpdatedModel, UUIDMo
         blank=True,
     )
 
+    stock_reserved = models.IntegerField(
+        default=0,
+        editable=False,
+        help_text="The quantity reserved by closed orders which are not cancelled, minus refunds. Maintained automatically, run the recalculate_product_stock command to fix it if it drifts.",
+    )
+
     cost = models.IntegerField(
         default=0,
         help_text="The cost for this product, including VAT. Used for profit calculations in the economy system.",
@@ -543,6 +634,17 @@ class Product(ExportModelOperationsMixin("product"), CreatedUpdatedModel, UUIDMo
         if self.category.name == "Tickets" and not self.ticket_type:
             raise ValidationError("Products with category Tickets need a ticket_type")
 
+    def save(self, **kwargs) -> None:
+        """Save the product without writing back a possibly outdated stock_reserved."""
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            skip = {"stock_reserved", *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skip
+            ]
+        super().save(**kwargs)
+
     def is_available(self):
         """Is the product available or not?
 
@@ -580,22 +682,14 @@ class Product(ExportModelOperationsMixin("product"), CreatedUpdatedModel, UUIDMo
 
     @property
     def left_in_stock(self):
-        if self.stock_amount is not None:
-            # All orders that are not open and not cancelled count towards what has
-            # been "reserved" from stock.
-            #
-            # This means that an order has either been paid (by card or blockchain)
-            # or is marked to be paid with cash or bank transfer, meaning it is a
-            # "reservation" of the product in question.
-            sold = OrderProductRelation.objects.filter(
-                product=self,
-                order__open=None,
-                order__cancelled=False,
-            ).aggregate(Sum("quantity"))["quantity__sum"]
-
-            return self.stock_amount - (sold or 0)
-
-        return None
+        if self.stock_amount is None:
+            return None
+        if hasattr(self, "annotated_stock_reserved"):
+            reserved = self.annotated_stock_reserved
+        else:
+            # stock_reserved on this instance might be outdated, get the current value
+            reserved = Product.objects.filter(pk=self.pk).values_list("stock_reserved", flat=True).first() or 0
+        return self.stock_amount - reserved
 
     @property
     def is_stock_available(self):
@@ -615,8 +709,9 @@ class Product(ExportModelOperationsMixin("product"), CreatedUpdatedModel, UUIDMo
                 "text": "Bundle",
             })
 
-        if self.left_in_stock is not None:
-            if self.left_in_stock < 1 or not self.is_time_available:
+        left_in_stock = self.left_in_stock
+        if left_in_stock is not None:
+            if left_in_stock < 1 or not self.is_time_available:
                 labels.insert(0, {
                     "type": "sold_out",
                     "text": "Sold out!",
@@ -625,10 +720,10 @@ class Product(ExportModelOperationsMixin("product"), CreatedUpdatedModel, UUIDMo
                 # Sold out is an exclusive state - no further labels apply
                 return labels
 
-            elif self.left_in_stock <= 10:
+            elif left_in_stock <= 10:
                 labels.append({
                     "type": "low_stock",
-                    "text": f"Only {self.left_in_stock} left!",
+                    "text": f"Only {left_in_stock} left!",
                 })
 
         if self.available_for_days is not None:
@@ -803,7 +898,7 @@ class OrderProductRelation(
                 return []
 
             query_kwargs["opr"] = self
-            # create the number of tickets required
+            # create the number of tickets required, the tokens are set by bulk_create()
             new_tickets = [ShopTicket(**query_kwargs) for _i in range(tickets_to_create)]
             self.shoptickets.bulk_create(new_tickets)
 
@@ -842,9 +937,9 @@ class OrderProductRelation(
                 if len(ticket_groups) < self.quantity:
                     # We want to create the difference between the quantity of the OPR and the number of ticket groups
                     difference = self.quantity - len(ticket_groups)
-                    for _i in range(difference):
-                        ticket_group = TicketGroup.objects.create(opr=self)
-                        ticket_groups.append(ticket_group)
+                    ticket_groups += TicketGroup.objects.bulk_create(
+                        [TicketGroup(opr=self) for _i in range(difference)],
+                    )
 
                 # For each bought product we create a ticket for each sub product
                 for ticket_group in ticket_groups:
@@ -856,6 +951,7 @@ class OrderProductRelation(
                             ticket_group=ticket_group,
                             request=request,
                         )
+                        tickets.extend(new_tickets)
             else:
                 # If there are no sub products, we just create a ticket for the product
                 new_tickets = self._create_tickets_helper(
@@ -863,17 +959,12 @@ class OrderProductRelation(
                     number_of_tickets=self.quantity,
                     request=request,
                 )
-
-            tickets.extend(new_tickets)
+                tickets.extend(new_tickets)
 
             # and mark the OPR as ticket_generated=True
             self.ticket_generated = timezone.now()
             self.save()
 
-            # At last save all tickets to persist the token to the database.
-            for ticket in tickets:
-                ticket.save()
-
             return tickets
 
     @property
@@ -926,10 +1017,25 @@ class OrderProductRelation(
         return self.quantity - self.refunded_quantity
 
     def save(self, **kwargs) -> None:
-        """Make sure we save the current price in the OPR."""
+        """Make sure we save the current price in the OPR, and update stock_reserved if the order reserves stock."""
         if not self.price:
             self.price = self.product.price
-        super().save(**kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not {"product", "quantity"} & set(update_fields):
+            super().save(**kwargs)
+            return
+        with transaction.atomic():
+            reserving = order_reserves_stock(self.order_id)
+            old = None
+            if reserving and not self._state.adding:
+                old = OrderProductRelation.objects.values_list("product_id", "quantity").get(pk=self.pk)
+            super().save(**kwargs)
+            if reserving:
+                deltas = defaultdict(int)
+                if old:
+                    deltas[old[0]] -= old[1]
+                deltas[self.product_id] += self.quantity
+                Product.objects.adjust_stock_reserved(deltas)
 
     def create_rpr(self, *, refund: Refund, quantity: int):
         return RefundProductRelation.objects.create(
@@ -988,6 +1094,20 @@ class CreditNote(ExportModelOperationsMixin("credit_note"), CreatedUpdatedModel)
 
     pdf = models.FileField(null=True, blank=True, upload_to="creditnotes/")
 
+    pdf_claimed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker started generating the PDF file of this credit note",
+    )
+
+    pdf_failed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker last gave up generating the PDF file of this credit note",
+    )
+
     user = models.ForeignKey(
         "auth.User",
         verbose_name=_("User"),
@@ -1076,8 +1196,22 @@ class Invoice(ExportModelOperationsMixin("invoice"), CreatedUpdatedModel):
         on_delete=models.PROTECT,
     )
     pdf = models.FileField(null=True, blank=True, upload_to="invoices/")
+    pdf_claimed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker started generating the PDF file of this invoice",
+    )
+    pdf_failed = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When the invoiceworker last gave up generating the PDF file of this invoice",
+    )
     sent_to_customer = models.BooleanField(default=False)
 
+    objects = InvoiceQuerySet.as_manager()
+
     def __str__(self) -> str:
         if self.order:
             return f"invoice#{self.id} - shop order {self.order.id} - {self.order.created} - total {self.order.total} DKK (sent to {self.order.user.email}: {self.sent_to_customer})"
@@ -1098,6 +1232,16 @@ class Invoice(ExportModelOperationsMixin("invoice"), CreatedUpdatedModel):
             return self.order
         return self.customorder
 
+    @property
+    def amount(self):
+        """Return the total of the shop order or the amount of the custom order."""
+        if not self.order:
+            return self.customorder.amount
+        if hasattr(self, "annotated_order_total"):
+            # annotated by InvoiceQuerySet.with_order_total()
+            return Decimal(self.annotated_order_total) if self.annotated_order_total is not None else False
+        return self.order.total
+
 
 # ########## COINIFY #################################################
 
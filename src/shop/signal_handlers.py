@@ -0,0 +1,28 @@
+"""Signal handlers for the shop application."""
+
+from __future__ import annotations
+
+import logging
+
+from .models import OrderProductRelation
+from .models import Product
+from .models import RefundProductRelation
+from .models import order_reserves_stock
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def opr_pre_delete(sender: type[OrderProductRelation], instance: OrderProductRelation, **_kwargs) -> None:
+    """Release the stock reserved by an OPR which is deleted.
+
+    This is a pre_delete signal rather than OrderProductRelation.delete(), so it
+    also runs for queryset deletes. Django runs it in the transaction of the delete.
+    """
+    if order_reserves_stock(instance.order_id):
+        Product.objects.adjust_stock_reserved({instance.product_id: -instance.quantity})
+
+
+def rpr_pre_delete(sender: type[RefundProductRelation], instance: RefundProductRelation, **_kwargs) -> None:
+    """Reserve the refunded products of an RPR which is deleted again."""
+    if order_reserves_stock(instance.opr.order_id):
+        Product.objects.adjust_stock_reserved({instance.opr.product_id: instance.quantity})
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from unittest import mock
+
 from django.contrib.auth.models import Permission
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
@@ -25,6 +27,11 @@ from .factories import OrderFactory
 from .factories import OrderProductRelationFactory
 from .factories import ProductFactory
 from .factories import SubProductRelationFactory
+from .invoiceworker import PDF_ATTEMPTS
+from .invoiceworker import PDF_CLAIM_TIMEOUT
+from .invoiceworker import claim_document
+from .invoiceworker import generate_next_pdf
+from .invoiceworker import render_pdf
 from .models import Order
 from .models import OrderProductRelation
 from .models import Product
@@ -59,6 +66,40 @@ class ProductAvailabilityTest(TestCase):
         self.assertTrue(product.is_stock_available)
         self.assertTrue(product.is_available())
 
+    def test_product_stock_reserved(self):
+        """Refunds give products back to stock, and saving a stale product keeps the counter."""
+        product = ProductFactory(stock_amount=5)
+        opr = OrderProductRelationFactory(product=product, quantity=3, order__open=None)
+        product.stock_amount = 4
+        product.save()
+        self.assertEqual(product.left_in_stock, 1)
+
+        refund = opr.order.create_refund(created_by=UserFactory())
+        opr.create_rpr(refund=refund, quantity=2)
+        annotated = Product.objects.with_stock_reserved().get(pk=product.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(annotated.left_in_stock, 3)
+
+        # moving the rest of the order back to open releases the stock
+        opr.order.open = True
+        opr.order.save()
+        self.assertEqual(product.left_in_stock, 4)
+        self.assertEqual(Product.objects.recalculate_stock_reserved(), 0)
+
+    def test_product_stock_reserved_queryset_delete(self):
+        """Deleting RPRs and OPRs with a queryset delete also updates stock_reserved."""
+        product = ProductFactory(stock_amount=5)
+        opr = OrderProductRelationFactory(product=product, quantity=3, order__open=None)
+        refund = opr.order.create_refund(created_by=UserFactory())
+        opr.create_rpr(refund=refund, quantity=1)
+        self.assertEqual(product.left_in_stock, 3)
+
+        opr.rprs.all().delete()
+        self.assertEqual(product.left_in_stock, 2)
+        opr.order.oprs.all().delete()
+        self.assertEqual(product.left_in_stock, 5)
+        self.assertEqual(Product.objects.recalculate_stock_reserved(), 0)
+
     def test_product_available_by_time(self):
         """The product is available if now is in the right timeframe."""
         product = ProductFactory()
@@ -647,6 +688,18 @@ class TestTicketCreation(TestCase):
 
 
 class TestOrderProductRelationModel(TestCase):
+    def test_create_tickets_sets_tokens(self):
+        """Tickets created with bulk_create() should get the same tokens as save() would set."""
+        ticket_type = TicketTypeFactory(single_ticket_per_product=False)
+        product = ProductFactory(ticket_type=ticket_type)
+        order = OrderFactory(user=UserFactory())
+        opr = OrderProductRelationFactory(order=order, product=product, quantity=3)
+        tickets = opr.create_tickets()
+        self.assertEqual(len(tickets), 3)
+        for ticket in ShopTicket.objects.filter(opr=opr):
+            self.assertEqual(ticket.token, ticket._get_token())
+            self.assertEqual(ticket.badge_token, ticket._get_badge_token())
+
     def test_refunded_cannot_be_larger_than_quantity(self):
         """OrderProductRelation with refunded > quantity should raise an IntegrityError."""
         user = UserFactory()
@@ -849,3 +902,52 @@ class TestRefund(TestCase):
                     form_data[f"ticket-group-{opr.id}-{index}-refund"] = "on"
 
         return form_data
+
+
+class InvoiceWorkerRenderPdfTest(TestCase):
+    """Test retries in the PDF stage of the invoiceworker."""
+
+    def setUp(self):
+        self.order = OrderFactory()
+
+    def test_render_pdf_retries(self):
+        """Make sure a failing render is retried and the file returned when it works."""
+        with (
+            mock.patch("shop.invoiceworker.sleep"),
+            mock.patch("shop.invoiceworker.generate_pdf_letter", side_effect=[Exception("boom"), "pdf"]) as generate,
+        ):
+            self.assertEqual(render_pdf(self.order, lambda order: {}), "pdf")
+        self.assertEqual(generate.call_count, 2)
+
+    def test_render_pdf_gives_up(self):
+        """Make sure render_pdf() returns None after PDF_ATTEMPTS failures."""
+        with (
+            mock.patch("shop.invoiceworker.sleep"),
+            mock.patch("shop.invoiceworker.generate_pdf_letter", side_effect=Exception("boom")) as generate,
+        ):
+            self.assertIsNone(render_pdf(self.order, lambda order: {}))
+        self.assertEqual(generate.call_count, PDF_ATTEMPTS)
+
+    def test_claim_document(self):
+        """Make sure a claimed document is skipped until the claim times out."""
+        filters = {"pk": self.order.pk}
+        self.assertEqual(claim_document(Order, filters), self.order)
+        self.assertIsNone(claim_document(Order, filters))
+
+        Order.objects.filter(pk=self.order.pk).update(
+            pdf_claimed=timezone.now() - PDF_CLAIM_TIMEOUT - timezone.timedelta(minutes=1),
+        )
+        self.assertEqual(claim_document(Order, filters), self.order)
+
+    def test_failure_is_persisted(self):
+        """Make sure a document is not claimed again right after giving up on it."""
+        filters = {"pk": self.order.pk}
+        with (
+            mock.patch("shop.invoiceworker.sleep"),
+            mock.patch("shop.invoiceworker.generate_pdf_letter", side_effect=Exception("boom")),
+        ):
+            self.assertTrue(generate_next_pdf(Order, filters, lambda order: {}))
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.pdf_claimed)
+        self.assertIsNotNone(self.order.pdf_failed)
+        self.assertFalse(generate_next_pdf(Order, filters, lambda order: {}))
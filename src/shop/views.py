@@ -9,6 +9,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Count
 from django.http import Http404
 from django.http import HttpResponse
@@ -156,6 +157,7 @@ class ShopIndexView(ListView):
             queryset.available()
             .select_related("category")
             .annotate_subproducts()
+            .with_stock_reserved()
             .order_by(
                 "category__weight",
                 "category__name",
@@ -198,7 +200,7 @@ class ProductDetailView(GetObjectMixin, FormView, DetailView):
     context_object_name = "product"
 
     def get_queryset(self):
-        return super().get_queryset().prefetch_related("sub_product_relations__sub_product")
+        return super().get_queryset().with_stock_reserved().prefetch_related("sub_product_relations__sub_product")
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -396,10 +398,20 @@ class OrderReviewAndPayView(
                 )
                 return self.render_to_response(self.get_context_data())
 
-            # Set payment method and mark the order as closed
-            order.payment_method = payment_method
-            order.open = None
-            order.save()
+            with transaction.atomic():
+                # lock the products so nobody else gets the last items while we close the order
+                sold_out = order.get_sold_out_products()
+                if sold_out:
+                    messages.error(
+                        request,
+                        f"Sorry, there is not enough left in stock of: {', '.join(p.name for p in sold_out)}",
+                    )
+                    return HttpResponseRedirect(reverse("shop:order_detail", kwargs={"pk": order.pk}))
+
+                # Set payment method and mark the order as closed
+                order.payment_method = payment_method
+                order.open = None
+                order.save()
 
             reverses = {
                 Order.PaymentMethods.CREDIT_CARD: reverse_lazy(
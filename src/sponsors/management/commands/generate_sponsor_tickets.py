@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
 
 from camps.models import Camp
@@ -32,40 +33,33 @@ class Command(BaseCommand):
             tickets_generated=False,
         )
 
+        # build all missing tickets first so they can be created in one query
+        tickets = []
         for sponsor in sponsors:
             # get week ticket count from Sponsor or fall back to tier
             week_tickets = sponsor.week_tickets if sponsor.week_tickets is not None else sponsor.tier.week_tickets
-            existing = SponsorTicket.objects.filter(
-                sponsor=sponsor,
-                ticket_type=week_ticket_type,
-            ).count()
-            missing = week_tickets - existing if week_tickets > existing else 0
-            self.output(
-                f"# Generating {missing} missing out of {week_tickets} total full week tickets for {sponsor}...",
-            )
-            for _ in range(missing):
-                ticket = SponsorTicket(sponsor=sponsor, ticket_type=week_ticket_type)
-                ticket.save()
-                ticket.generate_pdf()
-                self.output(
-                    f"- {ticket.shortname}_ticket_{ticket.pk}.pdf",
-                )
             # get oneday ticket count from Sponsor or fall back to tier
             oneday_tickets = sponsor.oneday_tickets if sponsor.oneday_tickets is not None else sponsor.tier.oneday_tickets
-            existing = SponsorTicket.objects.filter(
-                sponsor=sponsor,
-                ticket_type=day_ticket_type,
-            ).count()
-            missing = oneday_tickets - existing if oneday_tickets > existing else 0
-            self.output(
-                f"# Generating {missing} missing out of {oneday_tickets} total oneday tickets for {sponsor}...",
-            )
-            for _ in range(missing):
-                ticket = SponsorTicket(sponsor=sponsor, ticket_type=day_ticket_type)
-                ticket.save()
-                ticket.generate_pdf()
+            for ticket_type, total, description in [
+                (week_ticket_type, week_tickets, "full week"),
+                (day_ticket_type, oneday_tickets, "oneday"),
+            ]:
+                existing = SponsorTicket.objects.filter(
+                    sponsor=sponsor,
+                    ticket_type=ticket_type,
+                ).count()
+                missing = total - existing if total > existing else 0
                 self.output(
-                    f"- {ticket.shortname}_ticket_{ticket.pk}.pdf",
+                    f"# Generating {missing} missing out of {total} total {description} tickets for {sponsor}...",
                 )
-            sponsor.tickets_generated = True
-            sponsor.save()
+                tickets += [SponsorTicket(sponsor=sponsor, ticket_type=ticket_type) for _ in range(missing)]
+
+        with transaction.atomic():
+            SponsorTicket.objects.bulk_create(tickets)
+            Sponsor.objects.filter(pk__in=[sponsor.pk for sponsor in sponsors]).update(tickets_generated=True)
+
+        for ticket in tickets:
+            ticket.generate_pdf()
+            self.output(
+                f"- {ticket.shortname}_ticket_{ticket.pk}.pdf",
+            )
@@ -3,6 +3,7 @@ from __future__ import annotations
 import logging
 
 from django.apps import AppConfig
+from django.db.models.signals import post_delete
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
@@ -11,4 +12,9 @@ class TicketsConfig(AppConfig):
     name = "tickets"
 
     def ready(self) -> None:
-        pass
+        from .models import TICKET_MODELS
+        from .signal_handlers import ticket_deleted
+
+        # remember deleted tickets for ScanTicketsSyncView, also for queryset deletes
+        for model in TICKET_MODELS:
+            post_delete.connect(ticket_deleted, sender=model, dispatch_uid=f"{model.__name__}_deleted_signal")
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.16 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0030_alter_ticketgroup_options_alter_tickettype_options'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prizeticket',
+            name='badge_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='prizeticket',
+            name='token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='shopticket',
+            name='badge_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='shopticket',
+            name='token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='sponsorticket',
+            name='badge_token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='sponsorticket',
+            name='token',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.16 on 2026-10-17 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('economy', '0050_alter_accountingexport_options_alter_bank_options_and_more'),
+        ('tickets', '0031_ticket_token_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prizeticket',
+            name='badge_handed_out_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prizeticket',
+            name='badge_handed_out_pos',
+            field=models.ForeignKey(blank=True, help_text='The Pos where the badge for this ticket was handed out', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='economy.pos'),
+        ),
+        migrations.AddField(
+            model_name='shopticket',
+            name='badge_handed_out_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shopticket',
+            name='badge_handed_out_pos',
+            field=models.ForeignKey(blank=True, help_text='The Pos where the badge for this ticket was handed out', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='economy.pos'),
+        ),
+        migrations.AddField(
+            model_name='sponsorticket',
+            name='badge_handed_out_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sponsorticket',
+            name='badge_handed_out_pos',
+            field=models.ForeignKey(blank=True, help_text='The Pos where the badge for this ticket was handed out', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='economy.pos'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.16 on 2026-10-17 21:12
+
+import django.db.models.deletion
+import django_prometheus.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('camps', '0041_alter_camp_options'),
+        ('tickets', '0032_badge_handed_out_at_pos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedTicket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('token', models.CharField(max_length=64)),
+                ('badge_token', models.CharField(blank=True, max_length=64)),
+                ('camp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='camps.camp')),
+            ],
+            options={
+                'ordering': ['-created'],
+                'abstract': False,
+            },
+            bases=(django_prometheus.models.ExportModelOperationsMixin('deleted_ticket'), models.Model),
+        ),
+    ]
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-import base64
 import hashlib
-import io
 import logging
+import uuid
 from typing import Union
 
 import qrcode
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.db.models import Avg
 from django.db.models import Case
@@ -32,6 +32,7 @@ from utils.models import CampRelatedModel
 from utils.models import CreatedUpdatedModel
 from utils.models import UUIDModel
 from utils.pdf import generate_pdf_letter
+from utils.qr import qr_code_data_url
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
@@ -118,15 +119,20 @@ def create_ticket_token(string):
     return hashlib.sha256(string).hexdigest()
 
 
-def qr_code_base64(token):
-    qr = qrcode.make(
-        token,
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_H,
-    ).resize((250, 250))
-    file_like = io.BytesIO()
-    qr.save(file_like, format="png")
-    return base64.b64encode(file_like.getvalue())
+# the options used for QR codes on tickets
+TICKET_QR_CODE_OPTIONS = {
+    "size": 250,
+    "version": 1,
+    "error_correction": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+class TicketManager(models.Manager):
+    def bulk_create(self, objs, **kwargs):
+        """Set the tokens before inserting, since bulk_create() does not call save()."""
+        for ticket in objs:
+            ticket.set_tokens()
+        return super().bulk_create(objs, **kwargs)
 
 
 class BaseTicket(CampRelatedModel, UUIDModel):
@@ -150,8 +156,19 @@ class BaseTicket(CampRelatedModel, UUIDModel):
     )
 
     badge_handed_out = models.BooleanField(default=False)
-    token = models.CharField(max_length=64, blank=True)
-    badge_token = models.CharField(max_length=64, blank=True)
+    badge_handed_out_at = models.DateTimeField(null=True, blank=True)
+    badge_handed_out_pos = models.ForeignKey(
+        "economy.Pos",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="The Pos where the badge for this ticket was handed out",
+    )
+    token = models.CharField(max_length=64, blank=True, db_index=True)
+    badge_token = models.CharField(max_length=64, blank=True, db_index=True)
+
+    objects = TicketManager()
 
     class Meta:
         abstract = True
@@ -164,9 +181,13 @@ class BaseTicket(CampRelatedModel, UUIDModel):
         return self.ticket_type.camp
 
     def save(self, **kwargs) -> None:
+        self.set_tokens()
+        super().save(**kwargs)
+
+    def set_tokens(self) -> None:
+        """Set token and badge_token. They only depend on data available before the ticket is saved."""
         self.token = self._get_token()
         self.badge_token = self._get_badge_token()
-        super().save(**kwargs)
 
     def _get_token(self):
         return create_ticket_token(
@@ -179,14 +200,10 @@ class BaseTicket(CampRelatedModel, UUIDModel):
         )
 
     def get_qr_code_url(self):
-        return "data:image/png;base64,{}".format(
-            qr_code_base64(self._get_token()).decode("utf-8"),
-        )
+        return qr_code_data_url(self._get_token(), **TICKET_QR_CODE_OPTIONS)
 
     def get_qr_badge_code_url(self):
-        return "data:image/png;base64,{}".format(
-            qr_code_base64(self._get_badge_token()).decode("utf-8"),
-        )
+        return qr_code_data_url(self._get_badge_token(), **TICKET_QR_CODE_OPTIONS)
 
     def get_pdf_formatdict(self):
         return {"ticket": self}
@@ -204,6 +221,12 @@ class BaseTicket(CampRelatedModel, UUIDModel):
         self.used_pos_user = user
         self.save()
 
+    def mark_badge_as_handed_out(self, *, pos) -> None:
+        self.badge_handed_out = True
+        self.badge_handed_out_at = timezone.now()
+        self.badge_handed_out_pos = pos
+        self.save()
+
 
 class SponsorTicket(ExportModelOperationsMixin("sponsor_ticket"), BaseTicket):
     sponsor = models.ForeignKey("sponsors.Sponsor", on_delete=models.PROTECT)
@@ -258,7 +281,7 @@ class TicketGroup(
 
 
 class ShopTicket(ExportModelOperationsMixin("shop_ticket"), BaseTicket):
-    class Manager(models.Manager):
+    class Manager(TicketManager):
         def get_queryset(self):
             """Return a queryset which has quantity of annotated on each ticket.
 
@@ -351,4 +374,65 @@ class ShopTicket(ExportModelOperationsMixin("shop_ticket"), BaseTicket):
         return formatdict
 
 
+class DeletedTicket(ExportModelOperationsMixin("deleted_ticket"), CreatedUpdatedModel):
+    """The tokens of a deleted ticket, so offline scanner devices can forget it.
+
+    Created by a post_delete signal handler for the ticket models, and returned as
+    removed by ScanTicketsSyncView for the deletions since the cursor of a device.
+    """
+
+    camp = models.ForeignKey("camps.Camp", on_delete=models.CASCADE, related_name="+")
+    token = models.CharField(max_length=64)
+    badge_token = models.CharField(max_length=64, blank=True)
+
+    def __str__(self) -> str:
+        return f"Deleted ticket {self.token}"
+
+
 TicketTypeUnion = Union[ShopTicket, SponsorTicket, PrizeTicket]
+
+# the ticket models, the index of a model in this list is stored in the ticket index cache
+TICKET_MODELS = [ShopTicket, SponsorTicket, PrizeTicket]
+
+# how long to remember which model and pk a token or pk belongs to
+TICKET_INDEX_TIMEOUT = 60 * 60 * 24
+
+
+def _get_ticket(q, cache_key) -> TicketTypeUnion | None:
+    """Return the ticket of any type matching q, or None.
+
+    The model and pk of the ticket are found with a single UNION query over the
+    indexed ticket tables and cached, so scanning the same ticket again only
+    needs the query fetching it.
+    """
+    location = cache.get(cache_key)
+    if location is None:
+        querysets = [
+            model._base_manager.filter(q).annotate(model_index=Value(index)).values_list("model_index", "pk")
+            for index, model in enumerate(TICKET_MODELS)
+        ]
+        location = next(iter(querysets[0].union(*querysets[1:], all=True)[:1]), None)
+        if location is None:
+            return None
+        cache.set(cache_key, location, TICKET_INDEX_TIMEOUT)
+
+    index, pk = location
+    try:
+        return TICKET_MODELS[index].objects.get(pk=pk)
+    except TICKET_MODELS[index].DoesNotExist:
+        cache.delete(cache_key)
+        return None
+
+
+def get_ticket_by_token(token) -> TicketTypeUnion | None:
+    """Return the ticket of any type with the token or badge_token, or None."""
+    return _get_ticket(Q(token=token) | Q(badge_token=token), f"ticket-index:token:{token}")
+
+
+def get_ticket_by_pk(pk) -> TicketTypeUnion | None:
+    """Return the ticket of any type with the pk, or None."""
+    try:
+        pk = uuid.UUID(str(pk))
+    except ValueError:
+        return None
+    return _get_ticket(Q(pk=pk), f"ticket-index:pk:{pk}")
@@ -0,0 +1,22 @@
+"""Signal handlers for the tickets application."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from .models import DeletedTicket
+
+if TYPE_CHECKING:
+    from .models import TicketTypeUnion
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def ticket_deleted(sender: type[TicketTypeUnion], instance: TicketTypeUnion, **_kwargs) -> None:
+    """Remember the tokens of a deleted ticket, so scanner devices can forget it on their next sync."""
+    DeletedTicket.objects.create(
+        camp_id=instance.ticket_type.camp_id,
+        token=instance.token,
+        badge_token=instance.badge_token,
+    )
@@ -6,6 +6,8 @@ from shop.factories import OrderProductRelationFactory
 
 from .factories import TicketTypeFactory
 from .models import ShopTicket
+from .models import get_ticket_by_pk
+from .models import get_ticket_by_token
 
 
 class TicketTests(TestCase):
@@ -21,3 +23,18 @@ class TicketTests(TestCase):
         self.assertNotEqual(shop_ticket.token, shop_ticket.badge_token)
         self.assertEqual(shop_ticket.token, shop_ticket._get_token())
         self.assertEqual(shop_ticket.badge_token, shop_ticket._get_badge_token())
+
+    def test_get_ticket_by_token_and_pk(self):
+        ticket_type = TicketTypeFactory()
+        opr = OrderProductRelationFactory()
+        shop_ticket = ShopTicket.objects.create(
+            ticket_type=ticket_type,
+            product=opr.product,
+            opr=opr,
+        )
+
+        self.assertEqual(get_ticket_by_token(shop_ticket.token), shop_ticket)
+        self.assertEqual(get_ticket_by_token(shop_ticket.badge_token), shop_ticket)
+        self.assertEqual(get_ticket_by_pk(shop_ticket.pk), shop_ticket)
+        self.assertIsNone(get_ticket_by_token("not-a-token"))
+        self.assertIsNone(get_ticket_by_pk("not-a-pk"))
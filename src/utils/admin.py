@@ -8,7 +8,7 @@ from .models import OutgoingEmail
 @admin.register(OutgoingEmail)
 class OutgoingEmailAdmin(admin.ModelAdmin):
     model = OutgoingEmail
-    list_display = ["subject", "to_recipients", "processed", "hold", "responsible_team"]
+    list_display = ["subject", "to_recipients", "processed", "hold", "send_attempts", "responsible_team"]
     list_filter = ["processed", "hold", "responsible_team"]
     actions = ["hold_emails", "release_emails"]
 
@@ -22,6 +22,9 @@ class OutgoingEmailAdmin(admin.ModelAdmin):
     def release_emails(self, request, queryset) -> None:
         for email in queryset.filter(hold=True, processed=False):
             email.hold = False
+            # start over if the email was put on hold after failing to send
+            email.send_attempts = 0
+            email.next_attempt = None
             email.save()
 
     release_emails.description = "Mark these emails with hold=False"
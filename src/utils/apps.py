@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 from django.apps import AppConfig
+from django.apps import apps
+from django.conf import settings
+from django.db.models.signals import post_save
 
 from utils.allauth_pwreset_nospam import mock_send_unknown_account_email
 
@@ -14,3 +17,14 @@ class UtilsConfig(AppConfig):
         from allauth.account.forms import ResetPasswordForm
 
         ResetPasswordForm._send_unknown_account_mail = mock_send_unknown_account_email
+
+        # wake up workers when objects they process are saved
+        from .workers import notify_workers
+
+        labels = {label for labels in settings.WORKER_WAKEUP_MODELS.values() for label in labels}
+        for label in sorted(labels):
+            post_save.connect(
+                notify_workers,
+                sender=apps.get_model(label),
+                dispatch_uid=f"notify_workers_{label}",
+            )
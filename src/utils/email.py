@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import mimetypes
 
 import magic
 from django.conf import settings
@@ -15,7 +16,7 @@ from .models import OutgoingEmail
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
-def _send_email(
+def _build_email(
     text_template,
     subject,
     to_recipients=None,
@@ -25,7 +26,9 @@ def _send_email(
     sender="BornHack <info@bornhack.dk>",
     attachment=None,
     attachment_filename="",
-) -> bool:
+    connection=None,
+):
+    """Put an EmailMultiAlternatives together, optionally using an open connection to send it."""
     to_recipients = to_recipients or []
     cc_recipients = cc_recipients or []
     bcc_recipients = bcc_recipients or []
@@ -39,26 +42,37 @@ def _send_email(
     if not isinstance(bcc_recipients, list):
         bcc_recipients = [bcc_recipients]
 
+    # put the basic email together
+    msg = EmailMultiAlternatives(
+        subject,
+        text_template,
+        sender,
+        to_recipients,
+        ([*bcc_recipients, settings.ARCHIVE_EMAIL] if bcc_recipients else [settings.ARCHIVE_EMAIL]),
+        cc_recipients,
+        connection=connection,
+    )
+
+    # is there a html version of this email?
+    if html_template:
+        msg.attach_alternative(html_template, "text/html")
+
+    # is there an attachment to this mail?
+    if attachment:
+        # figure out the mimetype, only look at the content if the filename is no help
+        mimetype = mimetypes.guess_type(attachment_filename)[0] or magic.from_buffer(attachment, mime=True)
+        msg.attach(attachment_filename, attachment, mimetype)
+    return msg
+
+
+def _send_email(*args, connection=None, **kwargs) -> bool:
+    """Build and send an email. Takes the same arguments as _build_email().
+
+    Pass an open connection from django.core.mail.get_connection() to send
+    many emails without connecting to the mail server for each of them.
+    """
     try:
-        # put the basic email together
-        msg = EmailMultiAlternatives(
-            subject,
-            text_template,
-            sender,
-            to_recipients,
-            ([*bcc_recipients, settings.ARCHIVE_EMAIL] if bcc_recipients else [settings.ARCHIVE_EMAIL]),
-            cc_recipients,
-        )
-
-        # is there a html version of this email?
-        if html_template:
-            msg.attach_alternative(html_template, "text/html")
-
-        # is there an attachment to this mail?
-        if attachment:
-            # figure out the mimetype
-            mimetype = magic.from_buffer(attachment, mime=True)
-            msg.attach(attachment_filename, attachment, mimetype)
+        msg = _build_email(*args, connection=connection, **kwargs)
     except Exception as e:
         logger.exception(f"exception while rendering email: {e}")
         return False
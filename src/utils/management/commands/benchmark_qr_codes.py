@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import logging
+import secrets
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.models import TICKET_QR_CODE_OPTIONS
+from utils.qr import qr_code_data_url
+from utils.qr import render_qr_code
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+class Command(BaseCommand):
+    args = "none"
+    help = "Benchmark rendering ticket QR codes as PNG and SVG, with and without the cache."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=200,
+            help="The number of different tokens to render. Default: 200",
+        )
+
+    def output(self, message) -> None:
+        self.stdout.write(
+            "{}: {}".format(timezone.now().strftime("%Y-%m-%d %H:%M:%S"), message),
+        )
+
+    def handle(self, *args, **options) -> None:
+        tokens = [secrets.token_hex(32) for _ in range(options["count"])]
+        for kind in ["png", "svg"]:
+            render_qr_code.cache_clear()
+            qr_code_data_url.cache_clear()
+            for label in ["uncached", "cached"]:
+                start = perf_counter()
+                urls = [qr_code_data_url(token, kind=kind, **TICKET_QR_CODE_OPTIONS) for token in tokens]
+                duration = perf_counter() - start
+                self.output(
+                    f"{kind} {label}: {duration / len(tokens) * 1000:.3f}ms per QR code, "
+                    f"{sum(len(url) for url in urls) / len(urls):.0f} bytes per data URL",
+                )
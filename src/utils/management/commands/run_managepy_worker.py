@@ -4,24 +4,34 @@ import importlib
 import logging
 import signal
 import sys
+from collections import defaultdict
+from time import monotonic
 from time import sleep
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from utils.workers import WakeupListener
+from utils.workers import get_wakeup_channel
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(f"bornhack.{__name__}")
 
 
 class Command(BaseCommand):
     args = "none"
-    help = "Run a worker. Takes the worker module as the first positional argument and calls the do_work() function in it. Optional arguments can be seen with -h / --help"
+    help = (
+        "Run one or more workers. Takes the worker modules as positional arguments and calls the "
+        "do_work() function in each. Optional arguments can be seen with -h / --help"
+    )
     exit_now = False
 
     def add_arguments(self, parser) -> None:
         parser.add_argument(
-            "workermodule",
+            "workermodules",
             type=str,
-            help="The dotted path to the module which contains the do_work() function to call periodically.",
+            nargs="+",
+            help="The dotted path to one or more modules which contain the do_work() function to call periodically.",
         )
         parser.add_argument(
             "--sleep",
@@ -29,6 +39,13 @@ class Command(BaseCommand):
             default=60,
             help="The number of seconds to sleep between calls",
         )
+        parser.add_argument(
+            "--listen",
+            action="store_true",
+            help="Use PostgreSQL LISTEN/NOTIFY to call do_work() as soon as an object of a model listed "
+            "for the worker module in settings.WORKER_WAKEUP_MODELS is saved. --sleep is still used as "
+            "the longest time between calls of each worker module.",
+        )
 
     def reload_worker(self, signum, frame) -> None:
         # we exit when we receive a HUP (expecting uwsgi or another supervisor to restart this worker)
@@ -41,12 +58,67 @@ class Command(BaseCommand):
         logger.info(f"Signal {signum} (INT or TERM) received, exiting gracefully...")
         self.exit_now = True
 
+    def run_workers(self, workermodules) -> None:
+        for workermodule in workermodules:
+            self.last_run[workermodule] = monotonic()
+            try:
+                # run worker code
+                workermodule.do_work()
+            except Exception:
+                logger.exception(
+                    f"Got exception inside do_work for {workermodule}",
+                )
+                sys.exit(1)
+
+    def get_due_workers(self, channels: set, channel_modules: dict, interval: float) -> list:
+        """Return the worker modules woken up on channels, and the ones which have not run for interval seconds."""
+        now = monotonic()
+        return [
+            module
+            for module in self.workermodules
+            if now - self.last_run[module] >= interval
+            or any(module in channel_modules.get(channel, []) for channel in channels)
+        ]
+
+    def get_timeout(self, interval: float) -> float:
+        """Return the number of seconds until the next worker module has not run for interval seconds."""
+        return max(0, min(self.last_run.values()) + interval - monotonic())
+
+    def wait(self, seconds, listener) -> set:
+        """Wait for N seconds, or until the listener gets a notification.
+
+        Returns the set of notified channels, which is empty if the time ran out.
+        """
+        i = 0
+        while i < seconds:
+            # but check self.exit_now every second
+            if self.exit_now:
+                sys.exit(0)
+            i += 1
+            if not listener:
+                sleep(1)
+            elif channels := listener.wait(timeout=1):
+                return channels
+        return set()
+
     def handle(self, *args, **options) -> None:
-        logger.info("Importing worker module...")
-        self.workermodule = importlib.import_module(options["workermodule"])
-        if not hasattr(self.workermodule, "do_work"):
-            logger.error("module %s must have a do_work() method to call")
-            sys.exit(1)
+        logger.info("Importing worker modules...")
+        self.workermodules = [importlib.import_module(module) for module in options["workermodules"]]
+        for workermodule in self.workermodules:
+            if not hasattr(workermodule, "do_work"):
+                logger.error(f"module {workermodule.__name__} must have a do_work() method to call")
+                sys.exit(1)
+
+        # the modules to run when a notification arrives on a channel
+        channel_modules = defaultdict(list)
+        listener = None
+        if options["listen"]:
+            for workermodule in self.workermodules:
+                for label in settings.WORKER_WAKEUP_MODELS.get(workermodule.__name__, []):
+                    channel_modules[get_wakeup_channel(label)].append(workermodule)
+            logger.info(f"Listening for wakeups on {len(channel_modules)} channels...")
+            listener = WakeupListener(channel_modules.keys())
+            listener.listen()
 
         logger.info("Connecting signals...")
         signal.signal(signal.SIGHUP, self.reload_worker)
@@ -54,26 +126,13 @@ class Command(BaseCommand):
         signal.signal(signal.SIGINT, self.clean_exit)
 
         logger.info("Entering main loop...")
+        # the monotonic() time each worker module was last called, wakeups of one
+        # module must not postpone the --sleep poll of the others
+        self.last_run = {}
+        workermodules = self.workermodules
         while True:
-            try:
-                # run worker code
-                if not hasattr(self.workermodule, "do_work"):
-                    raise NotImplementedError(
-                        "Worker module should have a 'do_work' function.",
-                    )
-                self.workermodule.do_work()
-            except Exception:
-                logger.exception(
-                    f"Got exception inside do_work for {self.workermodule}",
-                )
-                sys.exit(1)
+            self.run_workers(workermodules)
 
-            # sleep for N seconds before calling worker code again
-            i = 0
-            while i < options["sleep"]:
-                # but check self.exit_now every second
-                if self.exit_now:
-                    sys.exit(0)
-                else:
-                    i += 1
-                    sleep(1)
+            # sleep until a worker module is due for its --sleep poll, or until woken up
+            channels = self.wait(self.get_timeout(options["sleep"]), listener)
+            workermodules = self.get_due_workers(channels, channel_modules, options["sleep"])
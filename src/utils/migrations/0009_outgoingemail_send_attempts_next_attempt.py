@@ -0,0 +1,23 @@
+# Generated by Django 5.2.16 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0008_alter_outgoingemail_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='send_attempts',
+            field=models.PositiveIntegerField(default=0, help_text='The number of failed attempts to send this email.'),
+        ),
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='next_attempt',
+            field=models.DateTimeField(blank=True, help_text='Do not try to send this email again before this time. Set after a failed attempt.', null=True),
+        ),
+    ]
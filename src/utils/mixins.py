@@ -12,6 +12,8 @@ from django.views.generic import CreateView
 from django.views.generic import UpdateView
 from django.views.generic.detail import SingleObjectMixin
 
+from utils.csvexport import streaming_csv_response
+
 if TYPE_CHECKING:
     from django.db.models import Model
 
@@ -149,3 +151,28 @@ class VerbUpdateView(VerbView, UpdateView):
     """Subclass of UpdateView where self.verb is set for use in headlines and form buttons."""
 
     verb = "Update"
+
+
+class CsvExportMixin:
+    """A CBV mixin which streams the objects from get_csv_queryset() as a CSV file.
+
+    Set csv_header (a tuple) and csv_filename (or override get_csv_filename()), and
+    define get_csv_row(obj) returning the row for an object. The objects are read
+    with a server-side cursor in chunks of csv_chunk_size, so do any select_related()
+    or annotate() needed for the rows in get_csv_queryset() to avoid queries for
+    each row.
+    """
+
+    csv_header = None
+    csv_filename = "export.csv"
+    csv_chunk_size = 2000
+
+    def get_csv_queryset(self):
+        return self.get_queryset()
+
+    def get_csv_filename(self) -> str:
+        return self.csv_filename
+
+    def get(self, request, *args, **kwargs):
+        rows = (self.get_csv_row(obj) for obj in self.get_csv_queryset().iterator(chunk_size=self.csv_chunk_size))
+        return streaming_csv_response(self.get_csv_filename(), rows, header=self.csv_header)
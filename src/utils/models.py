@@ -159,6 +159,15 @@ class OutgoingEmail(ExportModelOperationsMixin("outgoing_email"), CreatedUpdated
         default=False,
         help_text="Hold (do not send) this email. Uncheck to send.",
     )
+    send_attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="The number of failed attempts to send this email.",
+    )
+    next_attempt = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Do not try to send this email again before this time. Set after a failed attempt.",
+    )
     responsible_team = models.ForeignKey(
         "teams.Team",
         null=True,
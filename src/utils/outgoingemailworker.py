@@ -1,6 +1,15 @@
 from __future__ import annotations
 
 import logging
+from datetime import timedelta
+from time import monotonic
+from time import sleep
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
 
 from .email import _send_email
 from .models import OutgoingEmail
@@ -8,36 +17,131 @@ from .models import OutgoingEmail
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(f"bornhack.{__name__}")
 
+# emails claimed by a worker are not claimed by other workers for this long, so if a
+# worker dies while sending a batch the unsent emails are sent later by another one
+CLAIM_TIMEOUT = timedelta(minutes=15)
 
-def do_work() -> None:
-    """The outgoing email worker sends emails added to the OutgoingEmail
-    queue.
+
+def get_retry_delay(attempts):
+    """Return how long to wait before trying again after a number of failed attempts: 1, 2, 4, 8... minutes."""
+    return timedelta(minutes=2 ** (attempts - 1))
+
+
+class RateLimiter:
+    """Wait between calls to wait() so they happen at most rate times per second. A rate of 0 means no limit."""
+
+    def __init__(self, rate) -> None:
+        self.interval = 1 / rate if rate else 0
+        self.next_time = monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        now = monotonic()
+        if now < self.next_time:
+            sleep(self.next_time - now)
+        self.next_time = max(now, self.next_time) + self.interval
+
+
+def open_connection(connection) -> None:
+    """Open the connection unless it is open already. Failures are left for the send to report."""
+    try:
+        connection.open()
+    except Exception as e:
+        logger.exception(f"exception while connecting to the mail server: {e}")
+
+
+def claim_batch():
+    """Claim a batch of unsent emails by moving their next attempt CLAIM_TIMEOUT ahead.
+
+    The rows are only locked while claiming and locked rows are skipped, so several
+    workers can send at once without sending the same email twice.
     """
-    not_processed_email = OutgoingEmail.objects.filter(processed=False, hold=False)
-
-    if len(not_processed_email) > 0:
-        logger.debug(f"about to process {len(not_processed_email)} emails")
-
-    for email in not_processed_email:
-        attachment = None
-        attachment_filename = ""
-        if email.attachment:
-            attachment = email.attachment.read()
-            attachment_filename = email.attachment.name
-
-        mail_send_success = _send_email(
-            text_template=email.text_template,
-            to_recipients=email.to_recipients,
-            subject=email.subject,
-            cc_recipients=email.cc_recipients,
-            bcc_recipients=email.bcc_recipients,
-            html_template=email.html_template,
-            attachment=attachment,
-            attachment_filename=attachment_filename,
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(processed=False, hold=False)
+            .filter(Q(next_attempt__isnull=True) | Q(next_attempt__lte=now))
+            .order_by("created")[: settings.OUTGOING_EMAIL_BATCH_SIZE],
         )
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt=now + CLAIM_TIMEOUT)
+    return emails
+
+
+def send_email(connection, email) -> bool:
+    """Send one OutgoingEmail over the connection. Returns True if it was sent."""
+    attachment = None
+    attachment_filename = ""
+    if email.attachment:
+        attachment = email.attachment.read()
+        attachment_filename = email.attachment.name
+
+    open_connection(connection)
+    return _send_email(
+        text_template=email.text_template,
+        to_recipients=email.to_recipients,
+        subject=email.subject,
+        cc_recipients=email.cc_recipients,
+        bcc_recipients=email.bcc_recipients,
+        html_template=email.html_template,
+        attachment=attachment,
+        attachment_filename=attachment_filename,
+        connection=connection,
+    )
+
+
+def send_batch(connection, ratelimiter) -> int:
+    """Claim a batch of unsent emails and send them over the connection. Returns the number of claimed emails.
+
+    Each email is marked as processed right after it is sent, and an exception while
+    sending one email counts as a failed attempt for that email only, so delivered
+    emails are never sent again because of a problem with another email.
+    """
+    emails = claim_batch()
+    for email in emails:
+        ratelimiter.wait()
+        try:
+            mail_send_success = send_email(connection, email)
+        except Exception:
+            logger.exception(f"exception while sending {email}")
+            mail_send_success = False
+
         if mail_send_success:
-            email.processed = True
-            email.save()
+            OutgoingEmail.objects.filter(pk=email.pk).update(processed=True, updated=timezone.now())
             logger.debug(f"Successfully sent {email}")
+            continue
+
+        logger.error(f"Unable to send {email}")
+        # the connection might be broken, it is opened again by the next send
+        connection.close()
+        email.send_attempts += 1
+        if email.send_attempts >= settings.OUTGOING_EMAIL_MAX_ATTEMPTS:
+            logger.error(f"Giving up on {email} after {email.send_attempts} attempts, putting it on hold")
+            email.hold = True
         else:
-            logger.error(f"Unable to send {email}")
+            email.next_attempt = timezone.now() + get_retry_delay(email.send_attempts)
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            send_attempts=email.send_attempts,
+            next_attempt=email.next_attempt,
+            hold=email.hold,
+            updated=timezone.now(),
+        )
+    return len(emails)
+
+
+def do_work() -> None:
+    """The outgoing email worker sends emails added to the OutgoingEmail
+    queue.
+
+    Emails are claimed in batches of OUTGOING_EMAIL_BATCH_SIZE and sent over a
+    single SMTP connection. Failed emails are retried with an exponential backoff.
+    """
+    ratelimiter = RateLimiter(settings.OUTGOING_EMAIL_RATE_LIMIT)
+    # the connection is opened before the first send and kept open for the following ones
+    connection = get_connection(fail_silently=False)
+    try:
+        while count := send_batch(connection, ratelimiter):
+            logger.debug(f"processed a batch of {count} emails")
+    finally:
+        connection.close()
@@ -3,6 +3,8 @@ from __future__ import annotations
 import io
 import logging
 import os
+from functools import cache
+from time import perf_counter
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
@@ -10,21 +12,69 @@ from django.template.loader import render_to_string
 from django.test.client import RequestFactory
 from django_weasyprint.utils import django_url_fetcher
 from weasyprint import HTML
+from weasyprint.text.fonts import FontConfiguration
 
 logger = logging.getLogger(f"bornhack.{__name__}")
 
+# Fonts, images and static files are the same for every PDF, so long-lived
+# processes like the invoiceworker keep them around between renders. The image
+# and static caches keep at most PDF_CACHE_SIZE entries each.
+PDF_CACHE_SIZE = 128
+IMAGE_CACHE = {}
+STATIC_CACHE = {}
+
+
+@cache
+def get_font_config():
+    """Return the FontConfiguration shared by all renders, created on first use."""
+    return FontConfiguration()
+
+
+def trim_cache(entries, size=PDF_CACHE_SIZE) -> None:
+    """Remove the oldest entries from a cache dict until it has at most size entries.
+
+    WeasyPrint uses the image cache during a render, so only trim it between renders.
+    """
+    for key in list(entries)[: max(len(entries) - size, 0)]:
+        del entries[key]
+
+
+def cached_url_fetcher(url, *args, **kwargs):
+    """Return static files from STATIC_CACHE, and everything else from django_url_fetcher."""
+    if url in STATIC_CACHE:
+        return dict(STATIC_CACHE[url])
+    result = django_url_fetcher(url, *args, **kwargs)
+    if settings.STATIC_URL not in url:
+        return result
+    if "file_obj" in result:
+        with result.pop("file_obj") as f:
+            result["string"] = f.read()
+    STATIC_CACHE[url] = result
+    return dict(result)
+
 
 def generate_pdf_letter(filename, template, formatdict):
+    """Render the template to a PDF, save a copy in PDF_ARCHIVE_PATH and return it as a BytesIO."""
+    start = perf_counter()
     request = RequestFactory().get("/")
     request.user = AnonymousUser()
     request.session = {}
     formatdict["dev"] = settings.PDF_TEST_MODE
     weasy_html = HTML(
         string=render_to_string(template, context=formatdict, request=request),
-        url_fetcher=django_url_fetcher,
+        url_fetcher=cached_url_fetcher,
         base_url="file://",
     )
-    pdf = io.BytesIO()
-    pdf.write(weasy_html.write_pdf())
-    weasy_html.write_pdf(os.path.join(settings.PDF_ARCHIVE_PATH, filename))
-    return pdf
+    rendered = perf_counter()
+    # render the PDF once and use the same bytes for the archive and the caller
+    data = weasy_html.write_pdf(font_config=get_font_config(), cache=IMAGE_CACHE)
+    written = perf_counter()
+    trim_cache(IMAGE_CACHE)
+    trim_cache(STATIC_CACHE)
+    with open(os.path.join(settings.PDF_ARCHIVE_PATH, filename), "wb") as f:
+        f.write(data)
+    logger.info(
+        f"Generated {filename} from {template} in {perf_counter() - start:.3f}s "
+        f"(template {rendered - start:.3f}s, pdf {written - rendered:.3f}s, {len(data)} bytes)",
+    )
+    return io.BytesIO(data)
@@ -0,0 +1,107 @@
+"""Cached QR code rendering.
+
+QR codes for tickets and scanner commands only depend on the encoded data and
+the rendering options, so rendered images are kept in an in-memory LRU cache,
+and in QR_CODE_CACHE_DIR on disk if it is set.
+
+PNG images are rendered with Pillow. SVG images skip the rasterising and
+scale to any size without losing sharpness. Run the benchmark_qr_codes
+management command to compare render time and size of the two.
+"""
+
+from __future__ import annotations
+
+import base64
+import functools
+import hashlib
+import io
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+# the number of rendered QR codes to keep in memory in each process
+QR_CODE_CACHE_SIZE = 2048
+
+MIMETYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+def _render(data, kind, size, box_size, error_correction, version) -> bytes:
+    if kind not in MIMETYPES:
+        raise ValueError(f"Unsupported QR code kind {kind}")
+    kwargs = {
+        "box_size": box_size,
+        "error_correction": error_correction,
+        "version": version,
+    }
+    stream = io.BytesIO()
+    if kind == "svg":
+        qrcode.make(data, image_factory=qrcode.image.svg.SvgPathImage, **kwargs).save(stream)
+        return stream.getvalue()
+    img = qrcode.make(data, **kwargs)
+    if size:
+        # this returns a plain Pillow image
+        img = img.resize((size, size))
+    img.save(stream, format="png")
+    return stream.getvalue()
+
+
+def _disk_cache_path(*key) -> Path | None:
+    if not settings.QR_CODE_CACHE_DIR:
+        return None
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()
+    return Path(settings.QR_CODE_CACHE_DIR) / digest[:2] / f"{digest}.{key[1]}"
+
+
+@functools.lru_cache(maxsize=QR_CODE_CACHE_SIZE)
+def render_qr_code(
+    data,
+    kind="png",
+    size=None,
+    box_size=10,
+    error_correction=qrcode.constants.ERROR_CORRECT_M,
+    version=None,
+) -> bytes:
+    """Return the QR code for data as PNG or SVG bytes.
+
+    Args:
+        data: The string to encode.
+        kind: "png" or "svg".
+        size: Resize PNG images to size x size pixels. SVG images are not resized.
+        box_size: The number of pixels for each box in the QR code.
+        error_correction: One of the qrcode.constants.ERROR_CORRECT_* constants.
+        version: The QR code version (1-40) to start with, or None to pick the smallest.
+    """
+    key = (data, kind, size, box_size, error_correction, version)
+    path = _disk_cache_path(*key)
+    if path and path.exists():
+        return path.read_bytes()
+
+    image = _render(*key)
+
+    if path:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # write to a temporary file first so other processes never read a partial image
+            with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+                f.write(image)
+            os.replace(f.name, path)
+        except OSError:
+            logger.exception(f"Unable to write QR code to disk cache {path}")
+    return image
+
+
+@functools.lru_cache(maxsize=QR_CODE_CACHE_SIZE)
+def qr_code_data_url(data, kind="png", **kwargs) -> str:
+    """Return the QR code for data as a data: URL. Takes the same arguments as render_qr_code()."""
+    image = base64.b64encode(render_qr_code(data, kind=kind, **kwargs)).decode("utf-8")
+    return f"data:{MIMETYPES[kind]};base64,{image}"
@@ -1,25 +1,19 @@
 from __future__ import annotations
 
-import base64
-import io
-
-import qrcode
 from django import template
 from django.utils.safestring import mark_safe
 
+from utils.qr import qr_code_data_url
+
 register = template.Library()
 
 
 @register.simple_tag
-def qr_code(value):
-    stream = io.BytesIO()
-    img = qrcode.make(value, box_size=7)
-    img.save(stream, "PNG")
-    data = base64.b64encode(stream.getvalue())
-
+def qr_code(value, kind="png"):
+    """Render a QR code for value with a caption. Use kind="svg" for a smaller SVG image."""
     return mark_safe(
         "<figure style='text-align: center;'>"
         f"<figcaption style='text-align: center;'>{value}</figcaption>"
-        f'<img src="data:image/png;base64,{data.decode()}" alt="">'
+        f'<img src="{qr_code_data_url(value, kind=kind, box_size=7)}" alt="">'
         "</figure>",
     )
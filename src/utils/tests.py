@@ -3,20 +3,31 @@
 from __future__ import annotations
 
 import logging
+import types
 from argparse import ArgumentTypeError
 from copy import deepcopy
+from unittest import mock
 
 import pytest
+from django.core import mail
 from django.core.management import CommandError
 from django.core.management import call_command
 from django.test import Client
 from django.test import TestCase
+from django.test import override_settings
 from django.utils import timezone
 
 from camps.models import Camp
 from teams.models import Team
 from utils.bootstrap.base import Bootstrap
 from utils.management.commands import bootstrap_devsite
+from utils.management.commands.run_managepy_worker import Command as RunManagepyWorkerCommand
+from utils.models import OutgoingEmail
+from utils.outgoingemailworker import do_work as send_outgoing_emails
+from utils.pdf import trim_cache
+from utils.qr import qr_code_data_url
+from utils.qr import render_qr_code
+from utils.workers import get_wakeup_channel
 
 
 class TestBootstrapDevsiteCommand:
@@ -127,3 +138,125 @@ class BornhackTestBase(TestCase):
         cls.camp = cls.bootstrap.camp
         cls.users = cls.bootstrap.users
         cls.teams = cls.bootstrap.teams
+
+
+class TestOutgoingEmailWorker(TestCase):
+    """Test the batched outgoing email worker."""
+
+    def setUp(self) -> None:
+        self.emails = [
+            OutgoingEmail.objects.create(
+                subject=f"Test {i}",
+                text_template="Hello",
+                sender="BornHack <info@bornhack.dk>",
+                to_recipients=[f"user{i}@example.com"],
+            )
+            for i in range(3)
+        ]
+
+    def test_sends_and_marks_emails(self) -> None:
+        """Make sure all emails are sent and marked as processed."""
+        held = OutgoingEmail.objects.create(
+            subject="Held",
+            text_template="Hello",
+            sender="BornHack <info@bornhack.dk>",
+            to_recipients=["held@example.com"],
+            hold=True,
+        )
+        send_outgoing_emails()
+        assert len(mail.outbox) == 3
+        assert OutgoingEmail.objects.filter(processed=True).count() == 3
+        held.refresh_from_db()
+        assert not held.processed
+
+    def test_failed_emails_are_retried_later(self) -> None:
+        """Make sure failed emails get a next attempt and are not retried right away."""
+        with mock.patch("utils.outgoingemailworker._send_email", return_value=False) as send:
+            send_outgoing_emails()
+        assert send.call_count == 3
+        for email in self.emails:
+            email.refresh_from_db()
+            assert not email.processed
+            assert email.send_attempts == 1
+            assert email.next_attempt > timezone.now()
+
+    def test_exception_only_fails_one_email(self) -> None:
+        """Make sure an exception while sending one email does not undo the others."""
+        with mock.patch(
+            "utils.outgoingemailworker._send_email",
+            side_effect=[True, Exception("boom"), True],
+        ):
+            send_outgoing_emails()
+        processed = [email.processed for email in OutgoingEmail.objects.order_by("created")]
+        assert processed == [True, False, True]
+        self.emails[1].refresh_from_db()
+        assert self.emails[1].send_attempts == 1
+
+
+class TestRunManagepyWorker:
+    """Test the main loop of the run_managepy_worker command."""
+
+    @override_settings(WORKER_WAKEUP_MODELS={"woken_worker": ["utils.OutgoingEmail"]})
+    def test_sleep_poll_of_module_without_wakeups(self) -> None:
+        """A worker module which is never woken up is still called every --sleep seconds."""
+        calls = []
+        modules = {}
+        for name in ["woken_worker", "polled_worker"]:
+            modules[name] = types.ModuleType(name)
+            modules[name].do_work = lambda name=name: calls.append((name, clock[0]))
+        clock = [0]
+
+        def wait(self, seconds, listener) -> set:
+            """Wake up woken_worker every 20 seconds, until 200 seconds have passed."""
+            assert seconds <= 60
+            if clock[0] >= 200:
+                raise SystemExit
+            clock[0] += 20
+            return {get_wakeup_channel("utils.OutgoingEmail")}
+
+        path = "utils.management.commands.run_managepy_worker"
+        with (
+            mock.patch.dict("sys.modules", modules),
+            mock.patch(f"{path}.monotonic", side_effect=lambda: clock[0]),
+            mock.patch(f"{path}.WakeupListener"),
+            mock.patch(f"{path}.signal.signal"),
+            mock.patch.object(RunManagepyWorkerCommand, "wait", wait),
+            pytest.raises(SystemExit),
+        ):
+            call_command("run_managepy_worker", "woken_worker", "polled_worker", "--listen", "--sleep=60")
+
+        assert [time for name, time in calls if name == "woken_worker"] == list(range(0, 201, 20))
+        assert [time for name, time in calls if name == "polled_worker"] == [0, 60, 120, 180]
+
+
+class TestQrCodes(TestCase):
+    """Test the cached QR code rendering."""
+
+    def setUp(self) -> None:
+        """Start with empty caches, other tests render QR codes too."""
+        render_qr_code.cache_clear()
+        qr_code_data_url.cache_clear()
+
+    def test_png_and_svg(self) -> None:
+        """Make sure both kinds render and repeated calls are served from the cache."""
+        assert qr_code_data_url("bornhack", kind="png").startswith("data:image/png;base64,")
+        assert qr_code_data_url("bornhack", kind="svg").startswith("data:image/svg+xml;base64,")
+        render_qr_code("bornhack", kind="svg")
+        assert render_qr_code.cache_info().hits == 1
+
+    def test_unsupported_kind(self) -> None:
+        """Make sure an unknown kind is an error."""
+        with pytest.raises(ValueError):
+            render_qr_code("bornhack", kind="gif")
+
+
+class TestPdfCaches:
+    """Test the caches kept between PDF renders."""
+
+    def test_trim_cache(self) -> None:
+        """The oldest entries are removed until the cache has the given size."""
+        entries = {key: key for key in range(5)}
+        trim_cache(entries, size=3)
+        assert list(entries) == [2, 3, 4]
+        trim_cache(entries, size=10)
+        assert list(entries) == [2, 3, 4]
@@ -0,0 +1,65 @@
+"""Wake up workers run by run_managepy_worker with PostgreSQL LISTEN/NOTIFY.
+
+settings.WORKER_WAKEUP_MODELS lists the models each worker module wants to be woken
+up for. Saving an object of one of them sends a NOTIFY on the channel for the model
+when the transaction commits, and run_managepy_worker --listen runs the do_work()
+of the worker modules listing the model as soon as one is saved.
+"""
+
+from __future__ import annotations
+
+import logging
+import select
+
+from django.db import connection
+from django.db import transaction
+
+logger = logging.getLogger(f"bornhack.{__name__}")
+
+
+def get_wakeup_channel(label) -> str:
+    """Return the NOTIFY channel for a model label like "utils.OutgoingEmail"."""
+    return "bornhack_worker_" + label.lower().replace(".", "_")
+
+
+def send_wakeup(channel) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, '')", [channel])
+
+
+def notify_workers(sender, **kwargs) -> None:
+    """post_save signal handler which wakes up workers listening for the model."""
+    channel = get_wakeup_channel(sender._meta.label)
+    transaction.on_commit(lambda: send_wakeup(channel))
+
+
+class WakeupListener:
+    """LISTEN on channels with the database connection of this thread and wait for notifications."""
+
+    def __init__(self, channels) -> None:
+        self.channels = list(channels)
+        self.pgconn = None
+
+    def listen(self) -> None:
+        """LISTEN on the channels, again if the connection was closed since the last time."""
+        connection.ensure_connection()
+        if self.pgconn is connection.connection:
+            return
+        with connection.cursor() as cursor:
+            for channel in self.channels:
+                cursor.execute(f'LISTEN "{channel}"')
+        self.pgconn = connection.connection
+
+    def wait(self, timeout) -> set:
+        """Wait up to timeout seconds for notifications.
+
+        Returns the set of channels which got a notification, including any which
+        arrived while the connection was used for other queries.
+        """
+        self.listen()
+        if not self.pgconn.notifies:
+            select.select([self.pgconn], [], [], timeout)
+        self.pgconn.poll()
+        channels = {notify.channel for notify in self.pgconn.notifies}
+        self.pgconn.notifies.clear()
+        return channels